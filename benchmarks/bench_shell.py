@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Замеры производительности ядра оболочки на синтетических деревьях
+
+Примеры:
+    python benchmarks/bench_shell.py -o base.json
+    python benchmarks/bench_shell.py --quick --compare base.json --threshold 0.15
+
+Команды выполняются через LinuxConsoleOS.execute_command с выводом в
+счетчик символов, так что замеряется ядро, а не терминал. Каждый замер
+повторяется --repeat раз; в результат идут лучшее время и медиана, а
+--compare сравнивает медианы и не считает регрессией шум: замеры короче
+--min-seconds и замедления меньше --min-delta секунд.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shell_core import OutputSink
+from linux_console_os import LinuxConsoleOS
+
+
+class CountingSink(OutputSink):
+    """Приемник, который только считает символы вывода"""
+
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, text):
+        self.chars += len(text)
+
+
+def parse_size(text):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.upper()
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def make_flat_tree(path, count):
+    """Директория с count маленькими файлами"""
+    os.makedirs(path)
+    payload = b"x" * 100
+    for i in range(count):
+        with open(os.path.join(path, f"file{i:07d}.txt"), "wb") as f:
+            f.write(payload)
+
+
+def make_deep_tree(path, depth, width):
+    """Цепочка из depth вложенных директорий по width файлов в каждой"""
+    current = path
+    for level in range(depth):
+        current = os.path.join(current, f"level{level:03d}")
+        os.makedirs(current)
+        for i in range(width):
+            with open(os.path.join(current, f"f{i}.txt"), "wb") as f:
+                f.write(b"data\n")
+
+
+def make_big_file(path, size):
+    """Текстовый файл заданного размера из одинаковых строк"""
+    block = b"".join(b"%08d the quick brown fox jumps over the lazy dog\n" % i for i in range(16384))
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            part = block[:size - written]
+            f.write(part)
+            written += len(part)
+
+
+class Bench:
+    def __init__(self, workdir, repeat):
+        self.workdir = workdir
+        self.repeat = repeat
+        self.console = LinuxConsoleOS(banner=False)
+        self.results = {}
+
+    def run_commands(self, commands):
+        """Выполнение команд; время и число символов вывода"""
+        sink = CountingSink()
+        self.console.shell.sink = sink
+        started = time.perf_counter()
+        for command in commands:
+            exit_code = self.console.execute_command(command)
+            if exit_code:
+                raise RuntimeError(f"'{command}' завершилась с кодом {exit_code}")
+        return time.perf_counter() - started, sink.chars
+
+    def measure(self, name, commands, ops, setup=None, teardown=None, size=None):
+        """repeat повторений (лучшее и медиана); setup/teardown выполняются вне замера"""
+        runs = []
+        chars = 0
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            try:
+                elapsed, chars = self.run_commands(commands() if callable(commands) else commands)
+            finally:
+                if teardown is not None:
+                    teardown()
+            runs.append(elapsed)
+        self.record(name, runs, ops, chars, size)
+
+    def record(self, name, runs, ops, chars=0, size=None):
+        best = min(runs)
+        median = statistics.median(runs)
+        result = {"seconds": best, "median": median, "runs": runs, "ops": ops,
+                  "ops_per_s": ops / best if best else None, "output_chars": chars}
+        if size is not None:
+            result["bytes_per_s"] = size / best if best else None
+        self.results[name] = result
+        print(f"{name:<24} {best:>9.3f} с  (медиана {median:.3f} с)  {result['ops_per_s'] or 0:>12.0f} оп/с",
+              flush=True)
+
+
+def bench_shell(bench, options):
+    workdir = bench.workdir
+    flat = os.path.join(workdir, "flat")
+    deep = os.path.join(workdir, "deep")
+    big = os.path.join(workdir, "big.txt")
+    scratch = os.path.join(workdir, "scratch")
+
+    print(f"Подготовка: {options.files} файлов, глубина {options.depth}, файл {options.big_size} байт", flush=True)
+    make_flat_tree(flat, options.files)
+    make_deep_tree(deep, options.depth, options.width)
+    make_big_file(big, options.big_size)
+
+    def fresh_scratch():
+        shutil.rmtree(scratch, ignore_errors=True)
+        os.makedirs(scratch)
+
+    def remove_scratch():
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    bench.measure("ls_flat", [f"ls {flat}"], 1)
+    bench.measure("ls_l_flat", [f"ls -l {flat}"], 1)
+    bench.measure("ls_R_deep", [f"ls -R {deep}"], 1)
+    bench.measure("cat_big", [f"cat {big}"], 1, size=options.big_size)
+    bench.measure("head_big", [f"head -n 10 {big}"], 1)
+    bench.measure("tail_big", [f"tail -n 10 {big}"], 1)
+    bench.measure("grep_pipe_big", [f"cat {big} | grep fox | head -n 1000"], 1)
+
+    count = options.ops
+    bench.measure("mkdir", lambda: [f"mkdir {scratch}/d{i}" for i in range(count)], count,
+                  setup=fresh_scratch, teardown=remove_scratch)
+    bench.measure("touch", lambda: [f"touch {scratch}/f{i}" for i in range(count)], count,
+                  setup=fresh_scratch, teardown=remove_scratch)
+
+    copy = os.path.join(workdir, "flat-copy")
+    bench.measure("cp_r_flat", [f"cp -r {flat} {copy}"], options.files,
+                  teardown=lambda: shutil.rmtree(copy, ignore_errors=True))
+    bench.measure("rm_r_flat", [f"rm -r {copy}"], options.files,
+                  setup=lambda: shutil.copytree(flat, copy))
+
+
+def bench_gui(bench, options):
+    """Пропускная способность вывода GUI: print_to_output и отрисовка до пустой очереди
+
+    Без дисплея (CI) окно не создать: тогда замеряется тот же путь вывода
+    без виджета - кадры сброса в спул и чтение показываемого окна строк.
+    """
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+    except Exception as e:
+        print(f"gui_output: нет дисплея ({str(e)}), замер вывода без виджета", flush=True)
+        bench_gui_spool(bench, options)
+        return
+    from linux_os_simulator import LinuxOSSimulator
+
+    lines = options.gui_lines
+    line = "x" * 70 + "\n"
+    runs = []
+    for _ in range(bench.repeat):
+        root = tk.Tk()
+        root.withdraw()
+        app = LinuxOSSimulator(root)
+        try:
+            root.update()
+            started = time.perf_counter()
+            for _ in range(lines):
+                app.print_to_output(line)
+            while not app.output_queue.empty() or app.output_pending:
+                root.update()
+            runs.append(time.perf_counter() - started)
+        finally:
+            app.executor.shutdown(wait=False)
+            app.spool.close()
+            root.destroy()
+    bench.record("gui_output", runs, lines, lines * len(line))
+
+
+def bench_gui_spool(bench, options):
+    """Вывод GUI без дисплея: кадры flush_output (спул и окно видимых строк) без виджета Tk"""
+    from linux_os_simulator import LinuxOSSimulator
+    from output_spool import OutputSpool
+
+    lines = options.gui_lines
+    line = "x" * 70 + "\n"
+    # Строк в окне 800x600 шрифтом Courier 12
+    visible = 30
+    per_frame = max(1, LinuxOSSimulator.OUTPUT_FLUSH_LIMIT // len(line))
+    margin = LinuxOSSimulator.OUTPUT_MARGIN_LINES
+    runs = []
+    for _ in range(bench.repeat):
+        spool = OutputSpool()
+        try:
+            started = time.perf_counter()
+            for start in range(0, lines, per_frame):
+                spool.append(line * min(per_frame, lines - start))
+                count = spool.line_count
+                spool.lines(max(0, count - visible - margin), count)
+            runs.append(time.perf_counter() - started)
+        finally:
+            spool.close()
+    bench.record("gui_output_spool", runs, lines, lines * len(line))
+
+
+def compare(results, baseline_path, threshold, min_seconds, min_delta):
+    """Сравнение медиан с сохраненными результатами; True, если есть регрессии
+
+    Регрессия - замедление больше threshold и больше min_delta секунд;
+    замеры, где оба времени короче min_seconds, не сравниваются (это шум).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = False
+    print(f"\n{'ЗАМЕР':<24} {'БЫЛО, с':>9} {'СТАЛО, с':>9} {'ИЗМ.':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or "seconds" not in before or "seconds" not in result:
+            continue
+        # Старые результаты без медианы сравниваются по лучшему времени
+        key = "median" if "median" in before and "median" in result else "seconds"
+        old, new = before[key], result[key]
+        change = new / old - 1 if old else 0.0
+        mark = ""
+        if max(old, new) < min_seconds:
+            mark = "  (короткий замер, не сравнивается)"
+        elif change > threshold and new - old > min_delta:
+            mark = "  РЕГРЕССИЯ"
+            regressions = True
+        print(f"{name:<24} {old:>9.3f} {new:>9.3f} {change:>+8.1%}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности оболочки")
+    parser.add_argument("-o", "--output", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="сравнить с сохраненными результатами")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="допустимое замедление относительно BASELINE (0.10 = 10%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="замеры короче этого (в обоих прогонах) не сравниваются")
+    parser.add_argument("--min-delta", type=float, default=0.02,
+                        help="замедление меньше этого числа секунд не считается регрессией")
+    parser.add_argument("--repeat", type=int, default=3, help="повторений каждого замера")
+    parser.add_argument("--files", type=int, default=100000, help="файлов в плоской директории")
+    parser.add_argument("--depth", type=int, default=200, help="глубина вложенного дерева")
+    parser.add_argument("--width", type=int, default=10, help="файлов на уровень вложенного дерева")
+    parser.add_argument("--big-size", type=parse_size, default=parse_size("2G"), help="размер большого файла")
+    parser.add_argument("--ops", type=int, default=5000, help="команд mkdir/touch в замере")
+    parser.add_argument("--gui-lines", type=int, default=200000, help="строк вывода в замере GUI")
+    parser.add_argument("--no-gui", action="store_true", help="не замерять вывод GUI")
+    parser.add_argument("--quick", action="store_true", help="маленькие размеры для быстрой проверки")
+    parser.add_argument("--dir", help="где создавать временные деревья (по умолчанию - системный tmp)")
+    options = parser.parse_args()
+    if options.quick:
+        options.files, options.depth, options.big_size = 2000, 50, parse_size("16M")
+        # Медиана из трех прогонов: по одному прогону сравнение - шум
+        options.ops, options.gui_lines, options.repeat = 500, 20000, 3
+
+    workdir = tempfile.mkdtemp(prefix="myos-bench-", dir=options.dir)
+    cwd = os.getcwd()
+    bench = Bench(workdir, options.repeat)
+    try:
+        bench_shell(bench, options)
+        if not options.no_gui:
+            bench_gui(bench, options)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {key: value for key, value in vars(options).items()
+                       if key in ("repeat", "files", "depth", "width", "big_size", "ops", "gui_lines")},
+        },
+        "results": bench.results,
+    }
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {options.output}")
+    if options.compare and compare(bench.results, options.compare, options.threshold,
+                                   options.min_seconds, options.min_delta):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Дополнение по Tab: имена команд из префиксного дерева и пути с кэшем листингов
+"""
+
+import bisect
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+
+
+# Символы, отделяющие дополняемое слово
+WORD_BREAKS = " \t|<>"
+# Сколько листингов директорий держать в кэше
+LISTING_CACHE_SIZE = 32
+
+
+class CommandTrie:
+    """Префиксное дерево имен команд: узел - словарь символ -> узел, None - конец имени"""
+
+    def __init__(self, names=()):
+        self.root = {}
+        for name in names:
+            self.insert(name)
+
+    def insert(self, name):
+        node = self.root
+        for char in name:
+            node = node.setdefault(char, {})
+        node[None] = name
+
+    def complete(self, prefix):
+        """Имена с префиксом prefix в алфавитном порядке"""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        names = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    names.append(child)
+                else:
+                    stack.append(child)
+        names.sort()
+        return names
+
+
+class ListingCache:
+    """LRU-кэш листингов директорий с ключом (путь, mtime)
+
+    Повторный Tab в большой директории стоит одного stat: листинг берется
+    из кэша, пока не изменилось время модификации директории.
+    """
+
+    def __init__(self, size=LISTING_CACHE_SIZE):
+        self.size = size
+        self.listings = OrderedDict()
+        self.lock = threading.Lock()
+
+    def listing(self, fs, path):
+        """Отсортированный список (имя, директория ли) для path в файловой системе fs"""
+        full = os.path.normpath(os.path.join(fs.getcwd(), path))
+        mtime_ns = fs.stat(path).st_mtime_ns
+        key = (id(fs), full)
+        with self.lock:
+            cached = self.listings.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self.listings.move_to_end(key)
+                return cached[1]
+        entries = []
+        with fs.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+        entries.sort()
+        with self.lock:
+            self.listings[key] = (mtime_ns, entries)
+            self.listings.move_to_end(key)
+            while len(self.listings) > self.size:
+                self.listings.popitem(last=False)
+        return entries
+
+
+def current_word(line):
+    """Начало дополняемого слова в line и признак позиции имени команды"""
+    start = len(line)
+    while start > 0 and line[start - 1] not in WORD_BREAKS:
+        start -= 1
+    before = line[:start].rstrip(" \t")
+    return start, before == "" or before.endswith("|")
+
+
+class Completer:
+    """Варианты дополнения строки оболочки shell"""
+
+    def __init__(self, shell, cache=None):
+        self.shell = shell
+        self.cache = cache or ListingCache()
+        self.trie = None
+        self.trie_size = 0
+
+    def commands(self, prefix):
+        names = self.shell.registry.by_name
+        # Таблицу команд могут дополнять после создания оболочки (команды окна)
+        if self.trie is None or self.trie_size != len(names):
+            self.trie = CommandTrie(names)
+            self.trie_size = len(names)
+        return self.trie.complete(prefix)
+
+    def paths(self, word):
+        directory, prefix = posixpath.split(word)
+        try:
+            entries = self.cache.listing(self.shell.fs, directory or ".")
+        except OSError:
+            return []
+        show_hidden = prefix.startswith(".")
+        candidates = []
+        # Листинг отсортирован: имена с префиксом идут подряд
+        for index in range(bisect.bisect_left(entries, (prefix,)), len(entries)):
+            name, is_dir = entries[index]
+            if not name.startswith(prefix):
+                break
+            if show_hidden or not name.startswith("."):
+                candidate = posixpath.join(directory, name) if directory else name
+                candidates.append(candidate + "/" if is_dir else candidate)
+        return candidates
+
+    def complete(self, line):
+        """Дополнение конца line: (начало слова, [варианты слова целиком])"""
+        start, command_position = current_word(line)
+        word = line[start:]
+        if command_position and "/" not in word:
+            return start, self.commands(word)
+        return start, self.paths(word)
+
+
+def common_prefix(candidates):
+    return os.path.commonprefix(candidates) if candidates else ""
+
@@ -0,0 +1,146 @@
+"""
+Раскрытие аргументов команд: фигурные скобки ({a,b}, {1..10}) и шаблоны имен (*, ?, [...])
+"""
+
+import fnmatch
+import re
+
+
+# Предел числа слов после раскрытия: опечатка вроде {1..100000000} не должна съесть память
+MAX_WORDS = 1000000
+SEQUENCE = re.compile(r"(-?\d+)\.\.(-?\d+)(?:\.\.(-?\d+))?|([A-Za-z])\.\.([A-Za-z])(?:\.\.(-?\d+))?")
+
+
+def check_count(count):
+    if count > MAX_WORDS:
+        raise ValueError(f"раскрытие дает больше {MAX_WORDS} слов")
+
+
+def brace_sequence(body):
+    """Слова последовательности {1..10}, {01..10..2}, {a..e}; None - не последовательность"""
+    match = SEQUENCE.fullmatch(body)
+    if match is None:
+        return None
+    first, last, step, first_char, last_char, char_step = match.groups()
+    step = abs(int(step or char_step or 1)) or 1
+    if first is None:
+        start, end = ord(first_char), ord(last_char)
+    else:
+        start, end = int(first), int(last)
+    if start > end:
+        step = -step
+    check_count(abs(end - start) // abs(step) + 1)
+    values = range(start, end + (1 if step > 0 else -1), step)
+    if first is None:
+        return [chr(value) for value in values]
+    # Ведущий ноль у любого из концов задает ширину с дополнением нулями
+    if (first.lstrip("-").startswith("0") and len(first.lstrip("-")) > 1
+            or last.lstrip("-").startswith("0") and len(last.lstrip("-")) > 1):
+        width = max(len(first), len(last))
+        return [f"{value:0{width}d}" for value in values]
+    return [str(value) for value in values]
+
+
+def expand_braces(word):
+    """Раскрытие фигурных скобок слева направо, включая вложенные; без них - [word]"""
+    start = word.find("{")
+    while start != -1:
+        depth = 0
+        commas = []
+        end = None
+        for index in range(start, len(word)):
+            char = word[index]
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if not depth:
+                    end = index
+                    break
+            elif char == "," and depth == 1:
+                commas.append(index)
+        if end is None:
+            break
+        body = word[start + 1:end]
+        if commas:
+            bounds = [start] + commas + [end]
+            alternatives = [word[a + 1:b] for a, b in zip(bounds, bounds[1:])]
+        else:
+            alternatives = brace_sequence(body)
+        if alternatives is not None:
+            prefix = word[:start]
+            suffixes = expand_braces(word[end + 1:])
+            middles = [middle for alternative in alternatives for middle in expand_braces(alternative)]
+            check_count(len(middles) * len(suffixes))
+            return [prefix + middle + suffix for middle in middles for suffix in suffixes]
+        # Скобки без запятой и последовательности ({}, {x}) остаются как есть
+        start = word.find("{", start + 1)
+    return [word]
+
+
+def has_magic(word):
+    return "*" in word or "?" in word or "[" in word
+
+
+def join(base, name):
+    if not base:
+        return name
+    return base + name if base.endswith("/") else f"{base}/{name}"
+
+
+def glob_paths(fs, pattern):
+    """Пути файловой системы fs, подходящие под шаблон, в алфавитном порядке
+
+    Шаблон разбирается по компонентам пути: компонент без *?[ проверяется
+    одним stat, с ними - сравнивается с листингом директории. Скрытые имена
+    подходят, только если компонент шаблона начинается с точки.
+    """
+    parts = [part for part in pattern.split("/") if part]
+    found = ["/" if pattern.startswith("/") else ""]
+    for number, part in enumerate(parts):
+        last = number == len(parts) - 1
+        matches = []
+        if not has_magic(part):
+            for base in found:
+                path = join(base, part)
+                if fs.lexists(path) if last else fs.isdir(path):
+                    matches.append(path)
+        else:
+            regex = re.compile(fnmatch.translate(part))
+            for base in found:
+                try:
+                    with fs.scandir(base or ".") as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.name.startswith(".") and not part.startswith("."):
+                        continue
+                    if regex.match(entry.name) and (last or entry.is_dir()):
+                        matches.append(join(base, entry.name))
+        found = matches
+        if not found:
+            return []
+    if pattern.endswith("/"):
+        found = [path if path.endswith("/") else path + "/" for path in found]
+    return sorted(found)
+
+
+def expand_words(fs, words, quoted=None):
+    """Раскрытие аргументов: скобки, затем шаблоны по fs; слова в кавычках не трогаются
+
+    Шаблон без совпадений остается словом как есть (как в bash).
+    """
+    result = []
+    for index, word in enumerate(words):
+        if quoted is not None and quoted[index]:
+            result.append(word)
+            continue
+        for item in expand_braces(word) if "{" in word else (word,):
+            matches = glob_paths(fs, item) if has_magic(item) else None
+            if matches:
+                result.extend(matches)
+            else:
+                result.append(item)
+        check_count(len(result))
+    return result
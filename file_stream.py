@@ -0,0 +1,233 @@
+"""
+Потоковое чтение файлов для команд cat, head и tail
+"""
+
+import codecs
+import errno
+import importlib
+import os
+from collections import deque
+
+
+CHUNK_SIZE = 64 * 1024
+# Сигнатуры сжатых форматов в начале файла и модули их распаковки
+COMPRESSION_MAGIC = ((b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "lzma"))
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE, opener=open):
+    """Чтение файла блоками фиксированного размера в один переиспользуемый буфер
+
+    opener - функция открытия с сигнатурой open (например, FileSystem.open).
+    """
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with opener(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            yield view[:n]
+
+
+def detect_compression(head):
+    """Формат сжатия по первым байтам файла: "gzip", "bz2", "lzma" или None"""
+    for magic, kind in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def open_decompressor(kind, f):
+    """Объект чтения распакованных данных поверх открытого файла f"""
+    module = importlib.import_module(kind)
+    if kind == "gzip":
+        return module.GzipFile(fileobj=f, mode='rb')
+    if kind == "bz2":
+        return module.BZ2File(f)
+    return module.LZMAFile(f)
+
+
+def iter_decompressed(path, chunk_size=CHUNK_SIZE, opener=open):
+    """Чтение файла блоками с потоковой распаковкой gzip, bz2 и xz
+
+    Формат определяется по сигнатуре, а не по расширению; несжатый файл
+    читается как есть. Поврежденные сжатые данные - OSError с EINVAL.
+    """
+    with opener(path, 'rb', buffering=0) as f:
+        head = f.read(6)
+        kind = detect_compression(head)
+        if kind is None:
+            if head:
+                yield head
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        f.seek(0)
+        try:
+            with open_decompressor(kind, f) as stream:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        except OSError as e:
+            if e.errno is not None:
+                raise
+            raise OSError(errno.EINVAL, f"поврежденные сжатые данные ({kind}): {str(e)}")
+        except Exception as e:
+            # Оборванный поток - EOFError, ошибки xz - lzma.LZMAError
+            raise OSError(errno.EINVAL, f"поврежденные сжатые данные ({kind}): {str(e)}")
+
+
+def decode_chunks(chunks, encoding='utf-8'):
+    """Инкрементальное декодирование блоков
+
+    Байты, не образующие UTF-8, становятся суррогатами (surrogateescape):
+    запись с тем же обработчиком ошибок (перенаправление '>') возвращает
+    исходные байты, поэтому двоичные данные проходят конвейер без порчи.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='surrogateescape')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_text(path, chunk_size=CHUNK_SIZE, encoding='utf-8', opener=open):
+    """Потоковое чтение файла как текста; память ограничена размером блока"""
+    return decode_chunks(iter_chunks(path, chunk_size, opener), encoding)
+
+
+def head_text(chunks, count):
+    """Первые count строк потока текста; дальше поток не читается"""
+    if count <= 0:
+        return
+    for text in chunks:
+        start = 0
+        while True:
+            pos = text.find("\n", start)
+            if pos == -1:
+                break
+            count -= 1
+            if not count:
+                yield text[:pos + 1]
+                return
+            start = pos + 1
+        yield text
+
+
+def head_lines(path, count, chunk_size=CHUNK_SIZE, encoding='utf-8', opener=open):
+    """Первые count строк файла; чтение прекращается, как только они найдены"""
+    return head_text(iter_text(path, chunk_size, encoding, opener), count)
+
+
+def iter_lines(chunks):
+    """Разбиение потока текста на строки (с переводом строки в конце каждой)"""
+    carry = ""
+    for text in chunks:
+        if carry:
+            text = carry + text
+        lines = text.split("\n")
+        carry = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if carry:
+        yield carry
+
+
+def tail_text(chunks, count):
+    """Последние count строк потока; в памяти держится не больше count строк"""
+    if count <= 0:
+        return ""
+    return "".join(deque(iter_lines(chunks), maxlen=count))
+
+
+def tail_lines(path, count, chunk_size=CHUNK_SIZE, encoding='utf-8', opener=open):
+    """Последние count строк файла: блоки читаются с конца, а не сканируется весь файл"""
+    if count <= 0:
+        return ""
+    blocks = []
+    newlines = 0
+    with opener(path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        # Завершающий перевод строки не начинает новую строку
+        if pos:
+            f.seek(pos - 1)
+            if f.read(1) == b"\n":
+                newlines = -1
+        while pos > 0 and newlines < count:
+            size = min(chunk_size, pos)
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            newlines += block.count(b"\n")
+            blocks.append(block)
+    data = b"".join(reversed(blocks))
+    if newlines >= count:
+        # Отбрасываем лишние строки в начале прочитанного
+        cut = len(data)
+        end = len(data) - 1 if data.endswith(b"\n") else len(data)
+        for _ in range(count):
+            cut = data.rfind(b"\n", 0, end)
+            end = cut
+        data = data[cut + 1:]
+    return data.decode(encoding, errors='surrogateescape')
+
+
+class FileFollower:
+    """Слежение за дописываемым файлом (tail -f) без блокировки вызывающего"""
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.position = self.file.seek(0, os.SEEK_END)
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='surrogateescape')
+
+    def poll(self, chunk_size=CHUNK_SIZE):
+        """Новый текст, появившийся с прошлого вызова, или пустая строка"""
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.position:
+            # Файл усечен - начинаем читать сначала
+            self.position = self.file.seek(0)
+            self.decoder.reset()
+        parts = []
+        while True:
+            chunk = self.file.read(chunk_size)
+            if not chunk:
+                break
+            self.position += len(chunk)
+            parts.append(self.decoder.decode(chunk))
+        return "".join(parts)
+
+    def close(self):
+        self.file.close()
+
+
+def parse_line_count_args(args, default=10):
+    """Разбор аргументов head/tail: -n N, -N и -f; возвращает (count, follow, paths)"""
+    count = default
+    follow = False
+    paths = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-n":
+            if i + 1 >= len(args):
+                raise ValueError("Опция -n требует число строк")
+            count = int(args[i + 1])
+            i += 1
+        elif arg.startswith("-n"):
+            count = int(arg[2:])
+        elif arg == "-f":
+            follow = True
+        elif arg.startswith("-") and arg[1:].isdigit():
+            count = int(arg[1:])
+        else:
+            paths.append(arg)
+        i += 1
+    return count, follow, paths
@@ -0,0 +1,283 @@
+"""
+История команд: файл с дозаписью, загрузка хвоста в фоне и поиск по индексу триграмм
+"""
+
+import itertools
+import os
+import threading
+import time
+from array import array
+
+
+# Сколько последних байтов файла загружается при запуске
+LOAD_BYTES = 8 * 1024 * 1024
+# Файл больше этого размера при загрузке сжимается до загруженного хвоста
+COMPACT_BYTES = 4 * LOAD_BYTES
+# fsync - не на каждую команду, а раз в столько команд или секунд
+SYNC_BATCH = 32
+SYNC_INTERVAL = 2.0
+
+
+def default_history_path():
+    path = os.environ.get("MYOS_HISTFILE")
+    if path:
+        return path
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+    return os.path.join(state_home, "myos", "history")
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def index_line(index, number, line):
+    """Добавление команды с номером number в списки триграмм (номера в них растут)"""
+    for gram in trigrams(line):
+        postings = index.get(gram)
+        if postings is None:
+            index[gram] = postings = array("I")
+        postings.append(number)
+
+
+class History:
+    """История команд одного процесса
+
+    Команды дописываются в файл сразу (O_APPEND), а fsync делается
+    пачками. При запуске файл не читается целиком: фоновый поток загружает
+    последние LOAD_BYTES и затем строит индекс триграмм по различным
+    командам, так что поиск (Ctrl+R, history -s) не перебирает всю историю.
+    До окончания загрузки поиск работает перебором уже введенных команд.
+
+    Различные команды нумеруются в порядке последнего использования:
+    повтор команды получает новый номер, а старый освобождается (None в
+    lines). Поэтому списки триграмм - array('I') возрастающих номеров, и
+    обход списка с конца идет от новых команд к старым.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        self.entries = []
+        # Номер различной команды -> команда (None - команда повторена позже)
+        # и номер ее последнего вхождения в entries; ids - обратное отображение
+        self.lines = []
+        self.positions = array("I")
+        self.ids = {}
+        # Триграмма -> array('I') номеров команд; None - индекс еще не построен
+        self.index = None
+        self.early = []
+        self.lock = threading.RLock()
+        self.loaded = threading.Event()
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+        self.fd = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            # Граница загрузки: все, что дописано после нее, уже есть в early
+            self.load_end = os.fstat(self.fd).st_size
+        except OSError:
+            self.load_end = 0
+
+    def load_async(self):
+        """Загрузка хвоста файла и построение индекса в фоновом потоке"""
+        threading.Thread(target=self.load, name="history-load", daemon=True).start()
+
+    def load(self):
+        start = max(0, self.load_end - LOAD_BYTES)
+        lines = []
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read(self.load_end - start)
+            lines = data.decode("utf-8", "surrogateescape").split("\n")
+            # Первая строка хвоста может быть оборвана, последняя - пустая после '\n'
+            if start:
+                lines = lines[1:]
+            lines = [line for line in lines if line]
+        except OSError:
+            pass
+        latest = {}
+        for position, line in enumerate(lines):
+            latest.pop(line, None)
+            latest[line] = position
+        with self.lock:
+            self.entries = lines + self.early
+            # Команды, введенные до окончания загрузки
+            for position in range(len(lines), len(self.entries)):
+                line = self.entries[position]
+                latest.pop(line, None)
+                latest[line] = position
+            self.early = None
+            self.lines = list(latest)
+            self.positions = array("I", latest.values())
+            self.ids = {line: number for number, line in enumerate(self.lines)}
+            self.loaded.set()
+        if self.load_end > COMPACT_BYTES:
+            self.compact(start)
+        self.build_index()
+
+    def build_index(self):
+        index = {}
+        with self.lock:
+            lines = self.lines
+            count = len(lines)
+        for number in range(count):
+            line = lines[number]
+            if line is not None:
+                index_line(index, number, line)
+        with self.lock:
+            # После history -c списки заменены, а индекс уже пустой и актуальный
+            if self.lines is not lines:
+                return
+            # Команды, добавленные во время построения
+            for number in range(count, len(lines)):
+                if lines[number] is not None:
+                    index_line(index, number, lines[number])
+            self.index = index
+
+    def compact(self, start):
+        """Перезапись файла начиная со start; старое начало теряется"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self.lock:
+            try:
+                with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+                    src.seek(start)
+                    src.readline()
+                    while True:
+                        chunk = src.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                return
+            if self.fd is not None:
+                os.close(self.fd)
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+    def add(self, line):
+        """Добавление команды; повтор предыдущей команды не записывается"""
+        line = " ".join(line.split("\n")).strip()
+        if not line:
+            return
+        with self.lock:
+            entries = self.entries if self.early is None else self.early
+            if entries and entries[-1] == line:
+                return
+            entries.append(line)
+            if self.early is None:
+                previous = self.ids.get(line)
+                if previous is not None:
+                    self.lines[previous] = None
+                number = self.ids[line] = len(self.lines)
+                self.lines.append(line)
+                self.positions.append(len(entries) - 1)
+                if self.index is not None:
+                    index_line(self.index, number, line)
+            if self.fd is None:
+                return
+            try:
+                os.write(self.fd, (line + "\n").encode("utf-8", "surrogateescape"))
+                self.unsynced += 1
+                if self.unsynced >= SYNC_BATCH or time.monotonic() - self.synced_at >= SYNC_INTERVAL:
+                    self.sync()
+            except OSError:
+                pass
+
+    def sync(self):
+        with self.lock:
+            if self.fd is not None and self.unsynced:
+                os.fsync(self.fd)
+            self.unsynced = 0
+            self.synced_at = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.fd is None:
+                return
+            try:
+                self.sync()
+            except OSError:
+                pass
+            os.close(self.fd)
+            self.fd = None
+
+    def clear(self):
+        """Очистка истории в памяти и в файле"""
+        self.loaded.wait()
+        with self.lock:
+            self.entries = []
+            self.lines = []
+            self.positions = array("I")
+            self.ids = {}
+            self.index = {}
+            if self.fd is not None:
+                os.ftruncate(self.fd, 0)
+
+    def commands(self, wait=True):
+        """Список команд (загруженный хвост и новые), от старых к новым
+
+        wait=False - не ждать загрузки: до ее окончания это только команды,
+        введенные в этом сеансе.
+        """
+        if wait:
+            self.loaded.wait()
+        with self.lock:
+            return list(self.entries if self.early is None else self.early)
+
+    def recent(self):
+        """Различные команды от новых к старым: (номер вхождения, команда)"""
+        if self.early is not None:
+            seen = set()
+            for position in range(len(self.early) - 1, -1, -1):
+                line = self.early[position]
+                if line not in seen:
+                    seen.add(line)
+                    yield position, line
+            return
+        lines = self.lines
+        for number in range(len(lines) - 1, -1, -1):
+            line = lines[number]
+            if line is not None:
+                yield self.positions[number], line
+
+    def scan(self, text, limit):
+        found = (item for item in self.recent() if text in item[1])
+        return list(itertools.islice(found, limit))
+
+    def matches(self, text, limit=None, wait=True):
+        """Различные команды, содержащие text, от новых к старым: [(номер, команда)]
+
+        limit - сколько совпадений нужно: обход останавливается на нем.
+        wait=False - не ждать загрузки, а искать среди уже введенных команд.
+        """
+        if wait:
+            self.loaded.wait()
+        with self.lock:
+            if self.index is None or len(text) < 3:
+                return self.scan(text, limit)
+            lines = self.lines
+            positions = self.positions
+            shortest = None
+            for gram in trigrams(text):
+                postings = self.index.get(gram)
+                if not postings:
+                    return []
+                if shortest is None or len(postings) < len(shortest):
+                    shortest = postings
+        # Проверка кандидатов самой редкой триграммы от новых к старым - без блокировки:
+        # списки только дописываются, а history -c заменяет их новыми
+        result = []
+        for number in reversed(shortest):
+            line = lines[number]
+            if line is not None and text in line:
+                result.append((positions[number], line))
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
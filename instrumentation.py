@@ -0,0 +1,183 @@
+"""
+Необязательная инструментация команд: задержки, счетчики, объем вывода и профили
+"""
+
+import bisect
+import io
+import threading
+import time
+
+
+# Верхние границы корзин гистограммы задержек, миллисекунды
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+# Строк в сохраненном отчете профилировщика
+PROFILE_LINES = 25
+
+
+class CommandStats:
+    """Статистика одной команды (или конвейера): вызовы, ошибки, вывод и гистограмма задержек"""
+
+    __slots__ = ("calls", "errors", "chars", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.chars = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        # Последняя корзина - задержки больше последней границы
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, elapsed, chars, failed):
+        self.calls += 1
+        self.errors += failed
+        self.chars += chars
+        self.total += elapsed
+        self.min = elapsed if self.min is None else min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed * 1000)] += 1
+
+    def percentile(self, fraction):
+        """Оценка перцентиля по гистограмме (верхняя граница корзины), секунды"""
+        need = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= need:
+                if index < len(BUCKET_BOUNDS_MS):
+                    return min(BUCKET_BOUNDS_MS[index] / 1000, self.max)
+                return self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "chars": self.chars,
+            "total_s": self.total,
+            "min_s": self.min or 0.0,
+            "max_s": self.max,
+            "p50_s": self.percentile(0.5),
+            "p95_s": self.percentile(0.95),
+            "histogram_ms": {
+                (str(bound) if index < len(BUCKET_BOUNDS_MS) else "inf"): count
+                for index, (bound, count) in enumerate(zip(BUCKET_BOUNDS_MS + (None,), self.buckets))
+            },
+        }
+
+
+class Instrumentation:
+    """Сборщик статистики выполнения конвейеров оболочки
+
+    Включается командой stats on или переменной окружения MYOS_STATS.
+    Режим profile ("cpu" - cProfile, "memory" - tracemalloc) снимает
+    профиль каждой команды; профилировщики глобальны для процесса, поэтому
+    одновременно профилируется только одна команда, остальные просто
+    измеряются.
+    """
+
+    def __init__(self, profile=None):
+        self.profile = profile
+        self.commands = {}
+        self.render = CommandStats()
+        self.last_profile = None
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.profile_lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.commands = {}
+            self.render = CommandStats()
+            self.last_profile = None
+            self.started = time.time()
+
+    def record(self, name, elapsed, chars, exit_code):
+        with self.lock:
+            stats = self.commands.get(name)
+            if stats is None:
+                stats = self.commands[name] = CommandStats()
+            stats.add(elapsed, chars, exit_code != 0)
+
+    def record_render(self, elapsed, chars):
+        """Время вставки вывода в виджет (графическая версия)"""
+        with self.lock:
+            self.render.add(elapsed, chars, False)
+
+    def measure(self, run_stages, stages, cancel_event):
+        """Выполнение конвейера с замером; run_stages возвращает (код возврата, символов вывода)"""
+        name = " | ".join(stage.name for stage in stages)
+        profile = self.profile
+        if profile and self.profile_lock.acquire(blocking=False):
+            try:
+                return self.measure_profiled(name, profile, run_stages, stages, cancel_event)
+            finally:
+                self.profile_lock.release()
+        started = time.perf_counter()
+        exit_code, chars = run_stages(stages, cancel_event)
+        self.record(name, time.perf_counter() - started, chars, exit_code)
+        return exit_code
+
+    def measure_profiled(self, name, profile, run_stages, stages, cancel_event):
+        if profile == "cpu":
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                exit_code, chars = run_stages(stages, cancel_event)
+            finally:
+                profiler.disable()
+                elapsed = time.perf_counter() - started
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            text = report.getvalue()
+        else:
+            import tracemalloc
+            tracemalloc.start()
+            started = time.perf_counter()
+            try:
+                exit_code, chars = run_stages(stages, cancel_event)
+            finally:
+                elapsed = time.perf_counter() - started
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            lines = [f"Память: сейчас {current} байт, пик {peak} байт\n"]
+            for statistic in snapshot.statistics("lineno")[:PROFILE_LINES]:
+                lines.append(f"{statistic}\n")
+            text = "".join(lines)
+        self.record(name, elapsed, chars, exit_code)
+        with self.lock:
+            self.last_profile = (name, profile, text)
+        return exit_code
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "uptime_s": time.time() - self.started,
+                "profile": self.profile,
+                "commands": {name: stats.to_dict() for name, stats in sorted(self.commands.items())},
+                "render": self.render.to_dict(),
+            }
+
+    def format(self):
+        """Таблица статистики для вывода командой stats"""
+        def row(name, stats):
+            return (f"{name[:24]:<24} {stats.calls:>7} {stats.errors:>6} {stats.total / stats.calls * 1000:>9.1f} "
+                    f"{stats.percentile(0.5) * 1000:>9.1f} {stats.percentile(0.95) * 1000:>9.1f} "
+                    f"{stats.max * 1000:>9.1f} {stats.chars:>10}\n")
+
+        with self.lock:
+            lines = [f"{'КОМАНДА':<24} {'ВЫЗОВЫ':>7} {'ОШИБКИ':>6} {'СРЕД,мс':>9} {'P50,мс':>9} "
+                     f"{'P95,мс':>9} {'МАКС,мс':>9} {'СИМВОЛЫ':>10}\n"]
+            for name, stats in sorted(self.commands.items(), key=lambda item: -item[1].total):
+                lines.append(row(name, stats))
+            if self.render.calls:
+                lines.append(row("[вывод в виджет]", self.render))
+            if self.profile:
+                lines.append(f"Профилирование: {self.profile}\n")
+        return "".join(lines)
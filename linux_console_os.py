@@ -4,307 +4,294 @@
 """
 
 import os
-import subprocess
 import sys
-import shlex
-from datetime import datetime
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+from shell_core import Shell, StdoutSink, BufferSink
+from startup import mark_ready
 
 
 class LinuxConsoleOS:
-    def __init__(self):
+    # Команды, меняющие состояние сеанса: при параллельном выполнении сценария
+    # они выполняются только после завершения всех предыдущих строк
+    BARRIER_COMMANDS = {"cd", "exit", "quit", "logout"}
+    # Сколько последних команд истории передается readline (стрелки и Ctrl+R)
+    READLINE_ENTRIES = 10000
+    
+    def __init__(self, banner=True, fs=None, history=None):
         self.running = True
-        self.current_dir = os.getcwd()
+        self.shell = Shell(StdoutSink(), fs=fs)
+        self.shell.history = history
+        self.current_dir = self.shell.fs.getcwd()
         self.prompt = f"user@console-os:~$ "
         
+        if not banner:
+            return
         print("Добро пожаловать в консольную Linux-подобную систему!")
         print(f"Текущая директория: {self.current_dir}")
-        print("Доступные команды: ls, pwd, cd, echo, mkdir, touch, cat, rm, rmdir, ps, df, free, date, help, clear, exit")
+        print(f"Доступные команды: {', '.join(command.name for command in self.shell.registry)}")
         print("Для получения справки по команде введите 'help <команда>'")
     
     def run(self):
-        while self.running:
-            try:
-                command = input(self.prompt).strip()
-                if command:
-                    self.execute_command(command)
-            except KeyboardInterrupt:
-                print("\nВыход из системы...")
-                break
-            except EOFError:
-                print("\nВыход из системы...")
-                break
+        history = self.shell.history
+        readline = load_readline()
+        if readline is not None:
+            self.setup_completion(readline)
+        history_pending = readline is not None and history is not None
+        # Дальше только приглашение: для --startup-profile запуск закончен
+        mark_ready()
+        try:
+            while self.running:
+                if history_pending and history.loaded.is_set():
+                    # История загружается в фоне; как только готова - передаем ее readline
+                    readline.clear_history()
+                    for line in history.commands()[-self.READLINE_ENTRIES:]:
+                        readline.add_history(line)
+                    history_pending = False
+                try:
+                    command = input(self.prompt).strip()
+                    if command:
+                        if history is not None:
+                            history.add(command)
+                        self.execute_command(command)
+                except KeyboardInterrupt:
+                    print("\nВыход из системы...")
+                    break
+                except EOFError:
+                    print("\nВыход из системы...")
+                    break
+        finally:
+            if history is not None:
+                history.close()
     
-    def execute_command(self, command):
-        """Выполнение команды"""
-        parts = shlex.split(command)
-        if not parts:
-            return
+    def setup_completion(self, readline):
+        """Tab в input(): имена команд и пути текущей файловой системы сеанса"""
+        from completion import Completer, WORD_BREAKS
         
-        cmd = parts[0]
-        args = parts[1:] if len(parts) > 1 else []
+        completer = Completer(self.shell)
+        matches = []
         
-        # Обработка команд
-        if cmd == "ls":
-            self.ls_command(args)
-        elif cmd == "pwd":
-            self.pwd_command()
-        elif cmd == "cd":
-            self.cd_command(args)
-        elif cmd == "echo":
-            self.echo_command(args)
-        elif cmd == "mkdir":
-            self.mkdir_command(args)
-        elif cmd == "touch":
-            self.touch_command(args)
-        elif cmd == "cat":
-            self.cat_command(args)
-        elif cmd == "rm":
-            self.rm_command(args)
-        elif cmd == "rmdir":
-            self.rmdir_command(args)
-        elif cmd == "ps":
-            self.ps_command()
-        elif cmd == "df":
-            self.df_command()
-        elif cmd == "free":
-            self.free_command()
-        elif cmd == "date":
-            self.date_command()
-        elif cmd == "help":
-            self.help_command(args)
-        elif cmd == "clear":
-            self.clear_command()
-        elif cmd == "exit":
-            self.exit_command()
+        def complete(text, state):
+            if state == 0:
+                line = readline.get_line_buffer()[:readline.get_endidx()]
+                matches[:] = completer.complete(line)[1]
+            return matches[state] if state < len(matches) else None
+        
+        readline.set_completer(complete)
+        readline.set_completer_delims(WORD_BREAKS)
+        if "libedit" in (readline.__doc__ or ""):
+            readline.parse_and_bind("bind ^I rl_complete")
         else:
-            print(f"Команда не найдена: {cmd}")
+            readline.parse_and_bind("tab: complete")
     
-    def ls_command(self, args):
-        """Команда ls - список файлов и директорий"""
-        try:
-            path = args[0] if args else "."
-            items = os.listdir(path)
-            items.sort()
-            for item in items:
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    print(f"[DIR]  {item}/")
-                else:
-                    print(f"[FILE] {item}")
-        except FileNotFoundError:
-            print("Директория не найдена")
-        except PermissionError:
-            print("Нет доступа к директории")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
-    
-    def pwd_command(self):
-        """Команда pwd - текущая директория"""
-        print(os.getcwd())
-    
-    def cd_command(self, args):
-        """Команда cd - смена директории"""
-        if not args:
-            print("Нужно указать путь")
-            return
+    def execute_command(self, command):
+        """Выполнение команды"""
+        exit_code = self.shell.execute(command)
+        self.running = self.shell.running
         
-        try:
-            os.chdir(args[0])
-            self.current_dir = os.getcwd()
+        current_dir = self.shell.fs.getcwd()
+        if current_dir != self.current_dir:
+            self.current_dir = current_dir
             self.prompt = f"user@console-os:{os.path.basename(self.current_dir)}$ "
-        except FileNotFoundError:
-            print("Директория не найдена")
-        except PermissionError:
-            print("Нет доступа к директории")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
-    
-    def echo_command(self, args):
-        """Команда echo - вывод текста"""
-        print(" ".join(args))
+        return exit_code
     
-    def mkdir_command(self, args):
-        """Команда mkdir - создание директории"""
-        if not args:
-            print("Нужно указать имя директории")
-            return
+    def run_script(self, lines, jobs=1, errexit=False):
+        """Выполнение строк сценария без интерактивного цикла; возвращает код возврата
         
-        try:
-            os.mkdir(args[0])
-            print(f"Директория '{args[0]}' создана")
-        except FileExistsError:
-            print(f"Директория '{args[0]}' уже существует")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
+        Пустые строки и комментарии (#) пропускаются. Код возврата - код
+        последней выполненной строки, с errexit - первой неудачной.
+        """
+        commands = [line.strip() for line in lines]
+        commands = [line for line in commands if line and not line.startswith("#")]
+        if jobs > 1:
+            return self.run_parallel(commands, jobs, errexit)
+        exit_code = 0
+        for command in commands:
+            exit_code = self.execute_command(command)
+            if exit_code == 130 or not self.running or (errexit and exit_code):
+                break
+        return exit_code
     
-    def touch_command(self, args):
-        """Команда touch - создание файла"""
-        if not args:
-            print("Нужно указать имя файла")
-            return
-        
+    def is_barrier(self, command):
         try:
-            with open(args[0], 'a'):
-                pass
-            print(f"Файл '{args[0]}' создан")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
+            stages = self.shell.parse(command)
+        except ValueError:
+            return False
+        return any(stage.name in self.BARRIER_COMMANDS for stage in stages)
     
-    def cat_command(self, args):
-        """Команда cat - вывод содержимого файла"""
-        if not args:
-            print("Нужно указать имя файла")
-            return
+    def run_parallel(self, commands, jobs, errexit):
+        """Параллельное выполнение независимых строк; вывод - в порядке строк
         
-        try:
-            with open(args[0], 'r', encoding='utf-8') as f:
-                content = f.read()
-                print(content)
-        except FileNotFoundError:
-            print("Файл не найден")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
-    
-    def rm_command(self, args):
-        """Команда rm - удаление файла или директории"""
-        if not args:
-            print("Нужно указать имя файла/директории")
-            return
+        Каждая строка выполняется со своим буфером вывода. В полете держится
+        ограниченное число строк, поэтому сценарий из тысяч команд не
+        накапливает весь вывод в памяти.
+        """
+        from concurrent.futures import ThreadPoolExecutor
         
-        try:
-            if os.path.isfile(args[0]):
-                os.remove(args[0])
-                print(f"Файл '{args[0]}' удален")
-            elif os.path.isdir(args[0]):
-                import shutil
-                shutil.rmtree(args[0])
-                print(f"Директория '{args[0]}' удалена")
-            else:
-                print(f"'{args[0]}' не существует")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
-    
-    def rmdir_command(self, args):
-        """Команда rmdir - удаление пустой директории"""
-        if not args:
-            print("Нужно указать имя директории")
-            return
+        cancel_event = threading.Event()
         
-        try:
-            os.rmdir(args[0])
-            print(f"Директория '{args[0]}' удалена")
-        except FileNotFoundError:
-            print("Директория не найдена")
-        except OSError:
-            print(f"Директория '{args[0]}' не пуста")
-        except Exception as e:
-            print(f"Ошибка: {str(e)}")
-    
-    def ps_command(self):
-        """Команда ps - список процессов (упрощенная)"""
-        print("PID    CMD")
-        print(f"{os.getpid():<6} python3 linux_console_os.py")
-        # В реальной системе здесь был бы список всех запущенных процессов
-    
-    def df_command(self):
-        """Команда df - информация о дисковом пространстве"""
-        import shutil
-        total, used, free = shutil.disk_usage("/")
-        total_gb = total // (1024**3)
-        used_gb = used // (1024**3)
-        free_gb = free // (1024**3)
+        def run_line(command):
+            sink = BufferSink()
+            shell = Shell(sink, self.shell.registry, self.shell.fs)
+            shell.instrumentation = self.shell.instrumentation
+            exit_code = shell.execute(command, cancel_event)
+            return exit_code, sink.getvalue()
         
-        print("Файловая система     Размер Использовано  Доступно Использовано% Примонтировано на")
-        print(f"/dev/sda1             {total_gb}G      {used_gb}G      {free_gb}G        {int(used/total*100)}% /")
-    
-    def free_command(self):
-        """Команда free - информация об использовании памяти"""
-        import psutil
-        memory = psutil.virtual_memory()
-        total_mb = memory.total // (1024**2)
-        available_mb = memory.available // (1024**2)
-        used_mb = memory.used // (1024**2)
-        percent_used = memory.percent
+        exit_code = 0
+        pending = deque()
+        sink = self.shell.sink
         
-        print("              Общая     Использованная    Доступная     Доступно%")
-        print(f"Память:      {total_mb:>6}M      {used_mb:>6}M      {available_mb:>6}M       {percent_used:>4}%")
-    
-    def date_command(self):
-        """Команда date - текущая дата и время"""
-        print(f"{datetime.now()}")
-    
-    def help_command(self, args):
-        """Команда help - справка по доступным командам"""
-        if not args:
-            print("Доступные команды:")
-            print("  ls [path]     - список файлов и директорий")
-            print("  pwd           - текущая директория")
-            print("  cd <path>     - сменить директорию")
-            print("  echo <text>   - вывести текст")
-            print("  mkdir <name>  - создать директорию")
-            print("  touch <file>  - создать файл")
-            print("  cat <file>    - вывести содержимое файла")
-            print("  rm <file/dir> - удалить файл или директорию")
-            print("  rmdir <name>  - удалить пустую директорию")
-            print("  ps            - список процессов")
-            print("  df            - информация о дисковом пространстве")
-            print("  free          - информация об использовании памяти")
-            print("  date          - текущая дата и время")
-            print("  help          - эта справка")
-            print("  help <cmd>    - справка по конкретной команде")
-            print("  clear         - очистить экран")
-            print("  exit          - выйти из системы")
+        def collect():
+            nonlocal exit_code
+            exit_code, output = pending.popleft().result()
+            sink.write(output)
+            return exit_code == 130 or (errexit and exit_code)
+        
+        executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="script")
+        try:
+            for command in commands:
+                if self.is_barrier(command):
+                    # Дожидаемся предыдущих строк, затем выполняем строку здесь
+                    while pending:
+                        if collect():
+                            return exit_code
+                    exit_code = self.execute_command(command)
+                    if exit_code == 130 or not self.running or (errexit and exit_code):
+                        return exit_code
+                    continue
+                pending.append(executor.submit(run_line, command))
+                while len(pending) >= jobs * 4 or (pending and pending[0].done()):
+                    if collect():
+                        return exit_code
+            while pending:
+                if collect():
+                    return exit_code
+            return exit_code
+        except KeyboardInterrupt:
+            sink.write("^C\n")
+            return 130
+        finally:
+            cancel_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            sink.flush()
+
+
+def load_readline():
+    """Модуль readline для истории, Ctrl+R и Tab в input(); None, если его нет (Windows)"""
+    try:
+        import readline
+    except ImportError:
+        return None
+    return readline
+
+
+def read_script(path):
+    """Строки сценария из файла или, для '-', из стандартного ввода целиком"""
+    if path == "-":
+        return sys.stdin.read().splitlines()
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+USAGE = """Использование: linux_console_os.py [-c КОМАНДА] [-j N] [-e] [--memfs] [--image ОБРАЗ]
+                            [--startup-profile] [сценарий]
+
+  сценарий           файл сценария ('-' - стандартный ввод)
+  -c КОМАНДА         выполнить команду (или несколько строк) и выйти
+  -j, --jobs N       выполнять независимые строки сценария параллельно в N потоках
+  -e                 остановиться на первой команде с ненулевым кодом возврата
+  --memfs            изолированная файловая система в памяти вместо файлов хоста
+  --image ОБРАЗ      файловая система в памяти, загруженная из образа (vfs save)
+  --startup-profile  замерить запуск: время до готовности и разбивка по импортам
+"""
+
+
+def parse_options(argv):
+    """Разбор аргументов вручную: импорт argparse дольше запуска всей оболочки"""
+    options = SimpleNamespace(command=None, script=None, jobs=1, errexit=False, memfs=False, image=None,
+                              startup_profile=False)
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-h", "--help"):
+            sys.stdout.write(USAGE)
+            sys.exit(0)
+        elif arg == "-c":
+            options.command = next(args, None)
+            if options.command is None:
+                raise ValueError("после -c нужна команда")
+        elif arg in ("-j", "--jobs") or arg.startswith("--jobs="):
+            value = arg.partition("=")[2] if "=" in arg else next(args, None)
+            try:
+                options.jobs = int(value)
+            except (TypeError, ValueError):
+                raise ValueError("неверное число потоков")
+            if options.jobs < 1:
+                raise ValueError("число потоков должно быть положительным")
+        elif arg == "-e":
+            options.errexit = True
+        elif arg == "--memfs":
+            options.memfs = True
+        elif arg == "--image":
+            options.image = next(args, None)
+            if options.image is None:
+                raise ValueError("после --image нужен файл образа")
+        elif arg == "--startup-profile":
+            options.startup_profile = True
+        elif arg == "-" or not arg.startswith("-"):
+            if options.script is not None:
+                raise ValueError(f"лишний аргумент: {arg}")
+            options.script = arg
         else:
-            cmd = args[0]
-            if cmd == "ls":
-                print("ls [path] - показывает список файлов и директорий в указанной директории (по умолчанию текущая)")
-            elif cmd == "pwd":
-                print("pwd - показывает текущую директорию")
-            elif cmd == "cd":
-                print("cd <path> - изменяет текущую директорию на указанную")
-            elif cmd == "echo":
-                print("echo <text> - выводит указанный текст")
-            elif cmd == "mkdir":
-                print("mkdir <name> - создает новую директорию с указанным именем")
-            elif cmd == "touch":
-                print("touch <file> - создает новый пустой файл с указанным именем")
-            elif cmd == "cat":
-                print("cat <file> - выводит содержимое файла")
-            elif cmd == "rm":
-                print("rm <file/dir> - удаляет файл или директорию")
-            elif cmd == "rmdir":
-                print("rmdir <name> - удаляет пустую директорию")
-            elif cmd == "ps":
-                print("ps - показывает список запущенных процессов")
-            elif cmd == "df":
-                print("df - показывает информацию о дисковом пространстве")
-            elif cmd == "free":
-                print("free - показывает информацию об использовании памяти")
-            elif cmd == "date":
-                print("date - показывает текущую дату и время")
-            elif cmd == "help":
-                print("help - показывает список доступных команд")
-            elif cmd == "clear":
-                print("clear - очищает экран")
-            elif cmd == "exit":
-                print("exit - завершает работу системы")
-            else:
-                print(f"Команда не найдена: {cmd}")
-    
-    def clear_command(self):
-        """Команда clear - очистка экрана"""
-        os.system('clear' if os.name == 'posix' else 'cls')
-    
-    def exit_command(self):
-        """Команда exit - выход из программы"""
-        print("Выход из системы...")
-        self.running = False
+            raise ValueError(f"неизвестная опция: {arg}")
+    return options
 
 
 def main():
-    os_simulator = LinuxConsoleOS()
-    os_simulator.run()
+    try:
+        options = parse_options(sys.argv[1:])
+    except ValueError as e:
+        sys.stderr.write(f"{USAGE}\nОшибка: {str(e)}\n")
+        sys.exit(2)
+    if options.startup_profile:
+        from startup import profile_startup
+        args = [arg for arg in sys.argv[1:] if arg != "--startup-profile"]
+        sys.stdout.write(profile_startup(os.path.abspath(__file__), args))
+        return
+    
+    fs = None
+    if options.memfs or options.image:
+        from vfs import MemoryFS
+        try:
+            fs = MemoryFS.load_image(options.image) if options.image else MemoryFS()
+        except (OSError, ValueError) as e:
+            print(f"{options.image}: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+    
+    if options.command is not None:
+        lines = options.command.splitlines()
+    elif options.script is not None:
+        try:
+            lines = read_script(options.script)
+        except OSError as e:
+            print(f"{options.script}: {e.strerror}", file=sys.stderr)
+            sys.exit(127)
+    elif not sys.stdin.isatty():
+        # Ввод из канала или файла читается целиком, без приглашений
+        lines = read_script("-")
+    else:
+        from history import History
+        history = History()
+        history.load_async()
+        os_simulator = LinuxConsoleOS(fs=fs, history=history)
+        os_simulator.run()
+        return
+    
+    os_simulator = LinuxConsoleOS(banner=False, fs=fs)
+    mark_ready()
+    sys.exit(os_simulator.run_script(lines, options.jobs, options.errexit))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,13 +6,70 @@
 import tkinter as tk
 from tkinter import scrolledtext, Entry, END
 import os
-import subprocess
+import re
 import sys
+import queue
 import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from shell_core import Shell, Command, CommandError, OutputSink
+from output_spool import OutputSpool
+from startup import mark_ready, profile_startup, PROFILE_ENV
+
+
+class TkOutputSink(OutputSink):
+    """Вывод команд в окно; запись безопасна из любого потока"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    def write(self, text):
+        self.app.print_to_output(text)
+    
+    def status(self, text):
+        self.app.call_in_ui(self.app.status_label.config, {"text": text})
+
+
+class Job:
+    """Команда, выполняемая в пуле рабочих потоков"""
+    
+    def __init__(self, job_id, command, stages, background):
+        self.id = job_id
+        self.command = command
+        self.stages = stages
+        self.background = background
+        self.cancel_event = threading.Event()
+        self.future = None
 
 
 class LinuxOSSimulator:
-    def __init__(self, root):
+    # Число рабочих потоков для команд
+    WORKER_COUNT = 4
+    # Команды, работающие с виджетами, выполняются в потоке Tk
+    UI_COMMANDS = {"outstat", "jobs", "kill", "clear", "exit"}
+    
+    # Буфер вывода сбрасывается в спул раз в кадр (~60 раз в секунду)
+    OUTPUT_FLUSH_INTERVAL_MS = 16
+    # Максимум символов за один сброс, чтобы главный цикл Tk не замирал
+    OUTPUT_FLUSH_LIMIT = 4 * 1024 * 1024
+    # Строк спула в виджете сверх видимых - сверху и снизу, чтобы прокрутка
+    # на несколько строк не требовала перерисовки
+    OUTPUT_MARGIN_LINES = 100
+    # При превышении лимита прокрутки остается эта доля, чтобы обрезать пачками
+    SCROLLBACK_KEEP_RATIO = 0.9
+    # По сколько строк спула читает поиск scrollback
+    SCROLLBACK_SEARCH_BLOCK = 4096
+    # Клавиши, которые во время Ctrl+R не меняют текст поиска и не завершают его
+    MODIFIER_KEYS = {"Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Caps_Lock"}
+    # Сколько совпадений Ctrl+R можно пролистать повторными нажатиями
+    SEARCH_LIMIT = 1000
+    # Сколько вариантов дополнения показывать во всплывающем списке
+    COMPLETION_LIMIT = 500
+    
+    def __init__(self, root, scrollback_lines=0, scrollback_chars=None, spill_path=None, fs=None,
+                 history=None):
         self.root = root
         self.root.title("Linux-подобная ОС (GUI)")
         self.root.geometry("800x600")
@@ -28,11 +85,41 @@ class LinuxOSSimulator:
         )
         self.output_text.pack(expand=True, fill='both', padx=10, pady=10)
         
+        # Буфер вывода: рабочие потоки кладут текст в очередь, поток Tk
+        # раз в кадр забирает его и дописывает в спул пачкой
+        self.output_queue = queue.SimpleQueue()
+        self.output_pending = deque()
+        self.output_flush_count = 0
+        self.output_flushed_chars = 0
+        self.output_last_flush_chars = 0
+        
+        # Виртуальный вывод: весь вывод - в спуле на диске, виджет держит только
+        # видимые строки с запасом. output_top - первая видимая строка спула,
+        # output_follow - следовать за концом вывода, output_window - (начало,
+        # конец, размер спула, если окно доходит до его конца) показанных строк
+        self.spool = OutputSpool()
+        self.output_top = 0
+        self.output_follow = True
+        self.output_window = (0, 0, None)
+        self.output_line_height = None
+        # Полоса прокрутки и колесо мыши листают спул, а не содержимое виджета
+        self.output_text.config(yscrollcommand=lambda *args: None)
+        self.output_text.vbar.config(command=self.scroll_output)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.output_text.bind(sequence, self.wheel_output)
+        self.output_text.bind('<Configure>', lambda event: self.render_output())
+        
+        # Ограничение истории прокрутки; обрезанное можно сбрасывать в сжатый файл
+        self.scrollback_lines = scrollback_lines
+        self.scrollback_chars = scrollback_chars
+        self.spill_path = spill_path
+        
         # Создаем поле ввода команд
         self.input_frame = tk.Frame(root)
         self.input_frame.pack(fill='x', padx=10, pady=(0, 10))
         
-        self.prompt_label = tk.Label(self.input_frame, text="user@simulator:~$ ", font=("Courier", 12), fg="green", bg="black")
+        self.prompt = "user@simulator:~$ "
+        self.prompt_label = tk.Label(self.input_frame, text=self.prompt, font=("Courier", 12), fg="green", bg="black")
         self.prompt_label.pack(side='left')
         
         self.command_entry = Entry(
@@ -46,269 +133,674 @@ class LinuxOSSimulator:
             borderwidth=0
         )
         self.command_entry.pack(side='left', fill='x', expand=True)
+        
+        # Строка состояния для прогресса длинных операций
+        self.status_label = tk.Label(self.input_frame, text="", font=("Courier", 10), fg="green", bg="black")
+        self.status_label.pack(side='right')
         self.command_entry.bind('<Return>', self.execute_command)
+        self.command_entry.bind('<Control-c>', self.cancel_command)
+        self.root.bind('<Control-c>', self.cancel_command)
+        self.command_entry.bind('<Up>', self.history_up)
+        self.command_entry.bind('<Down>', self.history_down)
+        self.command_entry.bind('<Control-r>', self.history_search)
+        self.command_entry.bind('<Tab>', self.complete_command)
+        self.command_entry.bind('<Key>', self.entry_key)
+        
+        # Листание истории: номер показанной команды (None - новая строка) и
+        # набранный до листания текст; search - состояние Ctrl+R. Поиск идет в
+        # отдельном потоке, номер запроса отсекает ответы на устаревший текст
+        self.history_position = None
+        self.history_draft = ""
+        self.search = None
+        self.search_executor = None
+        self.search_request = 0
+        # Дополнение по Tab: варианты ищутся в отдельном потоке, номер запроса
+        # отсекает устаревшие ответы; completion - (начало слова, варианты) списка
+        self.completer = None
+        self.completion_executor = None
+        self.completion_request = 0
+        self.completion_popup = None
+        self.completion = None
+        
+        # Пул рабочих потоков и выполняемые задания
+        self.executor = ThreadPoolExecutor(max_workers=self.WORKER_COUNT, thread_name_prefix="cmd")
+        self.jobs = {}
+        self.next_job_id = 1
+        self.top_window = None
+        
+        # Общее ядро команд плюс команды, работающие с окном
+        self.shell = Shell(TkOutputSink(self), fs=fs)
+        self.shell.history = history
+        for command in (
+            Command("outstat", self.outstat_command, "outstat", "статистика сбросов буфера вывода"),
+            Command("scrollback", self.scrollback_command, "scrollback <re>", "поиск по истории вывода",
+                    "ищет регулярное выражение в истории вывода, включая сброшенную в файл"),
+            Command("jobs", self.jobs_command, "jobs", "список выполняемых заданий",
+                    "показывает выполняемые задания; '<cmd> &' запускает команду в фоне, Ctrl+C прерывает текущую"),
+            Command("kill", self.kill_command, "kill %N", "прервать задание N"),
+            Command("top", self.top_command, "top [-d sec] [-n N]", "таблица процессов в отдельном окне",
+                    "показывает процессы по загрузке CPU в отдельном окне, обновляя его каждые sec секунд; "
+                    "закрытие окна или Ctrl+C останавливает top"),
+            Command("clear", self.clear_command, "clear", "очистить экран", "очищает экран", aliases=("cls",)),
+            Command("exit", self.exit_command, "exit", "выйти из системы", "завершает работу системы",
+                    aliases=("quit", "logout")),
+        ):
+            self.shell.registry.register(command)
+        self.current_dir = self.shell.fs.getcwd()
         
         # Отображаем приветственное сообщение
         self.print_to_output("Добро пожаловать в Linux-подобную систему!\n")
-        self.print_to_output(f"Текущая директория: {os.getcwd()}\n")
-        self.print_to_output("Доступные команды: ls, pwd, cd, echo, mkdir, touch, cat, rm, rmdir, ps, df, free, date, help\n")
+        self.print_to_output(f"Текущая директория: {self.current_dir}\n")
+        self.print_to_output(f"Доступные команды: {', '.join(command.name for command in self.shell.registry)}\n")
         
         # Устанавливаем фокус на поле ввода
         self.command_entry.focus()
+        
+        self.root.after(self.OUTPUT_FLUSH_INTERVAL_MS, self.pump_output)
     
     def print_to_output(self, text):
-        """Вывод текста в окно вывода"""
-        self.output_text.config(state='normal')
-        self.output_text.insert(tk.END, text)
-        self.output_text.config(state='disabled')
-        self.output_text.yview(tk.END)  # Автоматическая прокрутка вниз
+        """Вывод текста в окно вывода; безопасен для вызова из рабочих потоков"""
+        if text:
+            self.output_queue.put(text)
+    
+    def call_in_ui(self, func, *args):
+        """Выполнение функции в потоке Tk при следующем разборе очереди"""
+        self.output_queue.put(lambda: func(*args))
+    
+    def pump_output(self):
+        """Разбор очереди от рабочих потоков и сброс вывода; вызывается раз в кадр"""
+        try:
+            while True:
+                try:
+                    item = self.output_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, Job):
+                    self.finish_job(item)
+                elif callable(item):
+                    item()
+                else:
+                    self.output_pending.append(item)
+            self.flush_output()
+        finally:
+            # Ошибка одного кадра не должна останавливать вывод до конца сеанса
+            self.root.after(self.OUTPUT_FLUSH_INTERVAL_MS, self.pump_output)
+    
+    def flush_output(self):
+        """Дописывание накопленного вывода в спул и перерисовка видимых строк"""
+        parts = []
+        size = 0
+        while self.output_pending and size < self.OUTPUT_FLUSH_LIMIT:
+            text = self.output_pending.popleft()
+            room = self.OUTPUT_FLUSH_LIMIT - size
+            if len(text) > room:
+                # Остаток длинной записи уйдет следующим кадром
+                self.output_pending.appendleft(text[room:])
+                text = text[:room]
+            parts.append(text)
+            size += len(text)
+        if not parts:
+            return
+        
+        started = time.perf_counter()
+        self.spool.append("".join(parts))
+        self.trim_scrollback()
+        self.render_output()
+        if self.shell.instrumentation is not None:
+            self.shell.instrumentation.record_render(time.perf_counter() - started, size)
+        
+        self.output_flush_count += 1
+        self.output_flushed_chars += size
+        self.output_last_flush_chars = size
+    
+    def trim_scrollback(self):
+        """Отбрасывание старейших строк спула пачкой при превышении лимитов"""
+        spool = self.spool
+        drop = 0
+        if self.scrollback_lines and spool.line_count > self.scrollback_lines:
+            drop = spool.line_count - int(self.scrollback_lines * self.SCROLLBACK_KEEP_RATIO)
+        if self.scrollback_chars and spool.byte_count > self.scrollback_chars:
+            excess = spool.byte_count - int(self.scrollback_chars * self.SCROLLBACK_KEEP_RATIO)
+            drop = max(drop, spool.line_at(excess) + 1)
+        # Недописанная последняя строка остается в спуле до своего '\n'
+        drop = min(drop, spool.complete_lines)
+        if not drop:
+            return
+        
+        if self.spill_path:
+            self.spill_scrollback(spool.read(0, drop))
+        spool.drop(drop)
+        # Номера строк сдвинулись: показанное окно устарело
+        self.output_top = max(0, self.output_top - drop)
+        self.output_window = (0, 0, None)
+    
+    def visible_lines(self):
+        """Сколько строк помещается в виджет по его текущей высоте"""
+        if self.output_line_height is None:
+            from tkinter import font
+            line_font = font.Font(root=self.root, font=self.output_text.cget('font'))
+            self.output_line_height = line_font.metrics('linespace')
+        return max(1, self.output_text.winfo_height() // max(1, self.output_line_height))
+    
+    def render_output(self, force=False):
+        """Показ в виджете строк спула вокруг output_top; перерисовка - только при выходе за окно"""
+        count = self.spool.line_count
+        visible = self.visible_lines()
+        bottom = max(0, count - visible)
+        if self.output_follow or self.output_top > bottom:
+            self.output_top = bottom
+        top = self.output_top
+        start, end, tail_size = self.output_window
+        # Окно, доходящее до конца спула, устаревает при любом новом выводе
+        stale = tail_size is not None and tail_size != self.spool.size
+        if force or stale or top < start or min(count, top + visible) > end:
+            start = max(0, top - self.OUTPUT_MARGIN_LINES)
+            end = min(count, top + visible + self.OUTPUT_MARGIN_LINES)
+            self.output_text.config(state='normal')
+            self.output_text.delete('1.0', END)
+            self.output_text.insert('1.0', "\n".join(self.spool.lines(start, end)))
+            self.output_text.config(state='disabled')
+            self.output_window = (start, end, self.spool.size if end == count else None)
+        if top >= bottom:
+            # Строки с переносом занимают больше места: у конца прижимаемся к низу
+            self.output_text.yview_moveto(1.0)
+        else:
+            self.output_text.yview(f"{top - start + 1}.0")
+        if count:
+            self.output_text.vbar.set(top / count, min(1.0, (top + visible) / count))
+        else:
+            self.output_text.vbar.set(0.0, 1.0)
+    
+    def scroll_output(self, action, amount, unit=None):
+        """Полоса прокрутки: позиция пересчитывается в номер строки спула за O(1)"""
+        count = self.spool.line_count
+        visible = self.visible_lines()
+        if action == "moveto":
+            top = int(float(amount) * count)
+        else:
+            top = self.output_top + int(amount) * (visible if unit == "pages" else 1)
+        bottom = max(0, count - visible)
+        self.output_top = max(0, min(top, bottom))
+        self.output_follow = self.output_top >= bottom
+        self.render_output()
+    
+    def wheel_output(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_output("scroll", -3, "units")
+        else:
+            self.scroll_output("scroll", 3, "units")
+        return "break"
+    
+    def spill_scrollback(self, text):
+        """Дописывание обрезанной истории в сжатый файл (отдельным членом gzip)"""
+        import gzip
+        try:
+            with gzip.open(self.spill_path, 'at', encoding='utf-8') as f:
+                f.write(text)
+        except OSError as e:
+            self.spill_path = None
+            self.print_to_output(f"Ошибка записи истории прокрутки: {str(e)}\n")
     
     def execute_command(self, event):
-        """Выполнение команды из поля ввода"""
+        """Запуск команды из поля ввода; завершающий '&' - в фоне"""
+        if self.completion_popup is not None:
+            self.accept_completion()
+            return "break"
+        self.end_search()
+        self.history_position = None
         command = self.command_entry.get().strip()
         self.command_entry.delete(0, END)
         
         if command:
-            # Добавляем команду в историю
-            self.print_to_output(f"user@simulator:~$ {command}\n")
+            if self.shell.history is not None:
+                self.shell.history.add(command)
+            self.print_to_output(f"{self.prompt}{command}\n")
+            
+            background = command.endswith("&")
+            if background:
+                command = command[:-1].strip()
             
-            # Разбиваем команду на части
-            parts = command.split()
-            if not parts:
+            try:
+                stages = self.shell.parse(command)
+            except ValueError as e:
+                self.print_to_output(f"Ошибка разбора команды: {str(e)}\n")
+                return
+            if not stages:
                 return
             
-            cmd = parts[0]
-            args = parts[1:] if len(parts) > 1 else []
+            stage = stages[0]
+            if (len(stages) == 1 and stage.name in self.UI_COMMANDS
+                    and stage.stdin_path is None and stage.stdout_path is None):
+                self.shell.run(stage.name, stage.args)
+                return
             
-            # Обработка команд
-            try:
-                if cmd == "ls":
-                    self.ls_command(args)
-                elif cmd == "pwd":
-                    self.pwd_command()
-                elif cmd == "cd":
-                    self.cd_command(args)
-                elif cmd == "echo":
-                    self.echo_command(args)
-                elif cmd == "mkdir":
-                    self.mkdir_command(args)
-                elif cmd == "touch":
-                    self.touch_command(args)
-                elif cmd == "cat":
-                    self.cat_command(args)
-                elif cmd == "rm":
-                    self.rm_command(args)
-                elif cmd == "rmdir":
-                    self.rmdir_command(args)
-                elif cmd == "ps":
-                    self.ps_command()
-                elif cmd == "df":
-                    self.df_command()
-                elif cmd == "free":
-                    self.free_command()
-                elif cmd == "date":
-                    self.date_command()
-                elif cmd == "help":
-                    self.help_command()
-                elif cmd == "clear":
-                    self.clear_command()
-                elif cmd == "exit":
-                    self.exit_command()
-                else:
-                    self.print_to_output(f"Команда не найдена: {cmd}\n")
-            except Exception as e:
-                self.print_to_output(f"Ошибка выполнения команды: {str(e)}\n")
+            job = Job(self.next_job_id, command, stages, background)
+            self.next_job_id += 1
+            self.jobs[job.id] = job
+            if background:
+                self.print_to_output(f"[{job.id}] {command}\n")
+            job.future = self.executor.submit(self.run_job, job)
     
-    def ls_command(self, args):
-        """Команда ls - список файлов и директорий"""
-        try:
-            path = args[0] if args else "."
-            items = os.listdir(path)
-            items.sort()
-            for item in items:
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    self.print_to_output(f"[DIR]  {item}/\n")
-                else:
-                    self.print_to_output(f"[FILE] {item}\n")
-        except FileNotFoundError:
-            self.print_to_output("Директория не найдена\n")
-        except PermissionError:
-            self.print_to_output("Нет доступа к директории\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def pwd_command(self):
-        """Команда pwd - текущая директория"""
-        self.print_to_output(f"{os.getcwd()}\n")
-    
-    def cd_command(self, args):
-        """Команда cd - смена директории"""
-        if not args:
-            self.print_to_output("Нужно указать путь\n")
-            return
-        
+    def run_job(self, job):
+        """Выполнение задания в рабочем потоке"""
         try:
-            os.chdir(args[0])
-            self.print_to_output(f"Текущая директория: {os.getcwd()}\n")
-        except FileNotFoundError:
-            self.print_to_output("Директория не найдена\n")
-        except PermissionError:
-            self.print_to_output("Нет доступа к директории\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def echo_command(self, args):
-        """Команда echo - вывод текста"""
-        self.print_to_output(" ".join(args) + "\n")
-    
-    def mkdir_command(self, args):
-        """Команда mkdir - создание директории"""
-        if not args:
-            self.print_to_output("Нужно указать имя директории\n")
+            self.shell.run_pipeline(job.stages, job.cancel_event)
+        finally:
+            # Сигнал потоку Tk о завершении задания
+            self.output_queue.put(job)
+    
+    def finish_job(self, job):
+        """Обработка завершения задания в потоке Tk"""
+        self.jobs.pop(job.id, None)
+        if job.background:
+            state = "Прервано" if job.cancel_event.is_set() else "Завершено"
+            self.print_to_output(f"[{job.id}] {state}  {job.command}\n")
+        self.update_prompt()
+    
+    def update_prompt(self):
+        """Обновление приглашения после смены директории"""
+        current_dir = self.shell.fs.getcwd()
+        if current_dir != self.current_dir:
+            self.current_dir = current_dir
+            self.prompt = f"user@simulator:{os.path.basename(current_dir)}$ "
+            if self.search is None:
+                self.prompt_label.config(text=self.prompt)
+    
+    def set_entry(self, text):
+        self.command_entry.delete(0, END)
+        self.command_entry.insert(0, text)
+    
+    def history_up(self, event=None):
+        """Стрелка вверх - предыдущая команда истории"""
+        if self.completion_popup is not None:
+            return self.move_completion(-1)
+        if self.shell.history is None:
+            return "break"
+        self.end_search()
+        # До окончания загрузки истории листаются команды этого сеанса
+        commands = self.shell.history.commands(wait=False)
+        if self.history_position is None:
+            self.history_draft = self.command_entry.get()
+            self.history_position = len(commands)
+        if self.history_position > 0:
+            self.history_position -= 1
+            self.set_entry(commands[self.history_position])
+        return "break"
+    
+    def history_down(self, event=None):
+        """Стрелка вниз - следующая команда истории, после последней - набранный текст"""
+        if self.completion_popup is not None:
+            return self.move_completion(1)
+        if self.shell.history is None or self.history_position is None:
+            return "break"
+        self.end_search()
+        # До окончания загрузки истории листаются команды этого сеанса
+        commands = self.shell.history.commands(wait=False)
+        self.history_position += 1
+        if self.history_position >= len(commands):
+            self.history_position = None
+            self.set_entry(self.history_draft)
+        else:
+            self.set_entry(commands[self.history_position])
+        return "break"
+    
+    def history_search(self, event=None):
+        """Ctrl+R - обратный поиск по истории; повторное нажатие - более старое совпадение"""
+        if self.shell.history is None:
+            return "break"
+        if self.search is None:
+            self.search = {"text": "", "found": [], "choice": 0, "pending": False,
+                           "draft": self.command_entry.get()}
+        elif self.search["choice"] + 1 < len(self.search["found"]):
+            self.search["choice"] += 1
+        self.show_search()
+        return "break"
+    
+    def entry_key(self, event):
+        """Клавиши поля ввода: набор текста поиска Ctrl+R, закрытие списка дополнений"""
+        if event.keysym in self.MODIFIER_KEYS:
+            return None
+        if self.completion_popup is not None:
+            self.close_completion_popup()
+            if event.keysym == "Escape":
+                return "break"
+        search = self.search
+        if search is None:
+            return None
+        control = event.state & 0x4
+        if event.keysym == "Escape" or (control and event.keysym == "g"):
+            self.end_search()
+            self.set_entry(search["draft"])
+            return "break"
+        if event.keysym == "BackSpace":
+            text = search["text"][:-1]
+        elif event.char and event.char.isprintable() and not control:
+            text = search["text"] + event.char
+        else:
+            # Стрелки, Tab и прочее - оставляем найденную команду для правки
+            self.end_search()
+            return None
+        search["text"] = text
+        search["choice"] = 0
+        self.search_request += 1
+        if text:
+            # До ответа поля ввода остается прежнее совпадение
+            if self.search_executor is None:
+                self.search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+            search["pending"] = True
+            self.search_executor.submit(self.find_matches, self.search_request, text)
+        else:
+            search["found"] = []
+            search["pending"] = False
+        self.show_search()
+        return "break"
+    
+    def find_matches(self, request, text):
+        """Поиск по истории в рабочем потоке; показ - в потоке Tk"""
+        # Пока запрос ждал очереди, текст уже изменили
+        if request != self.search_request:
             return
-        
         try:
-            os.mkdir(args[0])
-            self.print_to_output(f"Директория '{args[0]}' создана\n")
-        except FileExistsError:
-            self.print_to_output(f"Директория '{args[0]}' уже существует\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def touch_command(self, args):
-        """Команда touch - создание файла"""
-        if not args:
-            self.print_to_output("Нужно указать имя файла\n")
+            found = self.shell.history.matches(text, self.SEARCH_LIMIT, wait=False)
+        except Exception:
+            found = []
+        self.call_in_ui(self.show_matches, request, found)
+    
+    def show_matches(self, request, found):
+        search = self.search
+        if search is None or request != self.search_request:
             return
-        
+        search["found"] = found
+        search["choice"] = 0
+        search["pending"] = False
+        self.show_search()
+    
+    def show_search(self):
+        search = self.search
+        found = search["found"]
+        if found:
+            self.set_entry(found[search["choice"]][1])
+        failed = "неудачный " if search["text"] and not found and not search["pending"] else ""
+        self.prompt_label.config(text=f"({failed}обратный поиск)'{search['text']}': ")
+    
+    def end_search(self):
+        if self.search is not None:
+            self.search = None
+            self.search_request += 1
+            self.prompt_label.config(text=self.prompt)
+    
+    def complete_command(self, event=None):
+        """Tab - дополнение команды или пути; в открытом списке - следующий вариант"""
+        if self.completion_popup is not None:
+            return self.move_completion(1)
+        self.end_search()
+        if self.completer is None:
+            from completion import Completer
+            self.completer = Completer(self.shell)
+            # Отдельный поток: листинг большой директории не ждет занятого пула команд
+            self.completion_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="complete")
+        self.completion_request += 1
+        line = self.command_entry.get()[:self.command_entry.index(tk.INSERT)]
+        self.completion_executor.submit(self.find_completions, self.completion_request, line)
+        return "break"
+    
+    def find_completions(self, request, line):
+        """Поиск вариантов в рабочем потоке; показ - в потоке Tk"""
         try:
-            with open(args[0], 'a'):
-                pass
-            self.print_to_output(f"Файл '{args[0]}' создан\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def cat_command(self, args):
-        """Команда cat - вывод содержимого файла"""
-        if not args:
-            self.print_to_output("Нужно указать имя файла\n")
+            start, candidates = self.completer.complete(line)
+        except Exception:
+            start, candidates = 0, []
+        self.call_in_ui(self.show_completions, request, line, start, candidates)
+    
+    def show_completions(self, request, line, start, candidates):
+        # Пока искали, строку могли изменить - ответ устарел
+        if request != self.completion_request or self.command_entry.get()[:len(line)] != line:
             return
-        
-        try:
-            with open(args[0], 'r', encoding='utf-8') as f:
-                content = f.read()
-                self.print_to_output(content + "\n")
-        except FileNotFoundError:
-            self.print_to_output("Файл не найден\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def rm_command(self, args):
-        """Команда rm - удаление файла или директории"""
-        if not args:
-            self.print_to_output("Нужно указать имя файла/директории\n")
+        if not candidates:
+            self.root.bell()
             return
-        
-        try:
-            if os.path.isfile(args[0]):
-                os.remove(args[0])
-                self.print_to_output(f"Файл '{args[0]}' удален\n")
-            elif os.path.isdir(args[0]):
-                import shutil
-                shutil.rmtree(args[0])
-                self.print_to_output(f"Директория '{args[0]}' удалена\n")
-            else:
-                self.print_to_output(f"'{args[0]}' не существует\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def rmdir_command(self, args):
-        """Команда rmdir - удаление пустой директории"""
-        if not args:
-            self.print_to_output("Нужно указать имя директории\n")
+        from completion import common_prefix
+        if len(candidates) == 1:
+            self.replace_word(start, len(line), candidates[0], final=True)
             return
+        prefix = common_prefix(candidates)
+        if len(prefix) > len(line) - start:
+            self.replace_word(start, len(line), prefix)
+        self.open_completion_popup(start, candidates)
+    
+    def replace_word(self, start, end, text, final=False):
+        """Замена дополняемого слова; законченное имя (не директория) - с пробелом"""
+        if final and not text.endswith("/"):
+            text += " "
+        self.command_entry.delete(start, end)
+        self.command_entry.insert(start, text)
+        self.command_entry.icursor(start + len(text))
+    
+    def open_completion_popup(self, start, candidates):
+        """Список вариантов над полем ввода; фокус остается в поле"""
+        shown = candidates[:self.COMPLETION_LIMIT]
+        listbox = tk.Listbox(self.root, height=min(10, len(shown)), bg="black", fg="green",
+                             font=("Courier", 12), selectbackground="green", selectforeground="black",
+                             activestyle="none", highlightthickness=1, exportselection=False)
+        listbox.insert(END, *shown)
+        if len(candidates) > len(shown):
+            listbox.insert(END, f"... еще {len(candidates) - len(shown)}")
+        listbox.selection_set(0)
+        listbox.bind('<ButtonRelease-1>', lambda event: self.accept_completion())
+        listbox.place(in_=self.input_frame, x=self.prompt_label.winfo_width(), y=0, anchor='sw')
+        self.completion_popup = listbox
+        self.completion = (start, shown)
+    
+    def move_completion(self, step):
+        listbox = self.completion_popup
+        selection = listbox.curselection()
+        index = ((selection[0] if selection else -step) + step) % len(self.completion[1])
+        listbox.selection_clear(0, END)
+        listbox.selection_set(index)
+        listbox.see(index)
+        return "break"
+    
+    def accept_completion(self):
+        """Выбранный в списке вариант - в поле ввода"""
+        selection = self.completion_popup.curselection()
+        start, shown = self.completion
+        self.close_completion_popup()
+        if selection and selection[0] < len(shown):
+            end = self.command_entry.index(tk.INSERT)
+            self.replace_word(start, end, shown[selection[0]], final=True)
+        self.command_entry.focus()
+    
+    def close_completion_popup(self):
+        if self.completion_popup is not None:
+            self.completion_popup.destroy()
+            self.completion_popup = None
+            self.completion = None
+    
+    def cancel_command(self, event=None):
+        """Ctrl+C - прерывание последней команды переднего плана"""
+        foreground = [job for job in self.jobs.values() if not job.background]
+        if not foreground:
+            return None
+        job = foreground[-1]
+        job.cancel_event.set()
+        job.future.cancel()
+        return "break"
+    
+    def outstat_command(self, ctx):
+        """Команда outstat - счетчики сбросов буфера вывода"""
+        flushes = self.output_flush_count
+        average = self.output_flushed_chars // flushes if flushes else 0
+        yield f"Сбросов в спул:          {flushes}\n"
+        yield f"Символов выведено:       {self.output_flushed_chars}\n"
+        yield f"Символов за сброс (ср.): {average}\n"
+        yield f"Символов в последнем:    {self.output_last_flush_chars}\n"
+        yield f"Строк в спуле:           {self.spool.line_count}\n"
+        yield f"Размер спула:            {self.spool.byte_count}\n"
+    
+    def scrollback_command(self, ctx):
+        """Команда scrollback - поиск по истории вывода (сжатый файл и спул)
         
+        Выполняется в рабочем потоке: спул читается блоками строк, Ctrl+C
+        прерывает поиск.
+        """
+        ctx.require_arg("Нужно указать шаблон поиска")
         try:
-            os.rmdir(args[0])
-            self.print_to_output(f"Директория '{args[0]}' удалена\n")
-        except FileNotFoundError:
-            self.print_to_output("Директория не найдена\n")
-        except OSError:
-            self.print_to_output(f"Директория '{args[0]}' не пуста\n")
-        except Exception as e:
-            self.print_to_output(f"Ошибка: {str(e)}\n")
-    
-    def ps_command(self):
-        """Команда ps - список процессов (упрощенная)"""
-        self.print_to_output("PID    CMD\n")
-        self.print_to_output(f"{os.getpid():<6} python3 linux_os_simulator.py\n")
-        # В реальной системе здесь был бы список всех запущенных процессов
-    
-    def df_command(self):
-        """Команда df - информация о дисковом пространстве"""
-        import shutil
-        total, used, free = shutil.disk_usage("/")
-        total_gb = total // (1024**3)
-        used_gb = used // (1024**3)
-        free_gb = free // (1024**3)
+            pattern = re.compile(" ".join(ctx.args))
+        except re.error as e:
+            raise CommandError(f"Неверный шаблон: {str(e)}")
         
-        self.print_to_output("Файловая система     Размер Использовано  Доступно Использовано% Примонтировано на\n")
-        self.print_to_output(f"/dev/sda1             {total_gb}G      {used_gb}G      {free_gb}G        {int(used/total*100)}% /\n")
-    
-    def free_command(self):
-        """Команда free - информация об использовании памяти"""
-        import psutil
-        memory = psutil.virtual_memory()
-        total_mb = memory.total // (1024**2)
-        available_mb = memory.available // (1024**2)
-        used_mb = memory.used // (1024**2)
-        percent_used = memory.percent
+        found = False
+        if self.spill_path and os.path.exists(self.spill_path):
+            import gzip
+            try:
+                with gzip.open(self.spill_path, 'rt', encoding='utf-8', errors='replace') as f:
+                    for line in f:
+                        if pattern.search(line):
+                            found = True
+                            yield f"[архив] {line.rstrip()}\n"
+                        ctx.check_cancelled()
+            except (OSError, EOFError) as e:
+                yield f"Ошибка чтения истории прокрутки: {str(e)}\n"
+        # Строки, выведенные самим поиском, не просматриваются
+        count = self.spool.line_count
+        for start in range(0, count, self.SCROLLBACK_SEARCH_BLOCK):
+            ctx.check_cancelled()
+            end = min(count, start + self.SCROLLBACK_SEARCH_BLOCK)
+            matches = [f"[вывод] {line}\n" for line in self.spool.lines(start, end) if pattern.search(line)]
+            if matches:
+                found = True
+                yield "".join(matches)
         
-        self.print_to_output("              Общая     Использованная    Доступная     Доступно%\n")
-        self.print_to_output(f"Память:      {total_mb:>6}M      {used_mb:>6}M      {available_mb:>6}M       {percent_used:>4}%\n")
-    
-    def date_command(self):
-        """Команда date - текущая дата и время"""
-        from datetime import datetime
-        self.print_to_output(f"{datetime.now()}\n")
-    
-    def help_command(self):
-        """Команда help - справка по доступным командам"""
-        self.print_to_output("Доступные команды:\n")
-        self.print_to_output("  ls [path]     - список файлов и директорий\n")
-        self.print_to_output("  pwd           - текущая директория\n")
-        self.print_to_output("  cd <path>     - сменить директорию\n")
-        self.print_to_output("  echo <text>   - вывести текст\n")
-        self.print_to_output("  mkdir <name>  - создать директорию\n")
-        self.print_to_output("  touch <file>  - создать файл\n")
-        self.print_to_output("  cat <file>    - вывести содержимое файла\n")
-        self.print_to_output("  rm <file/dir> - удалить файл или директорию\n")
-        self.print_to_output("  rmdir <name>  - удалить пустую директорию\n")
-        self.print_to_output("  ps            - список процессов\n")
-        self.print_to_output("  df            - информация о дисковом пространстве\n")
-        self.print_to_output("  free          - информация об использовании памяти\n")
-        self.print_to_output("  date          - текущая дата и время\n")
-        self.print_to_output("  help          - эта справка\n")
-        self.print_to_output("  clear         - очистить экран\n")
-        self.print_to_output("  exit          - выйти из системы\n")
-    
-    def clear_command(self):
+        if not found:
+            yield "Совпадений не найдено\n"
+    
+    def jobs_command(self, ctx):
+        """Команда jobs - список выполняемых заданий"""
+        if not self.jobs:
+            yield "Нет выполняемых заданий\n"
+            return
+        for job in self.jobs.values():
+            mode = "фон" if job.background else "передний план"
+            yield f"[{job.id}] {mode:<14} {job.command}\n"
+    
+    def kill_command(self, ctx):
+        """Команда kill %N - прерывание задания по номеру"""
+        arg = ctx.require_arg("Нужно указать номер задания: kill %N")
+        try:
+            job = self.jobs[int(arg.lstrip("%"))]
+        except (ValueError, KeyError):
+            raise CommandError(f"Задание не найдено: {arg}")
+        job.cancel_event.set()
+        job.future.cancel()
+    
+    def top_command(self, ctx):
+        """Команда top - кадры снимаются в рабочем потоке и показываются в окне"""
+        from plugins.process import top_frames
+        self.call_in_ui(self.open_top_window, ctx.cancel_event)
+        try:
+            for frame in top_frames(ctx):
+                self.call_in_ui(self.show_top_frame, frame)
+        finally:
+            self.call_in_ui(self.close_top_window)
+    
+    def open_top_window(self, cancel_event):
+        """Отдельное окно для top; закрытие окна прерывает команду"""
+        self.close_top_window()
+        window = tk.Toplevel(self.root)
+        window.title("top")
+        window.geometry("900x500")
+        text = scrolledtext.ScrolledText(window, wrap=tk.NONE, state='disabled', bg="black", fg="green",
+                                         font=("Courier", 11))
+        text.pack(expand=True, fill='both')
+        window.protocol("WM_DELETE_WINDOW", cancel_event.set)
+        self.top_window = (window, text)
+    
+    def show_top_frame(self, frame):
+        if self.top_window is None:
+            return
+        _, text = self.top_window
+        text.config(state='normal')
+        text.delete('1.0', END)
+        text.insert('1.0', frame)
+        text.config(state='disabled')
+    
+    def close_top_window(self):
+        if self.top_window is not None:
+            self.top_window[0].destroy()
+            self.top_window = None
+    
+    def clear_command(self, ctx):
         """Команда clear - очистка экрана"""
-        self.output_text.config(state='normal')
-        self.output_text.delete(1.0, END)
-        self.output_text.config(state='disabled')
+        self.output_pending.clear()
+        self.spool.clear()
+        self.output_top = 0
+        self.output_follow = True
+        self.render_output(force=True)
     
-    def exit_command(self):
+    def exit_command(self, ctx):
         """Команда exit - выход из программы"""
         self.print_to_output("Выход из системы...\n")
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.completion_executor is not None:
+            self.completion_executor.shutdown(wait=False, cancel_futures=True)
+        if self.search_executor is not None:
+            self.search_executor.shutdown(wait=False, cancel_futures=True)
         self.root.after(1000, self.root.destroy)  # Закрытие через 1 секунду
 
 
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Linux-подобная ОС с графическим интерфейсом")
+    parser.add_argument("--scrollback-lines", type=int, default=0,
+                        help="максимум строк истории вывода (0 - без ограничения: вывод хранится "
+                             "во временном файле, а не в окне)")
+    parser.add_argument("--scrollback-chars", type=int, default=None,
+                        help="максимум байт истории вывода (в UTF-8)")
+    parser.add_argument("--spill", metavar="FILE", default=None,
+                        help="сжатый файл (.gz) для обрезанной истории вывода")
+    parser.add_argument("--memfs", action="store_true",
+                        help="изолированная файловая система в памяти вместо файлов хоста")
+    parser.add_argument("--image", metavar="FILE", default=None,
+                        help="файловая система в памяти, загруженная из образа (vfs save)")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="замерить запуск: время до первого кадра и разбивка по импортам")
+    options = parser.parse_args()
+    if options.startup_profile:
+        args = [arg for arg in sys.argv[1:] if arg != "--startup-profile"]
+        sys.stdout.write(profile_startup(os.path.abspath(__file__), args))
+        return
+    
+    fs = None
+    if options.memfs or options.image:
+        from vfs import MemoryFS
+        try:
+            fs = MemoryFS.load_image(options.image) if options.image else MemoryFS()
+        except (OSError, ValueError) as e:
+            parser.error(f"{options.image}: {str(e)}")
+    
+    from history import History
+    history = History()
+    history.load_async()
+    
     root = tk.Tk()
-    app = LinuxOSSimulator(root)
-    root.mainloop()
+    app = LinuxOSSimulator(
+        root,
+        scrollback_lines=options.scrollback_lines,
+        scrollback_chars=options.scrollback_chars,
+        spill_path=options.spill,
+        fs=fs,
+        history=history
+    )
+    if os.environ.get(PROFILE_ENV):
+        # Замер запуска: окно готово к вводу - отмечаем и выходим
+        root.after_idle(lambda: (mark_ready(), root.destroy()))
+    try:
+        root.mainloop()
+    finally:
+        history.close()
+        app.spool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+"""
+Фоновый сбор системных метрик из /proc в кольцевой буфер
+"""
+
+import os
+import re
+import threading
+import time
+from collections import deque
+
+
+# Интервал выборки, секунды, и число хранимых выборок (10 минут)
+SAMPLE_INTERVAL = 1.0
+SAMPLE_CAPACITY = 600
+# Поля /proc/meminfo, которые нужны free и vmstat
+MEMINFO_FIELDS = (b"MemTotal", b"MemFree", b"MemAvailable", b"Buffers", b"Cached", b"SReclaimable",
+                  b"Shmem", b"SwapTotal", b"SwapFree")
+# Сектор в /proc/diskstats - всегда 512 байт
+SECTOR_SIZE = 512
+
+
+def unescape_mount_field(field):
+    """Поля /proc/self/mounts кодируют пробелы и спецсимволы как \\ooo"""
+    if "\\" not in field:
+        return field
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def read_mounts(path="/proc/self/mounts"):
+    """Список (устройство, точка монтирования, тип ФС) из таблицы монтирования"""
+    mounts = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 3:
+                mounts.append((unescape_mount_field(fields[0]), unescape_mount_field(fields[1]), fields[2]))
+    return mounts
+
+
+class Sample:
+    """Одна выборка метрик; недоступные источники - None
+
+    memory - поля /proc/meminfo в байтах; cpu - тики (user, nice, system,
+    idle, iowait, irq, softirq, steal); counters - накопительные счетчики
+    (прерывания, переключения контекста, страницы подкачки); disks -
+    устройство -> (чтений, секторов прочитано, записей, секторов записано,
+    мс занятости); mounts - (устройство, точка, тип, всего, свободно,
+    доступно) в байтах.
+    """
+
+    __slots__ = ("time", "uptime", "memory", "load", "running", "blocked", "cpu", "counters", "disks", "mounts")
+
+
+class MetricsCollector:
+    """Сборщик метрик в фоновом потоке
+
+    Поток делает выборку раз в interval секунд и хранит последние capacity
+    выборок; команды читают готовые выборки и сами системных вызовов не
+    делают. Тренды (мин/сред/макс за N секунд) считаются по буферу.
+    """
+
+    # Общий для процесса сборщик (shared): все сеансы и команды читают один буфер
+    instance = None
+    instance_lock = threading.Lock()
+
+    def __init__(self, interval=SAMPLE_INTERVAL, capacity=SAMPLE_CAPACITY, proc_root="/proc"):
+        self.interval = interval
+        self.proc_root = proc_root
+        self.samples = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def shared(cls):
+        """Общий сборщик; запускается при первом обращении"""
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls()
+                cls.instance.start()
+            return cls.instance
+
+    def start(self):
+        """Первая выборка сразу (чтобы команде было что показать), дальше - в потоке"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name="metrics", daemon=True)
+        self.collect()
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        # Выборки по расписанию, без накопления сдвига от времени самой выборки
+        deadline = time.monotonic()
+        while True:
+            deadline += self.interval
+            if self.stop_event.wait(max(0.0, deadline - time.monotonic())):
+                return
+            self.collect()
+
+    def collect(self):
+        sample = self.sample()
+        with self.lock:
+            self.samples.append(sample)
+
+    def latest(self):
+        with self.lock:
+            return self.samples[-1] if self.samples else None
+
+    def window(self, seconds=None):
+        """Выборки за последние seconds секунд (None - только две последние), от старых к новым"""
+        with self.lock:
+            samples = list(self.samples)
+        if seconds is None:
+            return samples[-2:]
+        since = samples[-1].time - seconds if samples else 0
+        return [sample for sample in samples if sample.time >= since]
+
+    def read(self, name):
+        with open(os.path.join(self.proc_root, name), "rb") as f:
+            return f.read()
+
+    def sample(self):
+        sample = Sample()
+        sample.time = time.monotonic()
+        sample.uptime = sample.memory = sample.load = sample.cpu = sample.disks = None
+        sample.running = sample.blocked = 0
+        sample.counters = {}
+        try:
+            sample.uptime = float(self.read("uptime").split()[0])
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            memory = {}
+            for line in self.read("meminfo").splitlines():
+                name, _, value = line.partition(b":")
+                if name in MEMINFO_FIELDS:
+                    memory[name.decode()] = int(value.split()[0]) * 1024
+            sample.memory = memory
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            sample.load = tuple(float(value) for value in self.read("loadavg").split()[:3])
+        except (OSError, ValueError):
+            pass
+        try:
+            for line in self.read("stat").splitlines():
+                fields = line.split()
+                if not fields:
+                    continue
+                if fields[0] == b"cpu":
+                    sample.cpu = tuple(int(value) for value in fields[1:9])
+                elif fields[0] == b"intr":
+                    sample.counters["intr"] = int(fields[1])
+                elif fields[0] == b"ctxt":
+                    sample.counters["ctxt"] = int(fields[1])
+                elif fields[0] == b"procs_running":
+                    sample.running = int(fields[1])
+                elif fields[0] == b"procs_blocked":
+                    sample.blocked = int(fields[1])
+        except (OSError, ValueError):
+            pass
+        try:
+            for line in self.read("vmstat").splitlines():
+                name, _, value = line.partition(b" ")
+                if name in (b"pswpin", b"pswpout"):
+                    sample.counters[name.decode()] = int(value)
+        except (OSError, ValueError):
+            pass
+        try:
+            disks = {}
+            for line in self.read("diskstats").splitlines():
+                fields = line.split()
+                if len(fields) < 13 or fields[2].startswith((b"loop", b"ram")):
+                    continue
+                disks[fields[2].decode()] = (int(fields[3]), int(fields[5]), int(fields[7]), int(fields[9]),
+                                             int(fields[12]))
+            sample.disks = disks
+        except (OSError, ValueError):
+            pass
+        sample.mounts = self.sample_mounts()
+        return sample
+
+    def sample_mounts(self):
+        try:
+            mounts = read_mounts(os.path.join(self.proc_root, "self", "mounts"))
+        except OSError:
+            mounts = [("-", "/", "-")]
+        result = []
+        for device, mountpoint, fstype in mounts:
+            try:
+                info = os.statvfs(mountpoint)
+            except OSError:
+                continue
+            result.append((device, mountpoint, fstype, info.f_blocks * info.f_frsize,
+                           info.f_bfree * info.f_frsize, info.f_bavail * info.f_frsize))
+        return result
+
+
+def boot_sample(sample):
+    """Нулевая выборка на момент загрузки системы: база для средних с загрузки"""
+    if sample.uptime is None:
+        return None
+    boot = Sample()
+    boot.time = sample.time - sample.uptime
+    boot.uptime = 0.0
+    boot.memory, boot.load, boot.mounts = sample.memory, sample.load, sample.mounts
+    boot.running, boot.blocked = sample.running, sample.blocked
+    boot.cpu = (0,) * len(sample.cpu) if sample.cpu is not None else None
+    boot.counters = dict.fromkeys(sample.counters, 0)
+    boot.disks = None
+    if sample.disks is not None:
+        boot.disks = {device: (0,) * len(values) for device, values in sample.disks.items()}
+    return boot
+
+
+def cpu_percent(before, after):
+    """Доли времени CPU между выборками: (пользователь, система, простой, ожидание ввода-вывода, украдено)"""
+    if before is None or after is None:
+        return None
+    delta = [b - a for a, b in zip(before, after)]
+    total = sum(delta) or 1
+    user, nice, system, idle, iowait, irq, softirq, steal = delta
+    return ((user + nice) * 100 / total, (system + irq + softirq) * 100 / total, idle * 100 / total,
+            iowait * 100 / total, steal * 100 / total)
+
+
+def disk_rates(before, after, elapsed):
+    """Устройство -> (чтений/с, записей/с, прочитано байт/с, записано байт/с, %занятости)"""
+    rates = {}
+    if not before or not after or elapsed <= 0:
+        return rates
+    for device, counters in after.items():
+        previous = before.get(device)
+        if previous is None:
+            continue
+        reads, read_sectors, writes, write_sectors, busy_ms = (b - a for a, b in zip(previous, counters))
+        rates[device] = (reads / elapsed, writes / elapsed, read_sectors * SECTOR_SIZE / elapsed,
+                         write_sectors * SECTOR_SIZE / elapsed, min(100.0, busy_ms / 10 / elapsed))
+    return rates
+
+
+def trend(values):
+    """(мин, сред, макс) ряда значений"""
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return min(values), sum(values) / len(values), max(values)
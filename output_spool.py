@@ -0,0 +1,186 @@
+"""
+Спул вывода графического окна: временный файл, отображаемый в память, и индекс начал строк
+"""
+
+import bisect
+import itertools
+import mmap
+import operator
+import tempfile
+import threading
+from array import array
+
+
+# Строка длиннее этого числа байт делится в индексе на части: виджет не получает гигантских строк
+MAX_LINE_BYTES = 16 * 1024
+# Файл сжимается, когда отброшенное начало больше этого и больше живой части
+COMPACT_BYTES = 64 * 1024 * 1024
+
+
+def is_continuation(byte):
+    """Продолжение многобайтного символа UTF-8 (по нему строку резать нельзя)"""
+    return byte & 0xC0 == 0x80
+
+
+class OutputSpool:
+    """Весь вывод окна во временном файле; в памяти - только индекс строк
+
+    starts[n] - смещение начала строки n в файле; строка n - байты до
+    starts[n + 1] (у последней - до конца файла), поэтому любой диапазон
+    строк читается через mmap за O(1) без просмотра файла. Строки до first
+    отброшены ограничением истории; номера строк в методах - от first.
+    Дописывает один поток (поток Tk), читать можно из любого.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(prefix="myos-output-", buffering=0)
+        self.starts = array("q", [0])
+        self.first = 0
+        self.size = 0
+        self.map = None
+        self.lock = threading.Lock()
+
+    @property
+    def line_count(self):
+        count = len(self.starts) - self.first
+        # Пустая строка после завершающего '\n' не считается
+        return count if self.size > self.starts[-1] else count - 1
+
+    @property
+    def complete_lines(self):
+        """Число строк, завершенных '\\n' (последняя строка может еще дописываться)"""
+        return len(self.starts) - 1 - self.first
+
+    @property
+    def byte_count(self):
+        return self.size - self.starts[self.first]
+
+    def append(self, text):
+        data = text.encode("utf-8", "surrogateescape")
+        view = memoryview(data)
+        while view:
+            view = view[self.file.write(view):]
+        with self.lock:
+            self.index(data, self.size)
+            self.size += len(data)
+
+    def index(self, data, base):
+        """Дополнение индекса началами строк из data, записанных со смещения base"""
+        parts = data.split(b"\n")
+        if base - self.starts[-1] + len(parts[0]) <= MAX_LINE_BYTES and max(map(len, parts)) <= MAX_LINE_BYTES:
+            # Частый случай без длинных строк: накопленные длины частей с '\n' считаются в C
+            lengths = map(operator.add, map(len, parts[:-1]), itertools.repeat(1))
+            self.starts.extend(itertools.islice(itertools.accumulate(lengths, initial=base), 1, None))
+            return
+        start = self.starts[-1]
+        position = base
+        for number, part in enumerate(parts):
+            end = position + len(part)
+            while end - start > MAX_LINE_BYTES:
+                # Хвост прежней записи короче предела, поэтому место разреза - внутри data;
+                # назад - не больше чем на 3 байта (длина продолжения символа UTF-8)
+                cut = start + MAX_LINE_BYTES
+                limit = max(base, start + 1, cut - 3)
+                while cut > limit and is_continuation(data[cut - base]):
+                    cut -= 1
+                self.starts.append(cut)
+                start = cut
+            position = end + 1
+            if number < len(parts) - 1:
+                self.starts.append(position)
+                start = position
+
+    def mapped(self):
+        # mmap не растет вместе с файлом: при нехватке отображаем файл заново
+        if self.map is None or len(self.map) < self.size:
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def span(self, start, end):
+        """Байтовые границы строк [start, end) (номера - от first, обрезаются по числу строк)"""
+        end = min(end, self.line_count)
+        start = min(max(0, start), end)
+        first = self.first + start
+        last = self.first + end
+        return first, last, self.starts[first], self.starts[last] if last < len(self.starts) else self.size
+
+    def lines(self, start, end):
+        """Строки [start, end) без завершающих '\\n'"""
+        with self.lock:
+            first, last, begin, finish = self.span(start, end)
+            if begin == finish:
+                return []
+            data = self.mapped()[begin:finish]
+            offsets = self.starts[first + 1:last]
+        result = []
+        previous = 0
+        for offset in itertools.chain(offsets, (finish,)):
+            line = data[previous:offset - begin]
+            if line.endswith(b"\n"):
+                line = line[:-1]
+            result.append(line.decode("utf-8", "replace"))
+            previous = offset - begin
+        return result
+
+    def read(self, start, end):
+        """Текст строк [start, end) как был выведен"""
+        with self.lock:
+            _, _, begin, finish = self.span(start, end)
+            if begin == finish:
+                return ""
+            return self.mapped()[begin:finish].decode("utf-8", "replace")
+
+    def line_at(self, offset):
+        """Номер строки, содержащей байт offset живой части"""
+        with self.lock:
+            position = self.starts[self.first] + offset
+            return bisect.bisect_right(self.starts, position, self.first) - 1 - self.first
+
+    def drop(self, count):
+        """Отбрасывание до count первых завершенных строк; возвращает число отброшенных
+
+        Недописанная последняя строка не отбрасывается: у нее еще нет начала
+        следующей строки в индексе. Файл сжимается, когда мертвое начало велико.
+        """
+        with self.lock:
+            count = max(0, min(count, len(self.starts) - 1 - self.first))
+            self.first += count
+            dead = self.starts[self.first]
+            if dead < COMPACT_BYTES or dead < self.size - dead:
+                return count
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            old = self.file
+            self.file = tempfile.TemporaryFile(prefix="myos-output-", buffering=0)
+            old.seek(dead)
+            while True:
+                chunk = old.read(1024 * 1024)
+                if not chunk:
+                    break
+                self.file.write(chunk)
+            old.close()
+            self.starts = array("q", map(operator.sub, self.starts[self.first:], itertools.repeat(dead)))
+            self.first = 0
+            self.size -= dead
+            return count
+
+    def clear(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.seek(0)
+            self.file.truncate()
+            self.starts = array("q", [0])
+            self.first = 0
+            self.size = 0
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
@@ -0,0 +1,6 @@
+"""
+Модули команд, загружаемые при первом вызове
+
+Описания команд (имя, справка) регистрируются в shell_core, а сами
+модули импортируются только тогда, когда команду впервые вызывают.
+"""
@@ -0,0 +1,137 @@
+"""
+Команда cat с распаковкой на лету: cat, zcat, bzcat, xzcat
+
+Сжатие (gzip, bz2, xz) определяется по сигнатуре файла. Несколько сжатых
+файлов хоста распаковываются параллельно в пуле процессов: каждый процесс
+пишет распакованный файл во временную директорию, а вывод идет в порядке
+аргументов, так что в памяти нет целых файлов.
+"""
+
+import os
+import shutil
+import tempfile
+from collections import deque
+
+from shell_core import CommandError, ensure_newline
+from file_stream import detect_compression, iter_decompressed, decode_chunks, iter_text
+
+
+# Параллельная распаковка - от стольких сжатых файлов общим размером от PARALLEL_BYTES:
+# запуск пула процессов дороже распаковки нескольких маленьких файлов
+PARALLEL_FILES = 2
+PARALLEL_BYTES = 1024 * 1024
+
+
+def file_error(path, error):
+    if isinstance(error, FileNotFoundError):
+        return f"cat: {path}: файл не найден\n"
+    if isinstance(error, IsADirectoryError):
+        return f"cat: {path}: является директорией\n"
+    return f"cat: {path}: {error.strerror or str(error)}\n"
+
+
+def compressed_size(fs, path):
+    """Размер сжатого файла; None - файл не сжат или недоступен"""
+    try:
+        with fs.open(path, 'rb', buffering=0) as f:
+            if detect_compression(f.read(6)) is None:
+                return None
+            return os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
+
+
+def decompress_to_file(path, directory):
+    """Задача пула процессов: распаковка файла во временный; возвращает (путь к нему, ошибка)"""
+    try:
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as out:
+            for chunk in iter_decompressed(path):
+                out.write(chunk)
+            return out.name, None
+    except OSError as e:
+        return None, e
+
+
+def decompress_parallel(ctx, paths, directory):
+    """Распаковка файлов хоста в пуле процессов; результаты - по порядку, по мере готовности"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(len(paths), os.cpu_count() or 1)
+    context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                          else None)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        try:
+            for path in paths:
+                pending.append(pool.submit(decompress_to_file, ctx.resolve(path), directory))
+                # Распакованных, но еще не выведенных файлов на диске - не больше двух на процесс
+                while len(pending) > workers * 2:
+                    ctx.check_cancelled()
+                    yield pending.popleft().result()
+            while pending:
+                ctx.check_cancelled()
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def cat_command(ctx):
+    """Команда cat - вывод файлов подряд; сжатые распаковываются"""
+    if not ctx.args:
+        if ctx.stdin is None:
+            raise CommandError("Нужно указать имя файла")
+        yield from ctx.stdin
+        return
+    # Файлы склеиваются байт в байт; перевод строки добавляется только в конце вывода
+    yield from ensure_newline(cat_files(ctx))
+
+
+def report_error(ctx, path, error):
+    """Ошибка файла - в приемник, а не в вывод: остальные файлы выводятся дальше"""
+    ctx.exit_code = 1
+    ctx.shell.sink.write(file_error(path, error))
+
+
+def cat_files(ctx):
+    fs = ctx.shell.fs
+    paths = ctx.args
+    parallel = []
+    # На одном ядре пул процессов только добавляет запись и чтение временных файлов
+    if not fs.isolated and (os.cpu_count() or 1) > 1:
+        sizes = {path: compressed_size(fs, path) for path in paths if path != "-"}
+        parallel = [path for path in paths if sizes.get(path) is not None]
+        if len(parallel) < PARALLEL_FILES or sum(sizes[path] for path in parallel) < PARALLEL_BYTES:
+            parallel = []
+
+    directory = results = None
+    if parallel:
+        directory = tempfile.mkdtemp(prefix="myos-cat-")
+        results = decompress_parallel(ctx, parallel, directory)
+    try:
+        parallel = set(parallel)
+        for path in paths:
+            if path == "-":
+                if ctx.stdin is not None:
+                    yield from ctx.stdin
+                continue
+            if path in parallel:
+                spooled, error = next(results)
+                if error is not None:
+                    report_error(ctx, path, error)
+                    continue
+                try:
+                    yield from iter_text(spooled)
+                finally:
+                    os.unlink(spooled)
+                continue
+            try:
+                yield from decode_chunks(iter_decompressed(path, opener=fs.open))
+            except OSError as e:
+                report_error(ctx, path, e)
+    finally:
+        if results is not None:
+            # Закрытие генератора останавливает пул до удаления временной директории
+            results.close()
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,204 @@
+"""
+Команда du: параллельный обход с постоянным кэшем размеров директорий
+"""
+
+import json
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from shell_core import CommandError, human_size
+
+
+WORKER_COUNT = min(32, (os.cpu_count() or 1) * 4)
+
+
+def default_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "myos", "du-cache.json")
+
+
+class SizeCache:
+    """Кэш размеров директорий: путь -> [mtime_ns, размер файлов директории, [поддиректории]]
+
+    Создание, удаление и переименование записей меняют mtime директории,
+    поэтому при совпадении mtime директорию можно не перечитывать. Рост
+    файла на месте mtime директории не меняет - для точного пересчета
+    есть du --no-cache.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        self.dirs = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.dirs = data["dirs"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.dirs = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "dirs": self.dirs}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def prune(self, root, visited):
+        """Удаление записей исчезнувших директорий внутри обойденного дерева"""
+        prefix = root.rstrip(os.sep) + os.sep
+        stale = [path for path in self.dirs
+                 if (path == root or path.startswith(prefix)) and path not in visited]
+        for path in stale:
+            del self.dirs[path]
+        if stale:
+            self.dirty = True
+
+
+def scan_directory(cache, path, use_cache):
+    """Размер файлов директории и список поддиректорий; из кэша, если mtime не изменился"""
+    info = os.lstat(path)
+    if use_cache:
+        cached = cache.dirs.get(path)
+        if cached is not None and cached[0] == info.st_mtime_ns:
+            return cached[1], cached[2]
+    own = info.st_blocks * 512
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            else:
+                try:
+                    own += entry.stat(follow_symlinks=False).st_blocks * 512
+                except OSError:
+                    pass
+    cache.dirs[path] = [info.st_mtime_ns, own, subdirs]
+    cache.dirty = True
+    return own, subdirs
+
+
+def measure_tree(ctx, cache, root, use_cache):
+    """Параллельный обход: каждая директория - отдельная задача пула"""
+    results = {}
+    errors = []
+    pool = ThreadPoolExecutor(max_workers=WORKER_COUNT, thread_name_prefix="du")
+    try:
+        pending = {pool.submit(scan_directory, cache, root, use_cache): root}
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            ctx.check_cancelled()
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    own, subdirs = future.result()
+                except OSError as e:
+                    errors.append(f"du: {path}: {e.strerror}\n")
+                    continue
+                results[path] = (own, subdirs)
+                for name in subdirs:
+                    child = os.path.join(path, name)
+                    pending[pool.submit(scan_directory, cache, child, use_cache)] = child
+            ctx.status(f"du: просмотрено директорий: {len(results)}")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        ctx.status("")
+    return results, errors
+
+
+def summarize(results, root, max_depth):
+    """Итоговые размеры снизу вверх; [(путь, размер)] в порядке вывода du"""
+    totals = {}
+    rows = []
+    stack = [(root, 0, False)]
+    while stack:
+        path, depth, expanded = stack.pop()
+        if path not in results:
+            continue
+        own, subdirs = results[path]
+        if expanded:
+            total = own + sum(totals.pop(os.path.join(path, name), 0) for name in subdirs)
+            totals[path] = total
+            if max_depth is None or depth <= max_depth:
+                rows.append((path, total))
+        else:
+            stack.append((path, depth, True))
+            stack.extend((os.path.join(path, name), depth + 1, False) for name in sorted(subdirs, reverse=True))
+    return rows
+
+
+def parse_du_args(ctx):
+    """Разбор опций du: -s, -h, --max-depth N / --max-depth=N, --no-cache"""
+    summary = human = False
+    use_cache = True
+    max_depth = None
+    paths = []
+    args = iter(ctx.args)
+    for arg in args:
+        if arg.startswith("--max-depth"):
+            value = arg.partition("=")[2] if "=" in arg else next(args, None)
+            try:
+                max_depth = int(value)
+            except (TypeError, ValueError):
+                raise CommandError("Неверное значение --max-depth")
+        elif arg == "--no-cache":
+            use_cache = False
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            for flag in arg[1:]:
+                if flag == "s":
+                    summary = True
+                elif flag == "h":
+                    human = True
+                else:
+                    raise CommandError(f"Неизвестная опция: -{flag}")
+        else:
+            paths.append(arg)
+    if summary:
+        max_depth = 0
+    return human, use_cache, max_depth, paths or ["."]
+
+
+def du_command(ctx):
+    """Команда du - место, занятое директориями"""
+    human, use_cache, max_depth, paths = parse_du_args(ctx)
+    cache = SizeCache()
+
+    def format_row(size, name):
+        return f"{human_size(size) if human else -(-size // 1024)}\t{name}\n"
+
+    for path in paths:
+        try:
+            info = os.lstat(ctx.resolve(path))
+        except OSError as e:
+            ctx.exit_code = 1
+            yield f"du: {path}: {e.strerror}\n"
+            continue
+        if not stat.S_ISDIR(info.st_mode):
+            yield format_row(info.st_blocks * 512, path)
+            continue
+
+        root = os.path.abspath(ctx.resolve(path))
+        results, errors = measure_tree(ctx, cache, root, use_cache)
+        if errors:
+            ctx.exit_code = 1
+            yield "".join(errors)
+        else:
+            cache.prune(root, results)
+        # Пути выводятся в том виде, в каком их указал пользователь
+        yield "".join(format_row(size, path + full[len(root):])
+                      for full, size in summarize(results, root, max_depth))
+
+    try:
+        cache.save()
+    except OSError as e:
+        yield f"du: не удалось сохранить кэш размеров: {e.strerror}\n"
@@ -0,0 +1,634 @@
+"""
+Файловые операции: mkdir, touch, rm, rmdir над многими путями; rm -r, cp -r, mv над деревьями
+"""
+
+import errno
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from shell_core import CommandError, CommandCancelled, parse_flags, human_size
+from vfs import break_hardlink
+
+
+# Потоки заняты в основном ожиданием системных вызовов, поэтому их больше, чем ядер
+WORKER_COUNT = min(32, (os.cpu_count() or 1) * 4)
+# Файлов в одной задаче пула: меньше накладных расходов на задачу
+BATCH_SIZE = 256
+# Интервал обновления строки прогресса, секунды
+PROGRESS_INTERVAL = 0.5
+# Пакеты из стольких путей и больше в нескольких директориях выполняются в пуле потоков
+PARALLEL_THRESHOLD = 1024
+# До стольких путей команда сообщает о каждом, дальше - сводка с первыми ошибками
+REPORT_LIMIT = 100
+# Вызовы относительно дескриптора директории (mkdirat, openat, unlinkat); нет в Windows
+DIR_FD_CALLS = {os.open, os.mkdir, os.rmdir, os.unlink} <= os.supports_dir_fd
+
+
+class Progress:
+    """Счетчики файлов и байтов со скоростью для строки состояния"""
+
+    def __init__(self, ctx, verb, count_bytes=True):
+        self.ctx = ctx
+        self.verb = verb
+        self.count_bytes = count_bytes
+        self.files = 0
+        self.bytes = 0
+        self.errors = []
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.reported = self.started
+
+    def add(self, files, size=0, errors=()):
+        with self.lock:
+            self.files += files
+            self.bytes += size
+            self.errors.extend(errors)
+
+    def describe(self):
+        """Счетчики и скорость: '120 файлов, 3.0M (40 файлов/с, 1.0M/с)'"""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        if not self.count_bytes:
+            return f"{self.files} файлов ({self.files / elapsed:.0f} файлов/с)"
+        return (f"{self.files} файлов, {human_size(self.bytes)} ({self.files / elapsed:.0f} файлов/с, "
+                f"{human_size(int(self.bytes / elapsed))}/с)")
+
+    def report(self):
+        now = time.monotonic()
+        if now - self.reported < PROGRESS_INTERVAL:
+            return
+        self.reported = now
+        self.ctx.status(f"{self.verb}: {self.describe()}")
+
+    def summary(self):
+        """Итоговые строки: сводка и первые ошибки"""
+        self.ctx.status("")
+        elapsed = time.monotonic() - self.started
+        lines = [f"{self.verb}: {self.describe()} за {elapsed:.1f} с\n"]
+        if self.errors:
+            self.ctx.exit_code = 1
+            lines.extend(f"Ошибка: {error}\n" for error in self.errors[:20])
+            if len(self.errors) > 20:
+                lines.append(f"... и еще {len(self.errors) - 20} ошибок\n")
+        return "".join(lines)
+
+
+class TaskPool:
+    """Пул потоков с ограничением задач в полете, прогрессом и прерыванием по Ctrl+C"""
+
+    def __init__(self, ctx, progress, workers=WORKER_COUNT):
+        self.ctx = ctx
+        self.progress = progress
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fileops")
+        self.pending = set()
+        self.limit = workers * 4
+        self.stop = threading.Event()
+
+    def submit(self, func, *args):
+        # Обход дерева не должен убегать вперед: держим очередь ограниченной
+        while len(self.pending) >= self.limit:
+            self.drain()
+        self.pending.add(self.executor.submit(func, *args))
+
+    def drain(self):
+        done, self.pending = wait(self.pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+        for future in done:
+            future.result()
+        self.progress.report()
+        self.check()
+
+    def finish(self):
+        """Ожидание всех отправленных задач"""
+        while self.pending:
+            self.drain()
+
+    def check(self):
+        if self.ctx.cancelled:
+            raise CommandCancelled()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Задачи сами проверяют stop между файлами, так что ожидание короткое
+        self.stop.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if exc_type is not None:
+            self.ctx.status("")
+        return False
+
+
+def scan_tree(pool, root):
+    """Потоковый обход дерева: (директория, [записи]) в прямом порядке, по одной директории"""
+    stack = [root]
+    while stack:
+        pool.check()
+        path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError as e:
+            pool.progress.add(0, errors=[f"{path}: {e.strerror}"])
+            continue
+        yield path, entries
+        stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+
+
+def unlink_batch(stop, progress, dirpath, names):
+    """Удаление файлов одной директории относительно ее дескриптора"""
+    errors = []
+    removed = 0
+    try:
+        dir_fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError as e:
+        progress.add(0, errors=[f"{dirpath}: {e.strerror}"])
+        return
+    try:
+        for name in names:
+            if stop.is_set():
+                break
+            try:
+                os.unlink(name, dir_fd=dir_fd)
+                removed += 1
+            except OSError as e:
+                errors.append(f"{os.path.join(dirpath, name)}: {e.strerror}")
+    finally:
+        os.close(dir_fd)
+    progress.add(removed, errors=errors)
+
+
+def group_by_parent(ctx, paths):
+    """Пути по родительским директориям: {директория: [(номер пути, имя)]}, в порядке появления
+
+    Без вызовов относительно дескриптора - одна группа с полными путями.
+    """
+    if not DIR_FD_CALLS:
+        return {None: [(index, ctx.resolve(path)) for index, path in enumerate(paths)]}
+    groups = {}
+    for index, path in enumerate(paths):
+        parent, name = os.path.split(ctx.resolve(path).rstrip("/") or "/")
+        groups.setdefault(parent or ".", []).append((index, name))
+    return groups
+
+
+def dir_batch(stop, progress, operation, dirpath, items, results):
+    """operation(имя, dir_fd) для имен одной директории; ошибки - в results по номерам путей"""
+    dir_fd = None
+    if dirpath is not None:
+        try:
+            dir_fd = os.open(dirpath, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        except OSError as e:
+            for index, _ in items:
+                results[index] = e
+            return
+    done = 0
+    try:
+        for index, name in items:
+            if stop.is_set():
+                break
+            try:
+                operation(name, dir_fd)
+                done += 1
+            except OSError as e:
+                results[index] = e
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    progress.add(done)
+
+
+def apply_batched(ctx, paths, operation, progress):
+    """Выполнение operation(имя, dir_fd) для каждого пути хоста; возвращает ошибки (или None) по путям
+
+    Пути группируются по родительской директории: она открывается один раз, и
+    вызовы идут относительно ее дескриптора, без повторного разбора пути.
+    Большие пакеты выполняются частями в пуле потоков, если пути не зависят
+    друг от друга (mkdir a a/b - зависят: тогда группы идут по порядку), в
+    них несколько директорий и ядер больше одного: изменения одной директории
+    ядро все равно выполняет по очереди под ее блокировкой, а на одном ядре
+    пул только добавляет переключения потоков.
+    """
+    results = [None] * len(paths)
+    groups = group_by_parent(ctx, paths)
+    targets = {os.path.normpath(os.path.join(dirpath, name))
+               for dirpath, items in groups.items() if dirpath is not None for _, name in items}
+    ordered = any(dirpath is not None and os.path.normpath(dirpath) in targets for dirpath in groups)
+    batches = [(dirpath, items[start:start + BATCH_SIZE])
+               for dirpath, items in groups.items() for start in range(0, len(items), BATCH_SIZE)]
+    parallel = (not ordered and len(paths) >= PARALLEL_THRESHOLD and len(groups) > 1
+                and (os.cpu_count() or 1) > 1)
+    if not parallel:
+        for dirpath, items in batches:
+            ctx.check_cancelled()
+            dir_batch(ctx.cancel_event, progress, operation, dirpath, items, results)
+            progress.report()
+        ctx.check_cancelled()
+        return results
+    with TaskPool(ctx, progress) as pool:
+        for dirpath, items in batches:
+            pool.submit(dir_batch, pool.stop, progress, operation, dirpath, items, results)
+        pool.finish()
+    return results
+
+
+def report_batch(ctx, progress, paths, results, success, failure):
+    """Строка на каждый путь (success(путь), failure(путь, ошибка)) или, для больших пакетов, сводка"""
+    errors = [failure(path, error) for path, error in zip(paths, results) if error is not None]
+    if len(paths) > REPORT_LIMIT:
+        progress.errors = errors
+        return progress.summary()
+    ctx.status("")
+    if errors:
+        ctx.exit_code = 1
+    return "".join(failure(path, error) + "\n" if error is not None else success(path)
+                   for path, error in zip(paths, results))
+
+
+def make_parents(fs, path, made):
+    """Создание недостающих родительских директорий пути; made - уже проверенные"""
+    parent = os.path.dirname(path.rstrip("/"))
+    if not parent or parent in made:
+        return
+    made.add(parent)
+    if fs.isdir(parent):
+        return
+    make_parents(fs, parent, made)
+    try:
+        fs.mkdir(parent)
+    except FileExistsError:
+        if not fs.isdir(parent):
+            raise
+
+
+def mkdir_at(name, dir_fd):
+    os.mkdir(name, dir_fd=dir_fd)
+
+
+def mkdir_existing_at(name, dir_fd):
+    # mkdir -p: существующая директория - не ошибка
+    try:
+        os.mkdir(name, dir_fd=dir_fd)
+    except FileExistsError:
+        if not stat.S_ISDIR(os.stat(name, dir_fd=dir_fd).st_mode):
+            raise
+
+
+def touch_at(name, dir_fd):
+    try:
+        fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o666, dir_fd=dir_fd)
+    except IsADirectoryError:
+        return
+    os.close(fd)
+
+
+def rmdir_at(name, dir_fd):
+    os.rmdir(name, dir_fd=dir_fd)
+
+
+def unlink_at(name, dir_fd):
+    os.unlink(name, dir_fd=dir_fd)
+
+
+def apply_isolated(ctx, fs, paths, operation, progress):
+    """Пакет в изолированной файловой системе: operation(fs, путь) по очереди"""
+    results = []
+    for path in paths:
+        ctx.check_cancelled()
+        try:
+            operation(fs, path)
+            results.append(None)
+            progress.add(1)
+        except OSError as e:
+            results.append(e)
+        progress.report()
+    return results
+
+
+def apply_paths(ctx, paths, host_operation, fs_operation, progress):
+    if ctx.shell.fs.isolated:
+        return apply_isolated(ctx, ctx.shell.fs, paths, fs_operation, progress)
+    return apply_batched(ctx, paths, host_operation, progress)
+
+
+def mkdir_existing(fs, path):
+    try:
+        fs.mkdir(path)
+    except FileExistsError:
+        if not fs.isdir(path):
+            raise
+
+
+def touch_path(fs, path):
+    if fs.isdir(path):
+        return
+    with fs.open(path, 'ab'):
+        pass
+
+
+def mkdir_command(ctx):
+    """Команда mkdir - создание директорий (с -p - вместе с родительскими)"""
+    flags, paths = parse_flags(ctx, "p")
+    if not paths:
+        raise CommandError("Нужно указать имя директории")
+    progress = Progress(ctx, "Создано", count_bytes=False)
+    if "p" in flags:
+        made = set()
+        for path in paths:
+            ctx.check_cancelled()
+            try:
+                make_parents(ctx.shell.fs, path, made)
+            except OSError as e:
+                raise CommandError(f"'{path}': {e.strerror}")
+        results = apply_paths(ctx, paths, mkdir_existing_at, mkdir_existing, progress)
+    else:
+        results = apply_paths(ctx, paths, mkdir_at, lambda fs, path: fs.mkdir(path), progress)
+
+    def failure(path, error):
+        if isinstance(error, FileExistsError):
+            return f"Директория '{path}' уже существует"
+        return f"'{path}': {error.strerror}"
+
+    yield report_batch(ctx, progress, paths, results, lambda path: f"Директория '{path}' создана\n", failure)
+
+
+def touch_command(ctx):
+    """Команда touch - создание пустых файлов"""
+    _, paths = parse_flags(ctx, "")
+    if not paths:
+        raise CommandError("Нужно указать имя файла")
+    progress = Progress(ctx, "Создано", count_bytes=False)
+    results = apply_paths(ctx, paths, touch_at, touch_path, progress)
+    yield report_batch(ctx, progress, paths, results, lambda path: f"Файл '{path}' создан\n",
+                       lambda path, error: f"'{path}': {error.strerror}")
+
+
+def rmdir_command(ctx):
+    """Команда rmdir - удаление пустых директорий"""
+    _, paths = parse_flags(ctx, "")
+    if not paths:
+        raise CommandError("Нужно указать имя директории")
+    progress = Progress(ctx, "Удалено", count_bytes=False)
+    results = apply_paths(ctx, paths, rmdir_at, lambda fs, path: fs.rmdir(path), progress)
+
+    def failure(path, error):
+        if isinstance(error, FileNotFoundError):
+            return f"Директория '{path}' не найдена"
+        if error.errno in (errno.ENOTEMPTY, errno.EEXIST):
+            return f"Директория '{path}' не пуста"
+        return f"'{path}': {error.strerror}"
+
+    yield report_batch(ctx, progress, paths, results, lambda path: f"Директория '{path}' удалена\n", failure)
+
+
+def remove_tree(ctx, path, verb="Удалено"):
+    """Параллельное удаление дерева: файлы - в пуле, директории - затем снизу вверх"""
+    progress = Progress(ctx, verb, count_bytes=False)
+    directories = []
+    with TaskPool(ctx, progress) as pool:
+        for dirpath, entries in scan_tree(pool, path):
+            directories.append(dirpath)
+            names = [entry.name for entry in entries if not entry.is_dir(follow_symlinks=False)]
+            for start in range(0, len(names), BATCH_SIZE):
+                pool.submit(unlink_batch, pool.stop, progress, dirpath, names[start:start + BATCH_SIZE])
+        pool.finish()
+        for dirpath in reversed(directories):
+            pool.check()
+            try:
+                os.rmdir(dirpath)
+            except OSError as e:
+                progress.add(0, errors=[f"{dirpath}: {e.strerror}"])
+    return progress
+
+
+def copy_data(src_fd, dst_fd, size):
+    """Копирование содержимого в ядре: copy_file_range, затем sendfile, затем read/write"""
+    copied = 0
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is not None:
+        try:
+            while copied < size:
+                n = copy_file_range(src_fd, dst_fd, size - copied)
+                if not n:
+                    break
+                copied += n
+            return copied
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                raise
+    try:
+        while copied < size:
+            n = os.sendfile(dst_fd, src_fd, copied, size - copied)
+            if not n:
+                break
+            copied += n
+        return copied
+    except OSError as e:
+        if e.errno not in (errno.EINVAL, errno.ENOSYS):
+            raise
+    os.lseek(src_fd, copied, os.SEEK_SET)
+    while True:
+        chunk = os.read(src_fd, 1024 * 1024)
+        if not chunk:
+            return copied
+        os.write(dst_fd, chunk)
+        copied += len(chunk)
+
+
+def copy_file(src, dst):
+    """Копирование одного файла с правами доступа; возвращает число байтов"""
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        info = os.fstat(src_fd)
+        mode = stat.S_IMODE(info.st_mode)
+        try:
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+        except FileExistsError:
+            # Назначение - сам источник (cp f f, ссылка на f): усечение стерло бы данные
+            if os.path.samestat(info, os.stat(dst)):
+                raise OSError(errno.EINVAL, "источник и назначение - один и тот же файл", dst)
+            # Существующий файл может быть общим со снимком - отделяем перед усечением
+            break_hardlink(dst, keep_data=False)
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            return copy_data(src_fd, dst_fd, info.st_size)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def copy_batch(stop, progress, pairs):
+    """Копирование группы файлов (или символических ссылок) в рабочем потоке"""
+    errors = []
+    copied = 0
+    size = 0
+    for src, dst, is_link in pairs:
+        if stop.is_set():
+            break
+        try:
+            if is_link:
+                os.symlink(os.readlink(src), dst)
+            else:
+                size += copy_file(src, dst)
+            copied += 1
+        except OSError as e:
+            errors.append(f"{src}: {e.strerror}")
+    progress.add(copied, size, errors)
+
+
+def copy_tree(ctx, src, dst, verb="Скопировано"):
+    """Параллельное копирование дерева: директории создаются при обходе, файлы - в пуле"""
+    progress = Progress(ctx, verb)
+    with TaskPool(ctx, progress) as pool:
+        for dirpath, entries in scan_tree(pool, src):
+            target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+            try:
+                os.makedirs(target_dir, exist_ok=True)
+            except OSError as e:
+                progress.add(0, errors=[f"{target_dir}: {e.strerror}"])
+                continue
+            batch = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    continue
+                batch.append((entry.path, os.path.join(target_dir, entry.name), entry.is_symlink()))
+                if len(batch) >= BATCH_SIZE:
+                    pool.submit(copy_batch, pool.stop, progress, batch)
+                    batch = []
+            if batch:
+                pool.submit(copy_batch, pool.stop, progress, batch)
+        pool.finish()
+    return progress
+
+
+def target_path(ctx, src, dst):
+    """Путь назначения (для вывода и полный): внутрь существующей директории или по указанному имени"""
+    if os.path.isdir(ctx.resolve(dst)):
+        dst = os.path.join(dst, os.path.basename(os.path.normpath(src)))
+    return dst, ctx.resolve(dst)
+
+
+def rm_command(ctx):
+    """Команда rm - удаление файлов и (с -r) директорий"""
+    flags, paths = parse_flags(ctx, "rRf")
+    if not paths:
+        raise CommandError("Нужно указать имя файла/директории")
+    recursive = bool(flags & {"r", "R"})
+    if ctx.shell.fs.isolated:
+        yield from remove_isolated(ctx, ctx.shell.fs, paths, flags, recursive)
+        return
+    # Сначала все пути удаляются как файлы пакетами; директории (unlink дает
+    # EISDIR, на macOS - EPERM) затем обрабатываются по одной
+    progress = Progress(ctx, "Удалено", count_bytes=False)
+    results = apply_batched(ctx, paths, unlink_at, progress)
+    files = []
+    errors = []
+    for path, error in zip(paths, results):
+        if error is None:
+            files.append(f"Файл '{path}' удален\n")
+            continue
+        full = ctx.resolve(path)
+        if error.errno in (errno.EISDIR, errno.EPERM) and os.path.isdir(full) and not os.path.islink(full):
+            if not recursive:
+                errors.append((path, f"'{path}' является директорией (используйте rm -r)"))
+                continue
+            removed = remove_tree(ctx, full)
+            yield removed.summary()
+            if removed.errors:
+                # Ошибки дерева уже в сводке; успех не сообщаем
+                ctx.exit_code = 1
+                errors.append((path, f"Директория '{path}' удалена не полностью"))
+                continue
+            files.append(f"Директория '{path}' удалена\n")
+        elif isinstance(error, FileNotFoundError):
+            if "f" not in flags:
+                errors.append((path, f"'{path}' не существует"))
+        else:
+            errors.append((path, f"'{path}': {error.strerror}"))
+    if len(paths) > REPORT_LIMIT:
+        progress.errors = [message for _, message in errors]
+        yield progress.summary()
+        return
+    ctx.status("")
+    if errors:
+        ctx.exit_code = 1
+    yield "".join(files) + "".join(f"{message}\n" for _, message in errors)
+
+
+def remove_isolated(ctx, fs, paths, flags, recursive):
+    """rm в изолированной файловой системе: дерево удаляется одной операцией fs.rmtree"""
+    for path in paths:
+        try:
+            info = fs.lstat(path)
+        except FileNotFoundError:
+            if "f" not in flags:
+                ctx.exit_code = 1
+                yield f"'{path}' не существует\n"
+            continue
+        if stat.S_ISDIR(info.st_mode):
+            if not recursive:
+                ctx.exit_code = 1
+                yield f"'{path}' является директорией (используйте rm -r)\n"
+                continue
+            fs.rmtree(path)
+            yield f"Директория '{path}' удалена\n"
+        else:
+            fs.unlink(path)
+            yield f"Файл '{path}' удален\n"
+
+
+def cp_command(ctx):
+    """Команда cp - копирование файла или (с -r) директории"""
+    flags, paths = parse_flags(ctx, "rR")
+    if len(paths) != 2:
+        raise CommandError("Нужно указать источник и назначение")
+    src, dst = paths
+    src_full = ctx.resolve(src)
+    if not os.path.lexists(src_full):
+        raise CommandError(f"'{src}' не существует")
+    dst, dst_full = target_path(ctx, src, dst)
+    if os.path.exists(dst_full) and os.path.samefile(src_full, dst_full):
+        raise CommandError(f"'{src}' и '{dst}' - один и тот же файл")
+    if os.path.isdir(src_full) and not os.path.islink(src_full):
+        if not flags & {"r", "R"}:
+            raise CommandError(f"'{src}' является директорией (используйте cp -r)")
+        if os.path.abspath(dst_full).startswith(os.path.abspath(src_full) + os.sep):
+            raise CommandError("Нельзя копировать директорию внутрь самой себя")
+        yield copy_tree(ctx, src_full, dst_full).summary()
+    else:
+        size = copy_file(src_full, dst_full)
+        yield f"Скопировано: '{src}' -> '{dst}' ({human_size(size)})\n"
+
+
+def mv_command(ctx):
+    """Команда mv - переименование, а между файловыми системами - копирование с удалением"""
+    _, paths = parse_flags(ctx, "")
+    if len(paths) != 2:
+        raise CommandError("Нужно указать источник и назначение")
+    src, dst = paths
+    src_full = ctx.resolve(src)
+    if not os.path.lexists(src_full):
+        raise CommandError(f"'{src}' не существует")
+    dst, dst_full = target_path(ctx, src, dst)
+    try:
+        os.rename(src_full, dst_full)
+        yield f"Перемещено: '{src}' -> '{dst}'\n"
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    if os.path.isdir(src_full) and not os.path.islink(src_full):
+        progress = copy_tree(ctx, src_full, dst_full, verb="Перенесено")
+        yield progress.summary()
+        if progress.errors:
+            raise CommandError(f"Исходная директория '{src}' не удалена из-за ошибок копирования")
+        removed = remove_tree(ctx, src_full)
+        yield removed.summary()
+        if removed.errors:
+            raise CommandError(f"Директория скопирована в '{dst}', но исходная '{src}' удалена не полностью")
+    else:
+        copy_file(src_full, dst_full)
+        os.remove(src_full)
+    yield f"Перемещено: '{src}' -> '{dst}'\n"
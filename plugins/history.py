@@ -0,0 +1,41 @@
+"""
+История команд: команда history
+"""
+
+from shell_core import CommandError
+
+
+def history_command(ctx):
+    """Команда history - список, поиск и очистка истории команд"""
+    history = ctx.shell.history
+    if history is None:
+        raise CommandError("История команд в этом сеансе не ведется")
+    args = list(ctx.args)
+    if args[:1] == ["-c"]:
+        history.clear()
+        yield "История очищена\n"
+        return
+    if args[:1] == ["-s"]:
+        if len(args) < 2:
+            raise CommandError("Нужно указать текст для поиска: history -s <текст>")
+        found = history.matches(" ".join(args[1:]))
+        if not found:
+            raise CommandError("Совпадений не найдено")
+        yield "".join(f"{number + 1:>6}  {line}\n" for number, line in found)
+        return
+    commands = history.commands()
+    start = 0
+    if args:
+        try:
+            count = int(args[0])
+        except ValueError:
+            raise CommandError(f"Неверное число: {args[0]}")
+        start = max(0, len(commands) - count)
+    lines = []
+    for number in range(start, len(commands)):
+        lines.append(f"{number + 1:>6}  {commands[number]}\n")
+        if len(lines) >= 1000:
+            ctx.check_cancelled()
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
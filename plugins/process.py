@@ -0,0 +1,245 @@
+"""
+Таблица процессов из /proc: команды ps и top
+"""
+
+import os
+import time
+
+from shell_core import CommandError
+
+
+class ProcessInfo:
+    """Снимок одного процесса"""
+
+    __slots__ = ("pid", "ppid", "user", "state", "comm", "cmdline", "ticks", "start_ticks",
+                 "nice", "threads", "vsize", "rss", "shared", "cpu_percent")
+
+
+class ProcSampler:
+    """Выборка процессов из /proc с расчетом %CPU по разнице между выборками
+
+    Для каждого процесса читаются только /proc/[pid]/stat и statm;
+    командная строка и имя пользователя кэшируются, пока жив процесс.
+    """
+
+    def __init__(self, proc_root="/proc"):
+        self.proc_root = proc_root
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.mem_total = self.read_mem_total()
+        self.boot_time = self.read_boot_time()
+        self.previous = {}
+        self.previous_time = None
+        self.cmdlines = {}
+        self.users = {}
+
+    def read_mem_total(self):
+        try:
+            with open(os.path.join(self.proc_root, "meminfo"), "rb") as f:
+                for line in f:
+                    if line.startswith(b"MemTotal:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def read_boot_time(self):
+        try:
+            with open(os.path.join(self.proc_root, "stat"), "rb") as f:
+                for line in f:
+                    if line.startswith(b"btime "):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def user_name(self, uid):
+        name = self.users.get(uid)
+        if name is None:
+            try:
+                import pwd
+                name = pwd.getpwuid(uid).pw_name
+            except (ImportError, KeyError):
+                name = str(uid)
+            self.users[uid] = name
+        return name
+
+    def read_cmdline(self, pid, key, comm):
+        cmdline = self.cmdlines.get(key)
+        if cmdline is None:
+            try:
+                with open(f"{self.proc_root}/{pid}/cmdline", "rb") as f:
+                    raw = f.read()
+                cmdline = raw.rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+            except OSError:
+                cmdline = ""
+            # Потоки ядра не имеют командной строки - показываем [comm]
+            cmdline = cmdline or f"[{comm}]"
+            self.cmdlines[key] = cmdline
+        return cmdline
+
+    def sample(self):
+        """Новая выборка процессов; %CPU считается по приросту тиков"""
+        now = time.monotonic()
+        elapsed = now - self.previous_time if self.previous_time is not None else None
+        uptime = time.time() - self.boot_time
+        current = {}
+        processes = []
+
+        with os.scandir(self.proc_root) as it:
+            for entry in it:
+                if not entry.name.isdigit():
+                    continue
+                pid = int(entry.name)
+                try:
+                    with open(f"{self.proc_root}/{pid}/stat", "rb") as f:
+                        stat_line = f.read()
+                    with open(f"{self.proc_root}/{pid}/statm", "rb") as f:
+                        statm = f.read().split()
+                    uid = entry.stat().st_uid
+                except OSError:
+                    # Процесс завершился между чтениями
+                    continue
+
+                close = stat_line.rfind(b")")
+                comm = stat_line[stat_line.find(b"(") + 1:close].decode("utf-8", "replace")
+                fields = stat_line[close + 2:].split()
+                ticks = int(fields[11]) + int(fields[12])
+                start_ticks = int(fields[19])
+                key = (pid, start_ticks)
+
+                info = ProcessInfo()
+                info.pid = pid
+                info.ppid = int(fields[1])
+                info.state = fields[0].decode()
+                info.comm = comm
+                info.nice = int(fields[16])
+                info.threads = int(fields[17])
+                info.vsize = int(fields[20])
+                info.rss = int(statm[1]) * self.page_size
+                info.shared = int(statm[2]) * self.page_size
+                info.ticks = ticks
+                info.start_ticks = start_ticks
+                info.user = self.user_name(uid)
+                info.cmdline = self.read_cmdline(pid, key, comm)
+
+                previous_ticks = self.previous.get(key)
+                if previous_ticks is not None and elapsed:
+                    info.cpu_percent = (ticks - previous_ticks) / self.clock_ticks / elapsed * 100
+                else:
+                    # Первая выборка: среднее за время жизни процесса, как в ps
+                    lifetime = uptime - start_ticks / self.clock_ticks
+                    info.cpu_percent = ticks / self.clock_ticks / lifetime * 100 if lifetime > 0 else 0.0
+                current[key] = ticks
+                processes.append(info)
+
+        # Кэш командных строк только для живых процессов
+        if len(self.cmdlines) > len(current):
+            self.cmdlines = {key: value for key, value in self.cmdlines.items() if key in current}
+        self.previous = current
+        self.previous_time = now
+        return processes
+
+    def mem_percent(self, info):
+        return info.rss / self.mem_total * 100 if self.mem_total else 0.0
+
+    def start_time(self, info):
+        return self.boot_time + info.start_ticks / self.clock_ticks
+
+
+def format_ticks(ticks, clock_ticks):
+    seconds = ticks // clock_ticks
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def format_ps(sampler, processes):
+    """Таблица в стиле ps aux одной строкой"""
+    lines = [f"{'USER':<10} {'PID':>7} {'%CPU':>5} {'%MEM':>5} {'VSZ':>9} {'RSS':>8} "
+             f"{'STAT':<4} {'START':>5} {'TIME':>7} COMMAND\n"]
+    today = time.localtime()[:3]
+    for info in sorted(processes, key=lambda p: p.pid):
+        started = time.localtime(sampler.start_time(info))
+        start = time.strftime("%H:%M" if started[:3] == today else "%b%d", started)
+        lines.append(
+            f"{info.user[:10]:<10} {info.pid:>7} {info.cpu_percent:>5.1f} {sampler.mem_percent(info):>5.1f} "
+            f"{info.vsize // 1024:>9} {info.rss // 1024:>8} {info.state:<4} {start:>5} "
+            f"{format_ticks(info.ticks, sampler.clock_ticks):>7} {info.cmdline}\n"
+        )
+    return "".join(lines)
+
+
+def format_top(sampler, processes, limit):
+    """Кадр top: сводка и процессы, отсортированные по %CPU"""
+    try:
+        load = os.getloadavg()
+    except OSError:
+        load = (0.0, 0.0, 0.0)
+    running = sum(1 for info in processes if info.state == "R")
+    lines = [
+        f"top - {time.strftime('%H:%M:%S')}  load average: {load[0]:.2f}, {load[1]:.2f}, {load[2]:.2f}\n",
+        f"Процессов: {len(processes)} всего, {running} выполняются\n",
+        "\n",
+        f"{'PID':>7} {'USER':<10} {'NI':>3} {'RES':>8} {'SHR':>8} S {'%CPU':>5} {'%MEM':>5} {'TIME+':>8} COMMAND\n",
+    ]
+    processes = sorted(processes, key=lambda p: (-p.cpu_percent, p.pid))
+    for info in processes[:limit]:
+        lines.append(
+            f"{info.pid:>7} {info.user[:10]:<10} {info.nice:>3} {info.rss // 1024:>7}K {info.shared // 1024:>7}K "
+            f"{info.state} {info.cpu_percent:>5.1f} {sampler.mem_percent(info):>5.1f} "
+            f"{format_ticks(info.ticks, sampler.clock_ticks):>8} {info.comm}\n"
+        )
+    return "".join(lines)
+
+
+def check_proc():
+    if not os.path.isdir("/proc/self"):
+        raise CommandError("Файловая система /proc недоступна")
+
+
+def ps_command(ctx):
+    """Команда ps - список процессов в стиле ps aux; опции aux/-e/-ef принимаются для совместимости"""
+    check_proc()
+    sampler = ProcSampler()
+    yield format_ps(sampler, sampler.sample())
+
+
+def parse_top_args(ctx):
+    """Разбор опций top: -d секунды, -n число кадров, -p число строк"""
+    interval, iterations, limit = 2.0, None, 30
+    args = iter(ctx.args)
+    try:
+        for arg in args:
+            if arg == "-d":
+                interval = float(next(args))
+            elif arg == "-n":
+                iterations = int(next(args))
+            elif arg == "-p":
+                limit = int(next(args))
+            else:
+                raise CommandError(f"Неизвестная опция: {arg}")
+    except (StopIteration, ValueError):
+        raise CommandError("Неверное значение опции")
+    if interval <= 0:
+        raise CommandError("Интервал должен быть положительным")
+    return interval, iterations, limit
+
+
+def top_frames(ctx):
+    """Кадры top с заданным интервалом до Ctrl+C или исчерпания -n"""
+    check_proc()
+    interval, iterations, limit = parse_top_args(ctx)
+    sampler = ProcSampler()
+    sampler.sample()
+    frame = 0
+    while iterations is None or frame < iterations:
+        ctx.wait(min(interval, 0.5) if frame == 0 else interval)
+        yield format_top(sampler, sampler.sample(), limit)
+        frame += 1
+
+
+def top_command(ctx):
+    """Команда top - обновляемая таблица процессов"""
+    interactive = getattr(ctx.shell.sink, "interactive", False)
+    for frame in top_frames(ctx):
+        # В терминале кадр перерисовывается на месте, иначе выводится подряд
+        yield f"\x1b[H\x1b[2J{frame}" if interactive else f"{frame}\n"
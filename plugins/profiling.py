@@ -0,0 +1,97 @@
+"""
+Замеры выполнения: команды time и stats
+"""
+
+import json
+import os
+import time
+
+from shell_core import CommandError, human_size
+
+
+def resource_usage():
+    """Время CPU процесса (пользователь, система) и пиковый RSS в байтах"""
+    try:
+        import resource
+    except ImportError:
+        times = os.times()
+        return times.user, times.system, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss в Linux - в килобайтах
+    return (own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime,
+            max(own.ru_maxrss, children.ru_maxrss) * 1024)
+
+
+def time_command(ctx):
+    """Команда time - выполнение команды с замером времени и памяти"""
+    if not ctx.args:
+        raise CommandError("Нужно указать команду")
+    name, args = ctx.args[0], ctx.args[1:]
+    # Команда выполняется как обычная стадия конвейера: с раскрытием аргументов,
+    # запретом команд хоста в изолированной ФС и выводом ошибок в приемник
+    try:
+        inner = ctx.shell.stage_context(name, args, ctx.quoted[1:] if ctx.quoted else None,
+                                        ctx.cancel_event, ctx.stdin)
+    except ValueError as e:
+        raise CommandError(f"{name}: {str(e)}")
+    user_before, system_before, _ = resource_usage()
+    started = time.perf_counter()
+    try:
+        yield from ctx.shell.stage_output(inner)
+    finally:
+        elapsed = time.perf_counter() - started
+        user, system, peak_rss = resource_usage()
+        ctx.exit_code = inner.exit_code
+        # Отчет идет в приемник, как сообщения об ошибках, а не дальше по конвейеру
+        report = f"\nreal\t{elapsed:.3f}s\nuser\t{user - user_before:.3f}s\nsys\t{system - system_before:.3f}s\n"
+        if peak_rss is not None:
+            report += f"maxrss\t{human_size(peak_rss)}\n"
+        ctx.shell.sink.write(report)
+
+
+def stats_command(ctx):
+    """Команда stats - статистика команд: on, off, reset, profile, last, json"""
+    shell = ctx.shell
+    action = ctx.args[0] if ctx.args else None
+    if action == "on":
+        if shell.instrumentation is None:
+            from instrumentation import Instrumentation
+            shell.instrumentation = Instrumentation()
+        yield "Сбор статистики включен\n"
+        return
+    if action == "off":
+        shell.instrumentation = None
+        yield "Сбор статистики выключен\n"
+        return
+
+    instrumentation = shell.instrumentation
+    if instrumentation is None:
+        raise CommandError("Сбор статистики выключен (включите: stats on)")
+    if action is None:
+        yield instrumentation.format()
+    elif action == "reset":
+        instrumentation.reset()
+        yield "Статистика сброшена\n"
+    elif action == "profile":
+        mode = ctx.args[1] if len(ctx.args) > 1 else None
+        if mode not in ("cpu", "memory", "off"):
+            raise CommandError("Использование: stats profile cpu|memory|off")
+        instrumentation.profile = None if mode == "off" else mode
+        yield f"Профилирование: {mode}\n"
+    elif action == "last":
+        if instrumentation.last_profile is None:
+            raise CommandError("Профилей еще нет (stats profile cpu|memory)")
+        name, mode, text = instrumentation.last_profile
+        yield f"Профиль ({mode}) команды {name}:\n{text}"
+    elif action == "json":
+        text = json.dumps(instrumentation.to_dict(), ensure_ascii=False, indent=2) + "\n"
+        if len(ctx.args) > 1:
+            path = ctx.args[1]
+            with ctx.shell.fs.open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            yield f"Статистика сохранена в {path}\n"
+        else:
+            yield text
+    else:
+        raise CommandError(f"Неизвестное действие: {action}")
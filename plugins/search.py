@@ -0,0 +1,501 @@
+"""
+Поиск: find, grep и пара updatedb/locate с компактным индексом имен
+"""
+
+import fnmatch
+import functools
+import os
+import re
+import tempfile
+from collections import deque
+
+from shell_core import CommandError, parse_flags
+from file_stream import iter_text
+
+
+# grep читает файлы крупными блоками
+GREP_CHUNK_SIZE = 1024 * 1024
+# При рекурсивном поиске меньшее число файлов обрабатывается без пула процессов
+GREP_POOL_THRESHOLD = 64
+# Файлов в одной задаче пула процессов
+GREP_BATCH_SIZE = 32
+# Каталоги, которые updatedb по умолчанию не индексирует
+PRUNE_PATHS = ("/proc", "/sys", "/dev", "/run", "/tmp")
+
+LOCATE_MAGIC = b"MYOSLOC2\n"
+
+
+def walk_entries(ctx, root):
+    """Потоковый обход дерева: (директория, [записи]) по одной директории"""
+    stack = [root]
+    while stack:
+        ctx.check_cancelled()
+        path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            ctx.exit_code = 1
+            yield path, None, e
+            continue
+        yield path, entries, None
+        stack.extend(entry.path for entry in reversed(entries) if entry.is_dir(follow_symlinks=False))
+
+
+def parse_size_test(value):
+    """Условие -size [+-]N[c|k|M|G] как в find: без суффикса - блоки по 512 байт"""
+    match = re.fullmatch(r"([+-]?)(\d+)([ckMG]?)", value)
+    if not match:
+        raise CommandError(f"Неверный размер: {value}")
+    sign, number, suffix = match.groups()
+    unit = {"": 512, "c": 1, "k": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[suffix]
+    number = int(number)
+
+    def test(size):
+        # find округляет размер вверх до целых единиц
+        units = -(-size // unit)
+        if sign == "+":
+            return units > number
+        if sign == "-":
+            return units < number
+        return units == number
+    return test
+
+
+def find_command(ctx):
+    """Команда find - поиск по имени, типу и размеру"""
+    root = "."
+    args = list(ctx.args)
+    if args and not args[0].startswith("-"):
+        root = args.pop(0)
+    name_pattern = None
+    file_type = None
+    size_test = None
+    it = iter(args)
+    for arg in it:
+        value = next(it, None)
+        if value is None:
+            raise CommandError(f"Опция {arg} требует значение")
+        if arg == "-name":
+            name_pattern = value
+        elif arg == "-type":
+            if value not in ("f", "d"):
+                raise CommandError("Тип должен быть f или d")
+            file_type = value
+        elif arg == "-size":
+            size_test = parse_size_test(value)
+        else:
+            raise CommandError(f"Неизвестная опция: {arg}")
+
+    def matches(name, is_dir, get_size):
+        if file_type == "f" and is_dir or file_type == "d" and not is_dir:
+            return False
+        if name_pattern is not None and not fnmatch.fnmatchcase(name, name_pattern):
+            return False
+        if size_test is not None and not size_test(get_size()):
+            return False
+        return True
+
+    # Пути выводятся от корня в том виде, в каком его указал пользователь
+    shown, root = root, ctx.resolve(root)
+    if not os.path.isdir(root):
+        if not os.path.lexists(root):
+            raise CommandError(f"'{shown}' не существует")
+        if matches(os.path.basename(root), False, lambda: os.lstat(root).st_size):
+            yield f"{shown}\n"
+        return
+
+    if matches(os.path.basename(os.path.normpath(root)), True, lambda: os.lstat(root).st_size):
+        yield f"{shown}\n"
+    for path, entries, error in walk_entries(ctx, root):
+        if error is not None:
+            yield f"find: {path}: {error.strerror}\n"
+            continue
+        found = []
+        for entry in entries:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if matches(entry.name, is_dir, lambda: entry.stat(follow_symlinks=False).st_size):
+                found.append(f"{shown}{entry.path[len(root):]}\n")
+        if found:
+            yield "".join(found)
+
+
+@functools.lru_cache(maxsize=16)
+def compile_pattern(pattern, ignore_case):
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(pattern, flags)
+
+
+def search_block(regex, block, first_line, prefix, numbers):
+    """Совпадения в блоке целых строк: поиск по всему блоку, а не построчно"""
+    found = []
+    position = 0
+    line_start = 0
+    line_number = first_line
+    size = len(block)
+    for match in regex.finditer(block):
+        # Пустое совпадение после завершающего перевода строки - не строка
+        if match.start() < position or match.start() == size and block.endswith("\n"):
+            continue
+        start = block.rfind("\n", 0, match.start()) + 1
+        end = block.find("\n", match.end())
+        if end == -1:
+            end = len(block)
+        if numbers:
+            line_number += block.count("\n", line_start, start)
+            line_start = start
+            found.append(f"{prefix}{line_number}:{block[start:end]}\n")
+        else:
+            found.append(f"{prefix}{block[start:end]}\n")
+        position = end + 1
+    return found
+
+
+def grep_chunks(regex, chunks, prefix, numbers):
+    """Потоковый поиск: блоки режутся по последнему переводу строки"""
+    carry = ""
+    line_number = 1
+    for text in chunks:
+        buffer = carry + text if carry else text
+        cut = buffer.rfind("\n") + 1
+        if not cut:
+            carry = buffer
+            continue
+        block, carry = buffer[:cut], buffer[cut:]
+        found = search_block(regex, block, line_number, prefix, numbers)
+        if found:
+            yield "".join(found)
+        if numbers:
+            line_number += block.count("\n")
+    if carry:
+        found = search_block(regex, carry, line_number, prefix, numbers)
+        if found:
+            yield "".join(found)
+
+
+def grep_file(pattern, ignore_case, numbers, path, prefix):
+    """Все совпадения в одном файле одной строкой (выполняется и в процессах пула)"""
+    regex = compile_pattern(pattern, ignore_case)
+    try:
+        return "".join(grep_chunks(regex, iter_text(path, GREP_CHUNK_SIZE), prefix, numbers)), None
+    except OSError as e:
+        return "", f"grep: {path}: {e.strerror}\n"
+
+
+def grep_batch(pattern, ignore_case, numbers, files):
+    """Задача пула процессов: группа файлов, результаты в исходном порядке"""
+    return [grep_file(pattern, ignore_case, numbers, path, f"{shown}:") for path, shown in files]
+
+
+def iter_grep_files(ctx, paths):
+    """Файлы для рекурсивного поиска в порядке обхода: (полный путь, путь для вывода)"""
+    for shown in paths:
+        root = ctx.resolve(shown)
+        if not os.path.isdir(root):
+            yield root, shown
+            continue
+        for path, entries, error in walk_entries(ctx, root):
+            if error is not None:
+                continue
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    yield entry.path, shown + entry.path[len(root):]
+
+
+def grep_parallel(ctx, pattern, ignore_case, numbers, files):
+    """Рекурсивный поиск в пуле процессов с выводом в порядке обхода"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = os.cpu_count() or 1
+    context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                          else None)
+    pending = deque()
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        try:
+            for path in files:
+                batch.append(path)
+                if len(batch) < GREP_BATCH_SIZE:
+                    continue
+                pending.append(pool.submit(grep_batch, pattern, ignore_case, numbers, batch))
+                batch = []
+                # Ограничиваем число задач в полете и выдаем готовые по порядку
+                while len(pending) > workers * 4 or pending and pending[0].done():
+                    yield pending.popleft().result()
+            if batch:
+                pending.append(pool.submit(grep_batch, pattern, ignore_case, numbers, batch))
+            while pending:
+                ctx.check_cancelled()
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def grep_command(ctx):
+    """Команда grep - поиск строк по регулярному выражению"""
+    flags, operands = parse_flags(ctx, "rni")
+    if not operands:
+        raise CommandError("Нужно указать шаблон")
+    pattern, paths = operands[0], operands[1:]
+    try:
+        regex = compile_pattern(pattern, "i" in flags)
+    except re.error as e:
+        raise CommandError(f"Неверный шаблон: {str(e)}")
+    numbers = "n" in flags
+    recursive = "r" in flags
+    if not paths:
+        if ctx.stdin is None:
+            raise CommandError("Нужно указать файл")
+        yield from grep_chunks(regex, ctx.stdin, "", numbers)
+        return
+
+    fs = ctx.shell.fs
+    if recursive and fs.isolated:
+        raise CommandError("grep -r недоступен в изолированной файловой системе")
+    if not recursive:
+        show_names = len(paths) > 1
+        for path in paths:
+            if fs.isdir(path):
+                ctx.exit_code = 1
+                yield f"grep: {path}: является директорией (используйте grep -r)\n"
+                continue
+            prefix = f"{path}:" if show_names else ""
+            try:
+                yield from grep_chunks(regex, iter_text(path, GREP_CHUNK_SIZE, opener=fs.open), prefix, numbers)
+            except OSError as e:
+                ctx.exit_code = 1
+                yield f"grep: {path}: {e.strerror}\n"
+        return
+
+    # Небольшие деревья быстрее обработать в текущем процессе, чем запускать пул
+    files = iter_grep_files(ctx, paths)
+    head = []
+    for path in files:
+        head.append(path)
+        if len(head) >= GREP_POOL_THRESHOLD:
+            break
+    if len(head) < GREP_POOL_THRESHOLD:
+        results = ([grep_file(pattern, "i" in flags, numbers, path, f"{shown}:")] for path, shown in head)
+    else:
+        from itertools import chain
+        results = grep_parallel(ctx, pattern, "i" in flags, numbers, chain(head, files))
+    for batch in results:
+        for text, error in batch:
+            if error:
+                ctx.exit_code = 1
+                yield error
+            elif text:
+                yield text
+
+
+def default_db_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "myos", "locate.db")
+
+
+def take_option(args, names, message):
+    """Извлечение опции со значением (-o FILE, --database=FILE) из args; None - опции нет"""
+    for index, arg in enumerate(args):
+        if arg in names:
+            if index + 1 >= len(args):
+                raise CommandError(message)
+            value = args[index + 1]
+            del args[index:index + 2]
+            return value
+        for name in names:
+            if name.startswith("--") and arg.startswith(name + "="):
+                del args[index]
+                return arg[len(name) + 1:]
+    return None
+
+
+def updatedb_command(ctx):
+    """Команда updatedb - построение индекса имен для locate
+
+    Индекс - блоки директорий в порядке обхода: заголовок "путь/" и имена
+    записей по алфавиту, каждое с завершающим '\\0'. Путь директории
+    хранится один раз на все ее записи, а так как имена не содержат '/' и
+    '\\0', locate ищет подстроку по всему файлу через bytes.find, не
+    собирая пути.
+    """
+    args = list(ctx.args)
+    db_path = take_option(args, ("-o",), "Опция -o требует путь к базе")
+    db_path = ctx.resolve(db_path) if db_path is not None else default_db_path()
+    root = os.path.abspath(ctx.resolve(args[0])) if args else "/"
+    prune = set(PRUNE_PATHS) - {root}
+
+    db_path = os.path.abspath(db_path)
+    db_dir = os.path.dirname(db_path)
+    os.makedirs(db_dir, exist_ok=True)
+    # Временный файл - рядом с базой (os.replace в пределах одной ФС);
+    # если база внутри индексируемого дерева, ни она, ни временный файл
+    # в индекс не попадают
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(db_path)}.", suffix=".tmp", dir=db_dir)
+    own_files = {db_path, tmp_path}
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") as db:
+            db.write(LOCATE_MAGIC)
+            stack = [root]
+            while stack:
+                ctx.check_cancelled()
+                path = stack.pop()
+                try:
+                    with os.scandir(path) as it:
+                        entries = sorted((entry for entry in it if entry.path not in own_files),
+                                         key=lambda entry: entry.name)
+                except OSError:
+                    continue
+                if entries:
+                    header = os.fsencode(path)
+                    db.write(header if header.endswith(b"/") else header + b"/")
+                    db.write(b"\0" + b"".join(os.fsencode(entry.name) + b"\0" for entry in entries))
+                count += len(entries)
+                stack.extend(entry.path for entry in reversed(entries)
+                             if entry.is_dir(follow_symlinks=False) and entry.path not in prune)
+                if count and not count % 10000:
+                    ctx.status(f"updatedb: {count} путей")
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, db_path)
+    ctx.status("")
+    yield f"Проиндексировано путей: {count} ({os.path.getsize(db_path)} байт) -> {db_path}\n"
+
+
+def iter_locate_db(data):
+    """Все пути индекса в байтах, по порядку"""
+    header = b""
+    for segment in data[len(LOCATE_MAGIC):].split(b"\0"):
+        if segment.endswith(b"/"):
+            header = segment
+        elif segment:
+            yield header + segment
+
+
+class LocateBlocks:
+    """Поиск блока директории по смещению в индексе; соседние запросы - без повторного поиска"""
+
+    def __init__(self, data):
+        self.data = data
+        self.start = self.end = len(LOCATE_MAGIC)
+        self.header = b""
+
+    def block_end(self, position):
+        """Начало следующего заголовка после position (или конец индекса)"""
+        data = self.data
+        header_end = data.find(b"/\0", position)
+        if header_end == -1:
+            return len(data)
+        return data.rfind(b"\0", 0, header_end) + 1
+
+    def names(self, position, end):
+        """Смещения имен блока от position до end"""
+        offsets = []
+        for name in self.data[position:end].split(b"\0")[:-1]:
+            offsets.append(position)
+            position += len(name) + 1
+        return offsets
+
+    def header_of(self, offset):
+        """Заголовок ("путь/") блока, содержащего имя со смещением offset"""
+        if not self.start <= offset < self.end:
+            data = self.data
+            header_end = data.rfind(b"/\0", 0, offset)
+            self.start = data.rfind(b"\0", 0, header_end) + 1 or len(LOCATE_MAGIC)
+            self.header = data[self.start:header_end + 1]
+            self.end = self.block_end(offset)
+        return self.header
+
+
+def locate_offsets(data, needle):
+    """Смещения имен, полные пути которых содержат needle, по порядку индекса
+
+    Совпадение целиком в имени - одно имя, в заголовке - все имена блока.
+    Совпадение через границу директории и имени делится по последнему '/'
+    needle: заголовок кончается на голову, имя начинается с хвоста.
+    """
+    blocks = LocateBlocks(data)
+    base = len(LOCATE_MAGIC)
+    found = []
+    position = data.find(needle, base)
+    while position != -1:
+        end = data.find(b"\0", position)
+        if data[end - 1:end] == b"/":
+            block_end = blocks.block_end(end + 1)
+            found.extend(blocks.names(end + 1, block_end))
+            position = data.find(needle, block_end)
+        else:
+            found.append(data.rfind(b"\0", 0, position) + 1)
+            position = data.find(needle, end + 1)
+
+    slash = needle.rfind(b"/")
+    if 0 <= slash < len(needle) - 1:
+        head, tail = needle[:slash + 1], needle[slash + 1:]
+        if len(tail) >= len(head):
+            # Имена, начинающиеся с хвоста, - с проверкой заголовка их блока
+            position = data.find(b"\0" + tail, base)
+            while position != -1:
+                if blocks.header_of(position + 1).endswith(head):
+                    found.append(position + 1)
+                position = data.find(b"\0" + tail, position + 1)
+        else:
+            # Заголовки, кончающиеся головой, - с проверкой имен их блока
+            position = data.find(head + b"\0", base)
+            while position != -1:
+                names_start = position + len(head) + 1
+                block_end = blocks.block_end(names_start)
+                for offset in blocks.names(names_start, block_end):
+                    if data.startswith(tail, offset):
+                        found.append(offset)
+                position = data.find(head + b"\0", block_end)
+        found = sorted(set(found))
+    return found
+
+
+def locate_command(ctx):
+    """Команда locate - поиск путей по индексу updatedb"""
+    args = list(ctx.args)
+    db_path = take_option(args, ("-d", "--database"), "Опция -d требует путь к базе")
+    ctx.args = args
+    flags, operands = parse_flags(ctx, "i")
+    if not operands:
+        raise CommandError("Нужно указать шаблон")
+    db_path = ctx.resolve(db_path) if db_path is not None else default_db_path()
+    try:
+        with open(db_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        raise CommandError("Индекс не найден, сначала выполните updatedb")
+    if not data.startswith(LOCATE_MAGIC):
+        raise CommandError("Неверный формат индекса, выполните updatedb заново")
+
+    pattern = operands[0]
+    ignore_case = "i" in flags
+    if any(char in pattern for char in "*?["):
+        # Шаблон с метасимволами сравнивается с путем целиком, как в locate
+        regex = re.compile(fnmatch.translate(pattern).encode("utf-8", "surrogateescape"),
+                           re.IGNORECASE if ignore_case else 0)
+        paths = (path for path in iter_locate_db(data) if regex.match(path))
+    else:
+        # Подстрока ищется по всему индексу сразу; при -i - по копии в нижнем регистре
+        # (lower не меняет длину, поэтому смещения те же)
+        needle = os.fsencode(pattern)
+        if ignore_case:
+            offsets = locate_offsets(data.lower(), needle.lower())
+        else:
+            offsets = locate_offsets(data, needle)
+        blocks = LocateBlocks(data)
+        paths = (blocks.header_of(offset) + data[offset:data.find(b"\0", offset)] for offset in offsets)
+
+    found = []
+    for path in paths:
+        found.append(os.fsdecode(path))
+        if len(found) >= 1000:
+            ctx.check_cancelled()
+            yield "\n".join(found) + "\n"
+            found = []
+    if found:
+        yield "\n".join(found) + "\n"
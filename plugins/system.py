@@ -0,0 +1,205 @@
+"""
+Системные команды: df, free, vmstat, iostat
+
+Команды не обращаются к системе сами, а читают выборки общего фонового
+сборщика (metrics.MetricsCollector); данные не старше интервала выборки.
+"""
+
+import os
+
+from shell_core import CommandError, parse_flags, human_size
+from metrics import MetricsCollector, boot_sample, cpu_percent, disk_rates, trend
+
+
+def parse_seconds(operands):
+    """Необязательный операнд - окно тренда в секундах"""
+    if not operands:
+        return None
+    if len(operands) > 1:
+        raise CommandError(f"Лишний аргумент: {operands[1]}")
+    try:
+        seconds = float(operands[0])
+    except ValueError:
+        raise CommandError(f"Неверное число секунд: {operands[0]}")
+    if seconds <= 0:
+        raise CommandError("Число секунд должно быть положительным")
+    return seconds
+
+
+def interval_pairs(samples):
+    """Пары соседних выборок; по одной выборке - пара с нулевой выборкой загрузки системы"""
+    if len(samples) == 1:
+        boot = boot_sample(samples[0])
+        return [(boot, samples[0])] if boot is not None else []
+    return [(before, after) for before, after in zip(samples, samples[1:]) if after.time > before.time]
+
+
+def df_command(ctx):
+    """Команда df - дисковое пространство по реальным точкам монтирования"""
+    flags, paths = parse_flags(ctx, "ah")
+    mounts = MetricsCollector.shared().latest().mounts
+
+    rows = []
+    seen = set()
+    for device, mountpoint, fstype, total, free, available in mounts:
+        # Псевдо-ФС (proc, sysfs, cgroup) не имеют блоков; повторные монтирования скрываем
+        if "a" not in flags and (total == 0 or (device, mountpoint) in seen):
+            continue
+        seen.add((device, mountpoint))
+        used = total - free
+        # Процент как в df: от места, доступного обычному пользователю
+        percent = f"{-(-used * 100 // (used + available))}%" if used + available else "-"
+        rows.append((device, fstype, total, used, available, percent, mountpoint))
+
+    if paths:
+        # df <путь> - только ФС, содержащая путь (самая длинная точка монтирования)
+        selected = []
+        for path in paths:
+            real = os.path.realpath(ctx.resolve(path))
+            candidates = [row for row in rows
+                          if real == row[6] or real.startswith(row[6].rstrip("/") + "/")]
+            if not candidates:
+                raise CommandError(f"'{path}': файловая система не найдена")
+            selected.append(max(candidates, key=lambda row: len(row[6])))
+        rows = selected
+
+    # Как в df: без -h - блоки по 1 КиБ
+    def size(value):
+        return human_size(value) if "h" in flags else str(value // 1024)
+
+    width = 8 if "h" in flags else 12
+    lines = [f"{'Файловая система':<24} {'Тип':<8} {'Размер' if 'h' in flags else '1K-блоков':>{width}} "
+             f"{'Использовано':>12} {'Доступно':>12} {'Использовано%':>13} Примонтировано на\n"]
+    for device, fstype, total, used, available, percent, mountpoint in rows:
+        lines.append(f"{device:<24} {fstype:<8} {size(total):>{width}} {size(used):>12} "
+                     f"{size(available):>12} {percent:>13} {mountpoint}\n")
+    yield "".join(lines)
+
+
+def memory_used(memory):
+    """Занятая память как в free: всего без свободной, буферов и кэша"""
+    return (memory["MemTotal"] - memory["MemFree"] - memory.get("Buffers", 0) - memory.get("Cached", 0)
+            - memory.get("SReclaimable", 0))
+
+
+def free_command(ctx):
+    """Команда free - использование памяти; с числом секунд - мин/сред/макс за это время"""
+    flags, operands = parse_flags(ctx, "h")
+    seconds = parse_seconds(operands)
+    collector = MetricsCollector.shared()
+    memory = collector.latest().memory
+    if not memory or "MemTotal" not in memory:
+        raise CommandError("Нет данных о памяти (/proc/meminfo)")
+
+    def size(value):
+        return human_size(value) if "h" in flags else str(int(value) // 1024)
+
+    total = memory["MemTotal"]
+    cache = memory.get("Buffers", 0) + memory.get("Cached", 0) + memory.get("SReclaimable", 0)
+    swap_total = memory.get("SwapTotal", 0)
+    swap_free = memory.get("SwapFree", 0)
+    rows = [("Память:", total, memory_used(memory), memory["MemFree"], memory.get("Shmem", 0), cache,
+             memory.get("MemAvailable", memory["MemFree"])),
+            ("Подкачка:", swap_total, swap_total - swap_free, swap_free)]
+
+    lines = [f"{'':<10} {'всего':>10} {'занято':>10} {'свободно':>10} {'общая':>10} {'буф/кэш':>10} "
+             f"{'доступно':>10}\n"]
+    for name, *values in rows:
+        lines.append(f"{name:<10} " + " ".join(f"{size(value):>10}" for value in values) + "\n")
+
+    if seconds is not None:
+        samples = [sample for sample in collector.window(seconds)
+                   if sample.memory and "MemTotal" in sample.memory]
+        lines.append(f"\nЗа {samples[-1].time - samples[0].time:.0f} с ({len(samples)} выборок):\n")
+        lines.append(f"{'':<10} {'мин':>10} {'сред':>10} {'макс':>10}\n")
+        series = (("Занято:", [memory_used(sample.memory) for sample in samples]),
+                  ("Доступно:", [sample.memory.get("MemAvailable", sample.memory["MemFree"])
+                                 for sample in samples]))
+        for name, values in series:
+            lines.append(f"{name:<10} " + " ".join(f"{size(value):>10}" for value in trend(values)) + "\n")
+    yield "".join(lines)
+
+
+VMSTAT_COLUMNS = ("r", "b", "swpd", "free", "buff", "cache", "si", "so", "bi", "bo", "in", "cs",
+                  "us", "sy", "id", "wa", "st")
+
+
+def vmstat_row(before, after):
+    """Показатели vmstat за интервал между двумя выборками (память - КиБ, ввод-вывод - КиБ/с)"""
+    elapsed = after.time - before.time
+
+    def rate(name):
+        if name not in before.counters or name not in after.counters:
+            return 0.0
+        return (after.counters[name] - before.counters[name]) / elapsed
+
+    memory = after.memory or {}
+    disks = disk_rates(before.disks, after.disks, elapsed).values()
+    # Страницы подкачки в /proc/vmstat - по 4 КиБ
+    return ((after.running, after.blocked,
+             (memory.get("SwapTotal", 0) - memory.get("SwapFree", 0)) // 1024,
+             memory.get("MemFree", 0) // 1024, memory.get("Buffers", 0) // 1024,
+             (memory.get("Cached", 0) + memory.get("SReclaimable", 0)) // 1024,
+             rate("pswpin") * 4, rate("pswpout") * 4,
+             sum(values[2] for values in disks) / 1024, sum(values[3] for values in disks) / 1024,
+             rate("intr"), rate("ctxt"))
+            + (cpu_percent(before.cpu, after.cpu) or (0.0,) * 5))
+
+
+def format_vmstat_row(name, row):
+    return f"{name:<5}" + " ".join(f"{value:>7.0f}" for value in row) + "\n"
+
+
+def vmstat_command(ctx):
+    """Команда vmstat - процессы, память, подкачка, ввод-вывод и CPU по выборкам сборщика"""
+    flags, operands = parse_flags(ctx, "")
+    seconds = parse_seconds(operands)
+    rows = [vmstat_row(before, after) for before, after in interval_pairs(MetricsCollector.shared().window(seconds))]
+    if not rows:
+        raise CommandError("Нет данных (/proc недоступен)")
+
+    lines = [f"{'':<5}" + " ".join(f"{column:>7}" for column in VMSTAT_COLUMNS) + "\n"]
+    if seconds is None:
+        lines.append(format_vmstat_row("", rows[-1]))
+    else:
+        # Тренд по каждой колонке за окно
+        columns = list(zip(*rows))
+        for index, name in enumerate(("мин", "сред", "макс")):
+            lines.append(format_vmstat_row(name, [trend(values)[index] for values in columns]))
+    yield "".join(lines)
+
+
+def device_mounts(mounts):
+    """Имя блочного устройства (sda1) -> точки монтирования"""
+    names = {}
+    for device, mountpoint, *_ in mounts or ():
+        if device.startswith("/dev/"):
+            names.setdefault(os.path.basename(os.path.realpath(device)), []).append(mountpoint)
+    return names
+
+
+def iostat_command(ctx):
+    """Команда iostat - нагрузка на блочные устройства за интервал между выборками"""
+    flags, operands = parse_flags(ctx, "a")
+    seconds = parse_seconds(operands)
+    samples = MetricsCollector.shared().window(seconds)
+    # Средние за все окно - по первой и последней выборке
+    pairs = interval_pairs([samples[0], samples[-1]] if len(samples) > 1 else samples)
+    if not pairs or pairs[0][1].disks is None:
+        raise CommandError("Нет данных о дисках (/proc/diskstats)")
+    before, after = pairs[0]
+    elapsed = after.time - before.time
+    mountpoints = device_mounts(after.mounts)
+
+    period = f"за {elapsed:.0f} с" if len(samples) > 1 else "с загрузки системы"
+    lines = [f"Средние {period}\n",
+             f"{'Устройство':<12} {'чт/с':>8} {'зап/с':>8} {'чт КиБ/с':>10} {'зап КиБ/с':>10} "
+             f"{'%занят':>7} Примонтировано на\n"]
+    for device, (reads, writes, read_bytes, write_bytes, util) in sorted(
+            disk_rates(before.disks, after.disks, elapsed).items()):
+        # Без -a устройства без операций за интервал не показываются
+        if "a" not in flags and not (reads or writes):
+            continue
+        lines.append(f"{device:<12} {reads:>8.1f} {writes:>8.1f} {read_bytes / 1024:>10.1f} "
+                     f"{write_bytes / 1024:>10.1f} {util:>7.1f} {' '.join(mountpoints.get(device, ()))}\n")
+    yield "".join(lines)
@@ -0,0 +1,874 @@
+"""
+Общее ядро команд для консольной и графической версий системы
+"""
+
+import importlib
+import os
+import stat
+import sys
+import threading
+import time
+
+from vfs import LocalFS, MemoryFS
+from file_stream import (iter_text, head_lines, head_text, tail_lines, tail_text, FileFollower,
+                         parse_line_count_args)
+
+
+class CommandError(Exception):
+    """Ошибка команды: сообщение выводится пользователю, код возврата 1"""
+
+
+class CommandCancelled(BaseException):
+    """Команда прервана по Ctrl+C (как KeyboardInterrupt, не ловится except Exception)"""
+
+
+class Command:
+    """Описание команды: имя, синонимы, справка и обработчик
+
+    Обработчик - функция handler(ctx), возвращающая итерируемый вывод
+    (обычно генератор строк) или None. Вместо функции можно передать строку
+    "модуль:функция" - тогда модуль импортируется при первом вызове команды.
+    host=True - команда работает с файлами хоста напрямую, минуя ctx.shell.fs
+    (пути разрешает через ctx.resolve), и недоступна в изолированной
+    файловой системе. expand=True - перед вызовом аргументы без кавычек
+    раскрываются ({a,b}, {1..N}, *, ?, [...]) по файловой системе сеанса.
+    """
+
+    def __init__(self, name, handler, usage, summary, description=None, aliases=(), host=False, expand=False):
+        self.name = name
+        self.target = handler
+        self.usage = usage
+        self.summary = summary
+        self.description = description or summary
+        self.aliases = tuple(aliases)
+        self.host = host
+        self.expand = expand
+
+    @property
+    def handler(self):
+        if isinstance(self.target, str):
+            module_name, _, attr = self.target.partition(":")
+            self.target = getattr(importlib.import_module(module_name), attr)
+        return self.target
+
+
+class CommandRegistry:
+    """Таблица команд с поиском по имени или синониму за O(1)"""
+
+    def __init__(self):
+        self.commands = {}
+        self.by_name = {}
+
+    def register(self, command):
+        """Регистрация команды; одноименная команда заменяется"""
+        old = self.commands.pop(command.name, None)
+        if old is not None:
+            for alias in old.aliases:
+                self.by_name.pop(alias, None)
+        self.commands[command.name] = command
+        self.by_name[command.name] = command
+        for alias in command.aliases:
+            self.by_name[alias] = command
+        return command
+
+    def command(self, name, usage, summary, description=None, aliases=(), host=False, expand=False):
+        """Декоратор для регистрации функции-обработчика"""
+        def decorator(handler):
+            self.register(Command(name, handler, usage, summary, description, aliases, host, expand))
+            return handler
+        return decorator
+
+    def lazy(self, name, target, usage, summary, description=None, aliases=(), host=False, expand=False):
+        """Регистрация команды из модуля, загружаемого при первом вызове"""
+        return self.register(Command(name, target, usage, summary, description, aliases, host, expand))
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def copy(self):
+        registry = CommandRegistry()
+        registry.commands = dict(self.commands)
+        registry.by_name = dict(self.by_name)
+        return registry
+
+    def __iter__(self):
+        return iter(self.commands.values())
+
+
+class OutputSink:
+    """Приемник вывода команд"""
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def status(self, text):
+        """Строка состояния (прогресс длинных операций); пустая строка ее убирает"""
+
+
+class StdoutSink(OutputSink):
+    """Вывод в стандартный поток (консольная версия)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        # Терминал умеет перерисовывать экран управляющими последовательностями
+        self.interactive = self.stream.isatty()
+
+    def write(self, text):
+        try:
+            self.stream.write(text)
+        except UnicodeEncodeError:
+            # Байты не в UTF-8 (суррогаты surrogateescape) выводятся как есть, как у cat
+            data = text.encode(self.stream.encoding or "utf-8", "surrogateescape")
+            buffer = getattr(self.stream, "buffer", None)
+            if buffer is None:
+                self.stream.write(data.decode(self.stream.encoding or "utf-8", "replace"))
+                return
+            self.stream.flush()
+            buffer.write(data)
+            buffer.flush()
+
+    def flush(self):
+        self.stream.flush()
+
+    def status(self, text):
+        # Строка состояния перерисовывается на месте только в терминале
+        if self.interactive:
+            self.stream.write(f"\r\x1b[K{text}")
+            self.stream.flush()
+
+
+class BufferSink(OutputSink):
+    """Накопление вывода в памяти (параллельное выполнение строк сценария)"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def getvalue(self):
+        return "".join(self.chunks)
+
+
+class CommandContext:
+    """Один вызов команды: аргументы, оболочка и признак прерывания"""
+
+    def __init__(self, shell, name, args, cancel_event=None, stdin=None, quoted=None):
+        self.shell = shell
+        self.name = name
+        self.args = args
+        # Признаки аргументов в кавычках (как Stage.quoted); None - нет или аргументы уже раскрыты
+        self.quoted = quoted
+        self.cancel_event = cancel_event or threading.Event()
+        # Поток текста от предыдущей команды конвейера или из '<'; None - ввода нет
+        self.stdin = stdin
+        self.exit_code = 0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Выход из длинного цикла, если команду прервали"""
+        if self.cancel_event.is_set():
+            raise CommandCancelled()
+
+    def wait(self, seconds):
+        """Пауза, прерываемая Ctrl+C"""
+        if self.cancel_event.wait(seconds):
+            raise CommandCancelled()
+
+    def resolve(self, path):
+        """Путь для прямых вызовов os с учетом текущей директории сеанса"""
+        return self.shell.fs.resolve(path)
+
+    def status(self, text):
+        """Обновление строки состояния в приемнике вывода"""
+        self.shell.sink.status(text)
+
+    def require_arg(self, message):
+        """Первый аргумент или ошибка с указанным сообщением"""
+        if not self.args:
+            raise CommandError(message)
+        return self.args[0]
+
+
+class Token:
+    """Слово командной строки или оператор (| < > >>)"""
+
+    __slots__ = ("text", "operator", "quoted")
+
+    def __init__(self, text, operator=False, quoted=False):
+        self.text = text
+        self.operator = operator
+        self.quoted = quoted
+
+
+def tokenize(line):
+    """Разбиение строки на слова и операторы с учетом кавычек и '\\'"""
+    tokens = []
+    word = []
+    in_word = quoted = False
+    i = 0
+    n = len(line)
+    while i < n:
+        char = line[i]
+        if char in " \t\n":
+            if in_word:
+                tokens.append(Token("".join(word), quoted=quoted))
+                word = []
+                in_word = quoted = False
+            i += 1
+        elif char in "|<>":
+            if in_word:
+                tokens.append(Token("".join(word), quoted=quoted))
+                word = []
+                in_word = quoted = False
+            operator = ">>" if line.startswith(">>", i) else char
+            tokens.append(Token(operator, operator=True))
+            i += len(operator)
+        elif char == "'":
+            end = line.find("'", i + 1)
+            if end == -1:
+                raise ValueError("незакрытая кавычка")
+            word.append(line[i + 1:end])
+            in_word = quoted = True
+            i = end + 1
+        elif char == '"':
+            i += 1
+            while True:
+                if i >= n:
+                    raise ValueError("незакрытая кавычка")
+                char = line[i]
+                if char == '"':
+                    break
+                if char == "\\" and i + 1 < n and line[i + 1] in '"\\$`':
+                    i += 1
+                    char = line[i]
+                word.append(char)
+                i += 1
+            in_word = quoted = True
+            i += 1
+        elif char == "\\":
+            if i + 1 < n:
+                word.append(line[i + 1])
+            in_word = quoted = True
+            i += 2
+        else:
+            word.append(char)
+            in_word = True
+            i += 1
+    if in_word:
+        tokens.append(Token("".join(word), quoted=quoted))
+    return tokens
+
+
+class Stage:
+    """Одна команда конвейера с перенаправлениями ввода и вывода
+
+    quoted - признаки аргументов, записанных в кавычках или с '\\' (такие
+    не раскрываются); None - ни один аргумент не в кавычках.
+    """
+
+    def __init__(self, name, args, stdin_path=None, stdout_path=None, append=False, quoted=None):
+        self.name = name
+        self.args = args
+        self.stdin_path = stdin_path
+        self.stdout_path = stdout_path
+        self.append = append
+        self.quoted = quoted
+
+
+def parse_pipeline(line):
+    """Разбор строки в список стадий: cmd args [< in] [> out | >> out] | ..."""
+    stages = []
+    words = []
+    quoted = []
+    redirects = {}
+    tokens = iter(tokenize(line))
+    for token in tokens:
+        if not token.operator:
+            words.append(token.text)
+            quoted.append(token.quoted)
+        elif token.text == "|":
+            if not words:
+                raise ValueError("пустая команда в конвейере")
+            stages.append(Stage(words[0], words[1:], quoted=quoted[1:], **redirects))
+            words = []
+            quoted = []
+            redirects = {}
+        else:
+            target = next(tokens, None)
+            if target is None or target.operator:
+                raise ValueError(f"после '{token.text}' нужно указать файл")
+            if token.text == "<":
+                redirects["stdin_path"] = target.text
+            else:
+                redirects["stdout_path"] = target.text
+                redirects["append"] = token.text == ">>"
+    if words:
+        stages.append(Stage(words[0], words[1:], quoted=quoted[1:], **redirects))
+    elif stages or redirects:
+        raise ValueError("пустая команда в конвейере")
+    return stages
+
+
+class Shell:
+    """Состояние сеанса и выполнение команд и конвейеров по таблице"""
+
+    def __init__(self, sink, registry=None, fs=None):
+        self.sink = sink
+        self.registry = (registry or COMMANDS).copy()
+        # Файловая система сеанса (vfs.FileSystem): хост или изолированная в памяти
+        self.fs = fs or LocalFS()
+        self.running = True
+        # История команд (history.History); None - история не ведется
+        self.history = None
+        # Сборщик статистики (instrumentation.Instrumentation); None - замеров нет
+        self.instrumentation = None
+        # MYOS_STATS=1 включает статистику с запуска, MYOS_STATS=cpu|memory - и профилирование
+        stats_mode = os.environ.get("MYOS_STATS")
+        if stats_mode:
+            from instrumentation import Instrumentation
+            self.instrumentation = Instrumentation(stats_mode if stats_mode in ("cpu", "memory") else None)
+
+    def parse(self, line):
+        """Разбор строки команды в список стадий конвейера"""
+        return parse_pipeline(line)
+
+    def execute(self, line, cancel_event=None):
+        """Выполнение строки команды; возвращает код возврата"""
+        try:
+            stages = self.parse(line)
+        except ValueError as e:
+            self.sink.write(f"Ошибка разбора команды: {str(e)}\n")
+            return 2
+        if not stages:
+            return 0
+        return self.run_pipeline(stages, cancel_event)
+
+    def run(self, cmd, args, cancel_event=None):
+        """Выполнение одной команды без перенаправлений"""
+        return self.run_pipeline([Stage(cmd, args)], cancel_event)
+
+    def run_pipeline(self, stages, cancel_event=None):
+        """Выполнение конвейера (с замером, если включена статистика); возвращает код возврата"""
+        if self.instrumentation is not None:
+            return self.instrumentation.measure(self.run_stages, stages, cancel_event)
+        return self.run_stages(stages, cancel_event)[0]
+
+    def run_stages(self, stages, cancel_event=None):
+        """Ленивое выполнение конвейера: каждая стадия читает вывод предыдущей
+        по мере надобности, поэтому память постоянна, а когда последняя
+        стадия (например, head) завершается, предыдущие закрываются и
+        перестают читать. Возвращает код возврата и число выведенных символов.
+        """
+        cancel_event = cancel_event or threading.Event()
+        generators = []
+        ctx = None
+        written = 0
+        try:
+            stream = None
+            for stage in stages:
+                if stage.stdin_path is not None:
+                    try:
+                        with self.fs.open(stage.stdin_path, 'rb'):
+                            pass
+                    except OSError as e:
+                        self.sink.write(f"{stage.stdin_path}: {e.strerror}\n")
+                        return 1, 0
+                    stream = iter_text(stage.stdin_path, opener=self.fs.open)
+                try:
+                    ctx = self.stage_context(stage.name, stage.args, stage.quoted, cancel_event, stream)
+                except ValueError as e:
+                    self.sink.write(f"{stage.name}: {str(e)}\n")
+                    return 1, 0
+                stream = self.stage_output(ctx)
+                generators.append(stream)
+                if stage.stdout_path is not None:
+                    stream = self.redirect_output(ctx, stream, stage.stdout_path, stage.append)
+                    generators.append(stream)
+            for text in stream:
+                if cancel_event.is_set():
+                    raise CommandCancelled()
+                self.sink.write(text)
+                written += len(text)
+        except (CommandCancelled, KeyboardInterrupt):
+            self.sink.write("^C\n")
+            return 130, written
+        finally:
+            for generator in reversed(generators):
+                generator.close()
+            self.sink.flush()
+        return ctx.exit_code, written
+
+    def stage_context(self, name, args, quoted=None, cancel_event=None, stdin=None):
+        """Контекст вызова команды; у команд с expand=True аргументы раскрываются по fs
+        (ValueError - раскрытие дает слишком много слов)
+        """
+        command = self.registry.get(name)
+        if command is not None and command.expand:
+            from expansion import expand_words
+            args = expand_words(self.fs, args, quoted)
+            quoted = None
+        return CommandContext(self, name, args, cancel_event, stdin, quoted)
+
+    def stage_output(self, ctx):
+        """Вывод одной стадии; ошибки идут в приемник, а не дальше по конвейеру"""
+        command = self.registry.get(ctx.name)
+        if command is None:
+            self.sink.write(f"Команда не найдена: {ctx.name}\n")
+            ctx.exit_code = 127
+            return
+        if command.host and self.fs.isolated:
+            self.sink.write(f"Команда недоступна в изолированной файловой системе: {ctx.name}\n")
+            ctx.exit_code = 1
+            return
+        try:
+            output = command.handler(ctx)
+            if output is not None:
+                for text in output:
+                    ctx.check_cancelled()
+                    yield text
+        except CommandError as e:
+            self.sink.write(f"{str(e)}\n")
+            ctx.exit_code = 1
+        except Exception as e:
+            self.sink.write(f"Ошибка: {str(e)}\n")
+            ctx.exit_code = 1
+
+    def redirect_output(self, ctx, stream, path, append):
+        """Запись вывода стадии в файл (> или >>); дальше по конвейеру ничего не идет"""
+        try:
+            # surrogateescape - байты, прочитанные не как UTF-8, записываются без изменений
+            with self.fs.open(path, 'a' if append else 'w', encoding='utf-8', errors='surrogateescape') as f:
+                for text in stream:
+                    f.write(text)
+        except OSError as e:
+            self.sink.write(f"{path}: {e.strerror}\n")
+            ctx.exit_code = 1
+        return
+        yield
+
+
+def parse_flags(ctx, allowed):
+    """Разбор однобуквенных опций (в том числе слитных: -la); возвращает (flags, operands)"""
+    flags = set()
+    operands = []
+    options_done = False
+    for arg in ctx.args:
+        if options_done or not arg.startswith("-") or arg == "-":
+            operands.append(arg)
+        elif arg == "--":
+            options_done = True
+        else:
+            for flag in arg[1:]:
+                if flag not in allowed:
+                    raise CommandError(f"Неизвестная опция: -{flag}")
+                flags.add(flag)
+    return flags, operands
+
+
+def human_size(size):
+    """Размер в байтах в виде 1.5K, 20M, 3.2G"""
+    for unit in ("B", "K", "M", "G", "T"):
+        if abs(size) < 1024 or unit == "T":
+            if unit == "B":
+                return f"{size}B"
+            return f"{size:.1f}{unit}" if abs(size) < 10 else f"{size:.0f}{unit}"
+        size /= 1024
+
+
+def ensure_newline(chunks):
+    """Поток текста, гарантированно заканчивающийся переводом строки"""
+    last = "\n"
+    for text in chunks:
+        if text:
+            yield text
+            last = text[-1]
+    if last != "\n":
+        yield "\n"
+
+
+COMMANDS = CommandRegistry()
+
+
+def scan_directory(fs, path, show_hidden, need_stat):
+    """Записи директории через scandir: тип берется из d_type без лишнего stat"""
+    entries = []
+    with fs.scandir(path) as it:
+        for entry in it:
+            if not show_hidden and entry.name.startswith("."):
+                continue
+            info = entry.stat(follow_symlinks=False) if need_stat else None
+            entries.append((entry, info))
+    return entries
+
+
+def sort_entries(entries, flags):
+    """Сортировка по имени, размеру (-S) или времени изменения (-t); -r - обратный порядок"""
+    if "S" in flags:
+        entries.sort(key=lambda item: (-item[1].st_size, item[0].name))
+    elif "t" in flags:
+        entries.sort(key=lambda item: (-item[1].st_mtime_ns, item[0].name))
+    else:
+        entries.sort(key=lambda item: item[0].name)
+    if "r" in flags:
+        entries.reverse()
+
+
+def format_entries(entries, long_format):
+    """Листинг директории одной строкой"""
+    lines = []
+    if long_format:
+        localtime = time.localtime
+        strftime = time.strftime
+        for entry, info in entries:
+            suffix = "/" if stat.S_ISDIR(info.st_mode) else ""
+            lines.append(
+                f"{stat.filemode(info.st_mode)} {info.st_nlink:>3} {info.st_size:>12} "
+                f"{strftime('%Y-%m-%d %H:%M', localtime(info.st_mtime))} {entry.name}{suffix}\n"
+            )
+    else:
+        for entry, _ in entries:
+            if entry.is_dir():
+                lines.append(f"[DIR]  {entry.name}/\n")
+            else:
+                lines.append(f"[FILE] {entry.name}\n")
+    return "".join(lines)
+
+
+def list_tree(ctx, root, flags):
+    """Потоковый обход для ls -R: директории выводятся по мере чтения"""
+    need_stat = bool(flags & {"l", "S", "t"})
+    stack = [root]
+    first = True
+    while stack:
+        ctx.check_cancelled()
+        path = stack.pop()
+        try:
+            entries = scan_directory(ctx.shell.fs, path, "a" in flags, need_stat)
+        except OSError as e:
+            ctx.exit_code = 1
+            yield f"ls: {path}: {e.strerror}\n"
+            continue
+        sort_entries(entries, flags)
+        header = "" if first else "\n"
+        first = False
+        yield f"{header}{path}:\n{format_entries(entries, 'l' in flags)}"
+        subdirs = [os.path.join(path, entry.name) for entry, _ in entries
+                   if entry.is_dir(follow_symlinks=False)]
+        stack.extend(reversed(subdirs))
+
+
+@COMMANDS.command("ls", "ls [-laSRrt] [path]", "список файлов и директорий",
+                  "показывает список файлов и директорий (по умолчанию текущая); "
+                  "-l - подробно, -a - со скрытыми, -S - по размеру, -t - по времени, "
+                  "-r - в обратном порядке, -R - рекурсивно",
+                  aliases=("dir",))
+def ls_command(ctx):
+    flags, paths = parse_flags(ctx, "laSRrt")
+    paths = paths or ["."]
+    fs = ctx.shell.fs
+    need_stat = bool(flags & {"l", "S", "t"})
+    for index, path in enumerate(paths):
+        if len(paths) > 1 and "R" not in flags:
+            separator = "\n" if index else ""
+            yield f"{separator}{path}:\n"
+        if "R" in flags:
+            yield from list_tree(ctx, path, flags)
+            continue
+        try:
+            entries = scan_directory(fs, path, "a" in flags, need_stat)
+        except FileNotFoundError:
+            raise CommandError("Директория не найдена")
+        except PermissionError:
+            raise CommandError("Нет доступа к директории")
+        except NotADirectoryError:
+            info = fs.lstat(path)
+            if "l" in flags:
+                yield (f"{stat.filemode(info.st_mode)} {info.st_nlink:>3} {info.st_size:>12} "
+                       f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(info.st_mtime))} {path}\n")
+            else:
+                yield f"[FILE] {path}\n"
+            continue
+        sort_entries(entries, flags)
+        yield format_entries(entries, "l" in flags)
+
+
+@COMMANDS.command("pwd", "pwd", "текущая директория", "показывает текущую директорию")
+def pwd_command(ctx):
+    yield f"{ctx.shell.fs.getcwd()}\n"
+
+
+@COMMANDS.command("cd", "cd <path>", "сменить директорию", "изменяет текущую директорию на указанную")
+def cd_command(ctx):
+    path = ctx.require_arg("Нужно указать путь")
+    try:
+        ctx.shell.fs.chdir(path)
+    except FileNotFoundError:
+        raise CommandError("Директория не найдена")
+    except NotADirectoryError:
+        raise CommandError(f"'{path}' не является директорией")
+    except PermissionError:
+        raise CommandError("Нет доступа к директории")
+
+
+@COMMANDS.command("echo", "echo <text>", "вывести текст", "выводит указанный текст")
+def echo_command(ctx):
+    yield " ".join(ctx.args) + "\n"
+
+
+COMMANDS.lazy("mkdir", "plugins.fileops:mkdir_command", "mkdir [-p] <name>...", "создать директории",
+              "создает директории (можно много и по шаблону: mkdir d{1..100}); -p - вместе с родительскими, "
+              "без ошибки для существующих", expand=True)
+COMMANDS.lazy("touch", "plugins.fileops:touch_command", "touch <file>...", "создать файлы",
+              "создает пустые файлы с указанными именами (можно много: touch f{1..10000})", expand=True)
+
+
+COMMANDS.lazy("cat", "plugins.compressed:cat_command", "cat [file...]", "вывести содержимое файлов",
+              "выводит содержимое файлов подряд, читая их блоками; сжатые gzip, bz2 и xz распаковываются "
+              "на лету (несколько - параллельно); без файла или с '-' - ввод конвейера",
+              aliases=("zcat", "bzcat", "xzcat"), expand=True)
+
+
+def parse_count_args(ctx):
+    """Общий разбор аргументов head и tail; без файла читается ввод конвейера"""
+    try:
+        count, follow, paths = parse_line_count_args(ctx.args)
+    except ValueError:
+        raise CommandError("Неверное число строк")
+    if not paths and ctx.stdin is None:
+        raise CommandError("Нужно указать имя файла")
+    return count, follow, paths[0] if paths else None
+
+
+@COMMANDS.command("head", "head [-n N] [file]", "первые строки файла",
+                  "выводит первые N строк файла или ввода конвейера (по умолчанию 10)")
+def head_command(ctx):
+    count, _, path = parse_count_args(ctx)
+    if path is None:
+        # Чтение прекращается сразу после N-й строки - предыдущие стадии останавливаются
+        yield from ensure_newline(head_text(ctx.stdin, count))
+        return
+    try:
+        yield from ensure_newline(head_lines(path, count, opener=ctx.shell.fs.open))
+    except FileNotFoundError:
+        raise CommandError("Файл не найден")
+
+
+@COMMANDS.command("tail", "tail [-n N] [-f] [file]", "последние строки файла",
+                  "выводит последние N строк файла или ввода конвейера; -f - следить за дописыванием до Ctrl+C")
+def tail_command(ctx):
+    count, follow, path = parse_count_args(ctx)
+    if path is None:
+        yield from ensure_newline([tail_text(ctx.stdin, count)])
+        return
+    try:
+        yield from ensure_newline([tail_lines(path, count, opener=ctx.shell.fs.open)])
+        if not follow:
+            return
+        if ctx.shell.fs.isolated:
+            raise CommandError("tail -f недоступен в изолированной файловой системе")
+        follower = FileFollower(ctx.resolve(path))
+    except FileNotFoundError:
+        raise CommandError("Файл не найден")
+    try:
+        while True:
+            text = follower.poll()
+            if text:
+                yield text
+            else:
+                ctx.wait(0.5)
+    finally:
+        follower.close()
+
+
+COMMANDS.lazy("rm", "plugins.fileops:rm_command", "rm [-rf] <path>...", "удалить файлы или директории",
+              "удаляет файлы (можно много и по шаблону: rm *.tmp); с -r - директории со всем содержимым "
+              "(параллельно, с прогрессом); -f - не сообщать об отсутствующих путях", expand=True)
+COMMANDS.lazy("cp", "plugins.fileops:cp_command", "cp [-r] <src> <dst>", "копировать файлы",
+              "копирует файл или, с -r, директорию; копирование без лишних копий в памяти "
+              "(copy_file_range/sendfile), параллельно, с прогрессом", host=True)
+COMMANDS.lazy("mv", "plugins.fileops:mv_command", "mv <src> <dst>", "переместить или переименовать",
+              "перемещает файл или директорию; между файловыми системами - копированием с удалением",
+              host=True)
+
+
+COMMANDS.lazy("rmdir", "plugins.fileops:rmdir_command", "rmdir <name>...", "удалить пустые директории",
+              "удаляет пустые директории (можно много и по шаблону)", expand=True)
+
+
+COMMANDS.lazy("ps", "plugins.process:ps_command", "ps [aux]", "список процессов",
+              "показывает все процессы в стиле ps aux: пользователь, %CPU, %MEM, память, команда")
+COMMANDS.lazy("top", "plugins.process:top_command", "top [-d sec] [-n N]", "обновляемая таблица процессов",
+              "показывает процессы по загрузке CPU, обновляя таблицу каждые sec секунд (по умолчанию 2); "
+              "-n - число обновлений, -p - число строк; выход - Ctrl+C")
+COMMANDS.lazy("df", "plugins.system:df_command", "df [-ah] [path]", "информация о дисковом пространстве",
+              "показывает размер (в блоках по 1 КиБ) и заполненность смонтированных файловых систем из "
+              "/proc/self/mounts по последней выборке фонового сборщика; -h - размеры в K/M/G, "
+              "-a - включая псевдо-ФС, path - только ФС, содержащая путь", host=True)
+COMMANDS.lazy("du", "plugins.diskusage:du_command", "du [-sh] [--max-depth N] [path]", "размер директорий",
+              "показывает место, занятое директориями; -s - только итог, -h - в K/M/G, "
+              "--max-depth - глубина вывода, --no-cache - пересчитать без кэша размеров", host=True)
+COMMANDS.lazy("free", "plugins.system:free_command", "free [-h] [сек]", "информация об использовании памяти",
+              "показывает использование памяти и подкачки (в КиБ, -h - в удобных единицах); "
+              "сек - также мин/сред/макс занятой и доступной памяти за последние сек секунд")
+COMMANDS.lazy("vmstat", "plugins.system:vmstat_command", "vmstat [сек]", "статистика памяти, ввода-вывода и CPU",
+              "показывает процессы, память, подкачку, ввод-вывод и загрузку CPU за последнюю секунду; "
+              "сек - мин/сред/макс за последние сек секунд")
+COMMANDS.lazy("iostat", "plugins.system:iostat_command", "iostat [-a] [сек]", "нагрузка на диски",
+              "показывает операции, скорость и занятость блочных устройств за последнюю секунду "
+              "или за последние сек секунд; -a - включая устройства без операций")
+
+COMMANDS.lazy("find", "plugins.search:find_command", "find [dir] [-name glob] [-type f|d] [-size N]",
+              "поиск файлов", "ищет файлы по шаблону имени, типу (f - файл, d - директория) и размеру "
+              "([+-]N[c|k|M|G], без суффикса - блоки по 512 байт)", host=True)
+COMMANDS.lazy("grep", "plugins.search:grep_command", "grep [-rni] <re> [path]", "поиск строк в файлах",
+              "выводит строки файлов или ввода конвейера, совпадающие с регулярным выражением; "
+              "-r - рекурсивно (в пуле процессов), "
+              "-n - номера строк, -i - без учета регистра")
+COMMANDS.lazy("updatedb", "plugins.search:updatedb_command", "updatedb [-o db] [root]",
+              "построить индекс имен для locate",
+              "обходит дерево (по умолчанию /, без /proc, /sys, /dev, /run, /tmp) и сохраняет "
+              "сжатый индекс путей", host=True)
+COMMANDS.lazy("locate", "plugins.search:locate_command", "locate [-i] [-d db] <pattern>", "поиск путей по индексу",
+              "ищет пути в индексе updatedb (-d, --database - другой файл индекса, как у updatedb -o): "
+              "подстрока или шаблон с * ? [], сравниваемый с путем целиком",
+              host=True)
+
+COMMANDS.lazy("time", "plugins.profiling:time_command", "time <cmd> [args]", "замер выполнения команды",
+              "выполняет команду и сообщает реальное время, время CPU (user/sys) и пиковый RSS процесса")
+COMMANDS.lazy("stats", "plugins.profiling:stats_command", "stats [действие]", "статистика команд",
+              "on/off - включить или выключить сбор статистики (или MYOS_STATS=1 при запуске); "
+              "без аргументов - задержки, вызовы и объем вывода по командам; reset - сбросить; "
+              "profile cpu|memory|off - профиль каждой команды (cProfile/tracemalloc); "
+              "last - последний профиль; json [file] - выгрузка в JSON")
+COMMANDS.lazy("history", "plugins.history:history_command", "history [N | -s текст | -c]", "история команд",
+              "без аргументов - вся загруженная история, N - последние N команд, -s - различные команды "
+              "с текстом от новых к старым, -c - очистить историю; в окне и консоли стрелки вверх/вниз "
+              "листают историю, Ctrl+R - обратный поиск")
+
+
+@COMMANDS.command("vfs", "vfs [new|save|load]", "файловая система сеанса",
+                  "без аргументов - текущая файловая система сеанса; new - перейти в пустую ФС в памяти; "
+                  "save <image> - сохранить ФС в памяти в файл образа; load <image> - загрузить ФС из образа")
+def vfs_command(ctx):
+    shell = ctx.shell
+    action = ctx.args[0] if ctx.args else None
+    if action is None:
+        if isinstance(shell.fs, MemoryFS):
+            nodes, size = shell.fs.usage()
+            yield f"Файловая система: в памяти (узлов: {nodes}, данных: {human_size(size)})\n"
+        else:
+            yield f"Файловая система: {shell.fs.name}\n"
+    elif action == "new":
+        shell.fs = MemoryFS()
+        yield "Создана пустая файловая система в памяти\n"
+    elif action in ("save", "load"):
+        if len(ctx.args) < 2:
+            raise CommandError("Нужно указать файл образа")
+        path = ctx.args[1]
+        if action == "save":
+            if not isinstance(shell.fs, MemoryFS):
+                raise CommandError("В образ сохраняется только файловая система в памяти")
+            shell.fs.save_image(path)
+            yield f"Образ сохранен: {path}\n"
+        else:
+            try:
+                shell.fs = MemoryFS.load_image(path)
+            except ValueError as e:
+                raise CommandError(f"Неверный образ: {str(e)}")
+            yield f"Загружен образ: {path}\n"
+    else:
+        raise CommandError(f"Неизвестное действие: {action}")
+
+
+def snapshot_args(ctx, flags_allowed):
+    """Разбор аргументов snapshot/restore: флаги, имя и каталог (только для ФС хоста)"""
+    flags, operands = parse_flags(ctx, flags_allowed)
+    if len(operands) > 2:
+        raise CommandError("Лишние аргументы")
+    if len(operands) == 2 and ctx.shell.fs.isolated:
+        raise CommandError("Каталог снимка указывается только для файловой системы хоста")
+    return flags, operands[0] if operands else None, operands[1:]
+
+
+@COMMANDS.command("snapshot", "snapshot [-d] [name] [dir]", "снимок файловой системы",
+                  "без имени - список снимков; с именем - снимок с копированием при записи (в памяти - "
+                  "мгновенно, на хосте - дерево жестких ссылок на dir, по умолчанию текущую директорию); "
+                  "-d - удалить снимок; старые снимки удаляются автоматически")
+def snapshot_command(ctx):
+    flags, name, root = snapshot_args(ctx, "d")
+    fs = ctx.shell.fs
+    try:
+        if name is None:
+            names = fs.list_snapshots(*root)
+            yield "".join(f"{name}\n" for name in reversed(names)) if names else "Снимков нет\n"
+        elif "d" in flags:
+            fs.drop_snapshot(name, *root)
+            yield f"Снимок '{name}' удален\n"
+        else:
+            started = time.perf_counter()
+            fs.snapshot(name, *root)
+            yield f"Снимок '{name}' создан за {time.perf_counter() - started:.3f} с\n"
+    except FileNotFoundError:
+        raise CommandError(f"Снимок не найден: {name}")
+    except ValueError as e:
+        raise CommandError(str(e))
+
+
+@COMMANDS.command("restore", "restore <name> [dir]", "вернуться к снимку",
+                  "возвращает файловую систему (на хосте - директорию снимка) к состоянию снимка; "
+                  "меняются только записи, измененные после снимка")
+def restore_command(ctx):
+    _, name, root = snapshot_args(ctx, "")
+    if name is None:
+        raise CommandError("Нужно указать имя снимка")
+    started = time.perf_counter()
+    try:
+        changed = ctx.shell.fs.restore(name, *root)
+    except FileNotFoundError:
+        raise CommandError(f"Снимок не найден: {name}")
+    except ValueError as e:
+        raise CommandError(str(e))
+    details = f", изменено записей: {changed}" if changed is not None else ""
+    yield f"Восстановлен снимок '{name}' за {time.perf_counter() - started:.3f} с{details}\n"
+
+
+@COMMANDS.command("date", "date", "текущая дата и время", "показывает текущую дату и время")
+def date_command(ctx):
+    from datetime import datetime
+    yield f"{datetime.now()}\n"
+
+
+@COMMANDS.command("help", "help [cmd]", "эта справка или справка по команде",
+                  "показывает список доступных команд или справку по указанной")
+def help_command(ctx):
+    if ctx.args:
+        command = ctx.shell.registry.get(ctx.args[0])
+        if command is None:
+            raise CommandError(f"Команда не найдена: {ctx.args[0]}")
+        yield f"{command.usage} - {command.description}\n"
+        if command.aliases:
+            yield f"Синонимы: {', '.join(command.aliases)}\n"
+        return
+    lines = ["Доступные команды:\n"]
+    for command in ctx.shell.registry:
+        lines.append(f"  {command.usage:<13} - {command.summary}\n")
+    lines.append("Конвейеры и перенаправления: cmd1 | cmd2, cmd > file, cmd >> file, cmd < file\n")
+    yield "".join(lines)
+
+
+@COMMANDS.command("clear", "clear", "очистить экран", "очищает экран", aliases=("cls",))
+def clear_command(ctx):
+    os.system('clear' if os.name == 'posix' else 'cls')
+
+
+@COMMANDS.command("exit", "exit", "выйти из системы", "завершает работу системы", aliases=("quit", "logout"))
+def exit_command(ctx):
+    ctx.shell.running = False
+    yield "Выход из системы...\n"
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Сервер оболочки: много сеансов через Unix-сокет или TCP на localhost
+
+Каждое подключение - отдельный сеанс (Shell) со своей текущей директорией:
+cd меняет только путь сеанса, а не директорию процесса. Цикл asyncio лишь
+читает строки и пересылает вывод; сами команды выполняются в общем пуле
+потоков ограниченного размера, поэтому сотни сеансов не создают сотни
+потоков, а медленный клиент притормаживает только свою команду.
+
+Протокол - строки текста в UTF-8: строка - команда, строка с символом
+Ctrl+C (\\x03) прерывает выполняемую команду.
+
+Примеры:
+    python shell_server.py --unix /tmp/myos.sock
+    python shell_server.py --tcp 127.0.0.1:2323 --memfs
+    socat - UNIX-CONNECT:/tmp/myos.sock
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from shell_core import COMMANDS, Command, OutputSink, Shell
+from vfs import LocalFS
+
+
+# Потоки пула заняты в основном ожиданием ввода-вывода
+WORKER_COUNT = min(32, (os.cpu_count() or 1) * 4)
+# Размер буфера вывода сеанса, после которого поток команды ждет отправки клиенту
+FLUSH_SIZE = 64 * 1024
+# Строк, принятых от клиента, но еще не выполненных
+MAX_PENDING_LINES = 64
+CANCEL = b"\x03"
+
+
+class SocketSink(OutputSink):
+    """Вывод сеанса в сокет: накопление в потоке команды, отправка через цикл asyncio
+
+    Поток команды ждет, пока данные уйдут клиенту (drain), поэтому вывод
+    медленного клиента не копится в памяти сервера. После отключения
+    клиента вывод отбрасывается.
+    """
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.chunks = []
+        self.size = 0
+        self.closed = False
+
+    def write(self, text):
+        if self.closed:
+            return
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.chunks:
+            return
+        data = "".join(self.chunks).encode("utf-8", "replace")
+        self.chunks = []
+        self.size = 0
+        if self.closed:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.send(data), self.loop).result()
+        except (OSError, RuntimeError, CancelledError):
+            self.closed = True
+
+    async def send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+
+def clear_command(ctx):
+    """Команда clear сеанса - очистка экрана клиента управляющей последовательностью"""
+    yield "\x1b[H\x1b[2J"
+
+
+class Session:
+    """Сеанс одного подключения: оболочка, очередь строк и признак прерывания"""
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.sink = SocketSink(server.loop, writer)
+        self.shell = Shell(self.sink, server.registry, server.new_fs())
+        self.lines = asyncio.Queue(MAX_PENDING_LINES)
+        self.cancel_event = threading.Event()
+
+    def prompt(self):
+        name = os.path.basename(self.shell.fs.getcwd().rstrip("/")) or "/"
+        return f"user@console-os:{name}$ "
+
+    async def send(self, text):
+        self.writer.write(text.encode("utf-8", "replace"))
+        await self.writer.drain()
+
+    def execute(self, line, cancel_event):
+        """Выполнение строки в потоке пула"""
+        try:
+            return self.shell.execute(line, cancel_event)
+        finally:
+            self.sink.flush()
+
+    async def read_lines(self):
+        """Чтение строк клиента; Ctrl+C прерывает текущую команду сразу, без очереди"""
+        while True:
+            data = await self.reader.readline()
+            if not data:
+                return
+            if CANCEL in data:
+                self.cancel_event.set()
+                continue
+            await self.lines.put(data.decode("utf-8", "replace").strip())
+
+    async def run_commands(self):
+        """Выполнение строк по одной, пока сеанс не завершится командой exit"""
+        loop = self.server.loop
+        await self.send(self.prompt())
+        while self.shell.running:
+            line = await self.lines.get()
+            if line:
+                # Ctrl+C, пришедший между командами, не должен прервать следующую
+                self.cancel_event = threading.Event()
+                await loop.run_in_executor(self.server.executor, self.execute, line, self.cancel_event)
+            if self.shell.running:
+                await self.send(self.prompt())
+
+    async def run(self):
+        reading = asyncio.ensure_future(self.read_lines())
+        running = asyncio.ensure_future(self.run_commands())
+        try:
+            await asyncio.wait((reading, running), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Клиент отключился - выполняемая команда прерывается, вывод отбрасывается
+            self.cancel_event.set()
+            self.sink.closed = True
+            for task in (reading, running):
+                task.cancel()
+            await asyncio.gather(reading, running, return_exceptions=True)
+
+
+class ShellServer:
+    """Прием подключений и общий пул потоков для команд всех сеансов"""
+
+    def __init__(self, root=None, template_fs=None, workers=WORKER_COUNT, max_sessions=1000):
+        self.root = os.path.abspath(root or os.getcwd())
+        # Файловая система в памяти: каждый сеанс получает свою копию (fork) за O(1)
+        self.template_fs = template_fs
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session")
+        self.max_sessions = max_sessions
+        self.sessions = set()
+        self.loop = None
+        self.registry = COMMANDS.copy()
+        self.registry.register(Command("clear", clear_command, "clear", "очистить экран", "очищает экран",
+                                       aliases=("cls",)))
+
+    def new_fs(self):
+        if self.template_fs is not None:
+            return self.template_fs.fork()
+        return LocalFS(cwd=self.root)
+
+    async def handle(self, reader, writer):
+        try:
+            if len(self.sessions) >= self.max_sessions:
+                writer.write("Слишком много сеансов, попробуйте позже\n".encode("utf-8"))
+                await writer.drain()
+                return
+            session = Session(self, reader, writer)
+            self.sessions.add(session)
+            try:
+                await session.send(f"Добро пожаловать в консольную Linux-подобную систему!\n"
+                                   f"Текущая директория: {session.shell.fs.getcwd()}\n")
+                await session.run()
+            finally:
+                self.sessions.discard(session)
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def backlog(self):
+        # Очередь подключений по умолчанию (100) мала для одновременного входа сотен клиентов
+        return min(self.max_sessions, socket.SOMAXCONN)
+
+    async def serve(self, unix_path=None, host=None, port=None):
+        self.loop = asyncio.get_running_loop()
+        # SIGTERM завершает сервер так же, как Ctrl+C: с удалением файла сокета
+        self.loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if unix_path is not None:
+            remove_stale_socket(unix_path)
+            server = await asyncio.start_unix_server(self.handle, unix_path, backlog=self.backlog())
+            address = unix_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port, backlog=self.backlog())
+            address = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"Сервер оболочки слушает {address}", file=sys.stderr, flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for session in list(self.sessions):
+                session.cancel_event.set()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if unix_path is not None:
+                remove_stale_socket(unix_path)
+
+
+def remove_stale_socket(path):
+    """Удаление файла сокета от прежнего запуска (другие файлы не трогаем)"""
+    try:
+        if stat.S_ISSOCK(os.lstat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def parse_address(value):
+    """HOST:PORT (или просто PORT) для --tcp"""
+    host, _, port = value.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise ValueError(f"неверный адрес: {value}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Сервер оболочки: сеансы через локальный сокет")
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument("--unix", metavar="PATH", help="слушать Unix-сокет")
+    address.add_argument("--tcp", metavar="HOST:PORT", help="слушать TCP (по умолчанию на 127.0.0.1)")
+    parser.add_argument("--workers", type=int, default=WORKER_COUNT,
+                        help="потоков для выполнения команд всех сеансов")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="максимум одновременных сеансов")
+    parser.add_argument("--root", metavar="DIR", default=None,
+                        help="начальная директория сеансов (по умолчанию - текущая)")
+    parser.add_argument("--memfs", action="store_true",
+                        help="у каждого сеанса своя файловая система в памяти")
+    parser.add_argument("--image", metavar="FILE", default=None,
+                        help="файловая система в памяти для каждого сеанса из образа (vfs save)")
+    options = parser.parse_args()
+    if options.workers < 1 or options.max_sessions < 1:
+        parser.error("--workers и --max-sessions должны быть положительными")
+    if options.root is not None and not os.path.isdir(options.root):
+        parser.error(f"{options.root}: не директория")
+
+    template_fs = None
+    if options.memfs or options.image:
+        from vfs import MemoryFS
+        try:
+            template_fs = MemoryFS.load_image(options.image) if options.image else MemoryFS()
+        except (OSError, ValueError) as e:
+            parser.error(f"{options.image}: {str(e)}")
+
+    kwargs = {"unix_path": options.unix}
+    if options.tcp is not None:
+        try:
+            kwargs = dict(zip(("host", "port"), parse_address(options.tcp)))
+        except ValueError as e:
+            parser.error(str(e))
+    server = ShellServer(options.root, template_fs, options.workers, options.max_sessions)
+    try:
+        asyncio.run(server.serve(**kwargs))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Замер запуска: время до готовности к первой команде и разбивка по импортам
+"""
+
+import os
+import sys
+import time
+
+
+# Дочерний процесс сообщает о готовности строкой с этим префиксом
+READY_MARKER = "myos-ready:"
+PROFILE_ENV = "MYOS_STARTUP_PROFILE"
+
+
+def mark_ready():
+    """Отметка готовности для --startup-profile; без профилирования ничего не делает"""
+    if os.environ.get(PROFILE_ENV):
+        # perf_counter в Linux - CLOCK_MONOTONIC, общий для процессов
+        print(f"{READY_MARKER}{time.perf_counter()}", flush=True)
+
+
+def parse_importtime(text):
+    """Строки -X importtime: [(собственное время, накопленное, глубина, модуль)], микросекунды"""
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        entries.append((int(fields[0]), int(fields[1]), depth, stripped))
+    return entries
+
+
+def run_child(command, env):
+    """Запуск command со stdin/stdout на псевдотерминале: консоль идет интерактивным путем
+
+    После отметки готовности и первого приглашения дочернему процессу
+    отправляется Ctrl+D, и он выходит. Возвращает (код возврата, stdout,
+    stderr, время запуска по perf_counter).
+    """
+    import select
+    import subprocess
+    import tempfile
+
+    try:
+        import pty
+    except ImportError:
+        # Без pty (Windows) консоль идет путем сценария из stdin
+        started = time.perf_counter()
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True, env=env)
+        return result.returncode, result.stdout, result.stderr, started
+
+    master, slave = pty.openpty()
+    with tempfile.TemporaryFile() as errors:
+        started = time.perf_counter()
+        try:
+            process = subprocess.Popen(command, stdin=slave, stdout=slave, stderr=errors, env=env,
+                                       close_fds=True)
+        finally:
+            os.close(slave)
+        output = bytearray()
+        ready_at = None
+        deadline = time.monotonic() + 60
+        try:
+            while time.monotonic() < deadline:
+                readable, _, _ = select.select([master], [], [], 0.5)
+                if not readable:
+                    if process.poll() is not None:
+                        break
+                    continue
+                try:
+                    chunk = os.read(master, 65536)
+                except OSError:
+                    # EIO: дочерний процесс закрыл терминал
+                    break
+                if not chunk:
+                    break
+                output += chunk
+                if ready_at is None:
+                    marker = output.find(READY_MARKER.encode())
+                    if marker >= 0 and b"\n" in output[marker:]:
+                        ready_at = len(output)
+                elif len(output) > ready_at:
+                    # Приглашение выведено - ввод ждет, завершаем сеанс
+                    os.write(master, b"\x04")
+                    ready_at = float("inf")
+        finally:
+            if process.poll() is None:
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+            os.close(master)
+        errors.seek(0)
+        stderr = errors.read().decode("utf-8", errors="replace")
+    return process.returncode, output.decode("utf-8", errors="replace"), stderr, started
+
+
+def profile_startup(script, args, top=15):
+    """Запуск script с -X importtime в отдельном процессе на псевдотерминале; текст отчета"""
+    env = dict(os.environ)
+    env[PROFILE_ENV] = "1"
+    returncode, stdout, stderr, started = run_child([sys.executable, "-X", "importtime", script] + list(args),
+                                                   env)
+    total = time.perf_counter() - started
+
+    ready = None
+    for line in stdout.splitlines():
+        if line.startswith(READY_MARKER):
+            ready = float(line[len(READY_MARKER):]) - started
+    entries = parse_importtime(stderr)
+
+    lines = [f"Процесс целиком:        {total * 1000:8.1f} мс\n"]
+    if ready is not None:
+        lines.append(f"Готовность к командам:  {ready * 1000:8.1f} мс\n")
+    else:
+        lines.append(f"Готовность не достигнута (код возврата {returncode})\n")
+    lines.append(f"Импорты (верхний уровень): {sum(e[1] for e in entries if e[2] == 0) / 1000:.1f} мс, "
+                 f"модулей: {len(entries)}\n\n")
+    lines.append(f"{'НАКОПЛ.,мс':>10} {'СОБСТВ.,мс':>10}  МОДУЛЬ\n")
+    for self_us, cumulative_us, depth, name in sorted(entries, key=lambda e: -e[1])[:top]:
+        lines.append(f"{cumulative_us / 1000:>10.1f} {self_us / 1000:>10.1f}  {'  ' * depth}{name}\n")
+    errors = [line for line in stderr.splitlines() if not line.startswith("import time:")]
+    if errors:
+        lines.append("\n" + "\n".join(errors[-10:]) + "\n")
+    return "".join(lines)
@@ -0,0 +1,55 @@
+"""
+Команда cat: склейка файлов и распаковка на лету без порчи байтов
+"""
+
+import gzip
+import os
+import tempfile
+import unittest
+
+from shell_core import Shell, BufferSink
+from vfs import LocalFS
+
+
+class CatBytesTest(unittest.TestCase):
+    """Вывод cat, перенаправленный в файл, совпадает с исходными байтами"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shell = Shell(BufferSink(), fs=LocalFS(self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def read(self, name):
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def test_gzip_binary_roundtrip(self):
+        payload = os.urandom(256 * 1024) + b"\xff\xfe\x80 \xc3\n"
+        with gzip.open(self.path("x.gz"), "wb") as f:
+            f.write(payload)
+        self.assertEqual(self.shell.execute("cat x.gz > y"), 0, self.shell.sink.getvalue())
+        self.assertEqual(self.read("y"), payload)
+
+    def test_concatenation_keeps_bytes(self):
+        with open(self.path("a"), "wb") as f:
+            f.write(b"\x80first")
+        with open(self.path("b"), "wb") as f:
+            f.write(b"second\xff\n")
+        self.assertEqual(self.shell.execute("cat a b > out"), 0, self.shell.sink.getvalue())
+        self.assertEqual(self.read("out"), b"\x80firstsecond\xff\n")
+
+    def test_missing_file_reported_outside_output(self):
+        with open(self.path("good"), "w") as f:
+            f.write("ok\n")
+        self.assertEqual(self.shell.execute("cat missing good > out"), 1)
+        self.assertEqual(self.read("out"), b"ok\n")
+        self.assertIn("missing", self.shell.sink.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
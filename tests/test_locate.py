@@ -0,0 +1,49 @@
+"""
+Команды updatedb и locate: база не индексирует собственные файлы
+"""
+
+import os
+import tempfile
+import unittest
+
+from shell_core import Shell, BufferSink
+from vfs import LocalFS
+
+
+class LocateOwnDatabaseTest(unittest.TestCase):
+    """База внутри индексируемого дерева не попадает в свой же индекс"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "docs"))
+        with open(os.path.join(self.root, "docs", "notes.txt"), "w") as f:
+            f.write("notes\n")
+        self.shell = Shell(BufferSink(), fs=LocalFS(self.root))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def locate(self, pattern):
+        self.shell.sink = BufferSink()
+        self.assertEqual(self.shell.execute(f"locate -d {self.db} {pattern}"), 0, self.shell.sink.getvalue())
+        return self.shell.sink.getvalue().splitlines()
+
+    def test_database_not_indexed(self):
+        self.db = os.path.join(self.root, "var", "locate.db")
+        self.assertEqual(self.shell.execute(f"updatedb -o {self.db} {self.root}"), 0, self.shell.sink.getvalue())
+        self.assertEqual(self.locate("notes"), [os.path.join(self.root, "docs", "notes.txt")])
+        self.assertEqual(self.locate("locate"), [])
+        self.assertEqual(self.locate(".tmp"), [])
+        self.assertEqual(os.listdir(os.path.join(self.root, "var")), ["locate.db"])
+
+    def test_reindex_skips_existing_database(self):
+        self.db = os.path.join(self.root, "locate.db")
+        for _ in range(2):
+            self.assertEqual(self.shell.execute(f"updatedb -o {self.db} {self.root}"), 0)
+        self.assertEqual(self.locate("locate"), [])
+        self.assertIn(os.path.join(self.root, "docs"), self.locate("docs"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Команда rm -r: об удалении директории сообщается только без ошибок
+"""
+
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from shell_core import Shell, BufferSink
+from vfs import LocalFS
+
+
+class RemoveTreeErrorsTest(unittest.TestCase):
+    """Ошибка внутри дерева дает код 1 и не выдается за успешное удаление"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.stuck = os.path.join(self.root, "tree", "stuck")
+        os.makedirs(self.stuck)
+        with open(os.path.join(self.root, "tree", "file.txt"), "w") as f:
+            f.write("data\n")
+        self.shell = Shell(BufferSink(), fs=LocalFS(self.root))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def failing_rmdir(self, path, *args, **kwargs):
+        if path == self.stuck:
+            raise OSError(errno.EBUSY, os.strerror(errno.EBUSY), path)
+        return self.rmdir(path, *args, **kwargs)
+
+    def test_partial_removal_is_an_error(self):
+        self.rmdir = os.rmdir
+        with mock.patch("os.rmdir", self.failing_rmdir):
+            exit_code = self.shell.execute("rm -r tree")
+        output = self.shell.sink.getvalue()
+        self.assertEqual(exit_code, 1, output)
+        self.assertNotIn("Директория 'tree' удалена\n", output)
+        self.assertIn("удалена не полностью", output)
+        self.assertTrue(os.path.isdir(self.stuck))
+
+    def test_full_removal_reports_success(self):
+        self.assertEqual(self.shell.execute("rm -r tree"), 0, self.shell.sink.getvalue())
+        self.assertIn("Директория 'tree' удалена\n", self.shell.sink.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.root, "tree")))
+
+
+if __name__ == "__main__":
+    unittest.main()
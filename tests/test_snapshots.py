@@ -0,0 +1,59 @@
+"""
+Снимки файловой системы хоста: snapshot/restore на жестких ссылках
+"""
+
+import os
+import tempfile
+import unittest
+
+from shell_core import Shell, BufferSink
+from vfs import LocalFS
+
+
+class RestoreTypeSwapTest(unittest.TestCase):
+    """restore возвращает запись, у которой после снимка сменился тип"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "work")
+        os.mkdir(self.root)
+        self.shell = Shell(BufferSink(), fs=LocalFS(self.root))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_command(self, line):
+        self.assertEqual(self.shell.execute(line), 0, self.shell.sink.getvalue())
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_file_replaced_by_directory(self):
+        with open(self.path("x"), "w") as f:
+            f.write("data\n")
+        self.run_command("snapshot s")
+        os.unlink(self.path("x"))
+        os.mkdir(self.path("x"))
+        with open(self.path("x/inner"), "w") as f:
+            f.write("new\n")
+        self.run_command("restore s")
+        self.assertTrue(os.path.isfile(self.path("x")))
+        with open(self.path("x")) as f:
+            self.assertEqual(f.read(), "data\n")
+
+    def test_directory_replaced_by_file(self):
+        os.mkdir(self.path("x"))
+        with open(self.path("x/inner"), "w") as f:
+            f.write("data\n")
+        self.run_command("snapshot s")
+        self.run_command("rm -r x")
+        with open(self.path("x"), "w") as f:
+            f.write("file\n")
+        self.run_command("restore s")
+        self.assertTrue(os.path.isdir(self.path("x")))
+        with open(self.path("x/inner")) as f:
+            self.assertEqual(f.read(), "data\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,940 @@
+"""
+Файловые системы сеанса: файловая система хоста и изолированная в памяти
+"""
+
+import errno
+import io
+import itertools
+import os
+import posixpath
+import stat
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+class FileSystem:
+    """Интерфейс файловой системы, через который работают файловые команды
+
+    Методы повторяют одноименные функции os и open и так же сообщают об
+    ошибках через OSError (FileNotFoundError, NotADirectoryError, ...).
+    Относительные пути отсчитываются от текущей директории сеанса.
+    """
+
+    # Изолированная ФС: команды, работающие с хостом напрямую, недоступны
+    isolated = False
+    name = None
+
+    def getcwd(self):
+        raise NotImplementedError
+
+    def chdir(self, path):
+        raise NotImplementedError
+
+    def scandir(self, path="."):
+        raise NotImplementedError
+
+    def stat(self, path, follow_symlinks=True):
+        raise NotImplementedError
+
+    def lstat(self, path):
+        return self.stat(path, follow_symlinks=False)
+
+    def mkdir(self, path, mode=0o777):
+        raise NotImplementedError
+
+    def rmdir(self, path):
+        raise NotImplementedError
+
+    def unlink(self, path):
+        raise NotImplementedError
+
+    def rename(self, src, dst):
+        raise NotImplementedError
+
+    def open(self, path, mode="r", buffering=-1, encoding=None, errors=None):
+        raise NotImplementedError
+
+    def resolve(self, path):
+        """Путь для прямых вызовов os (команды, работающие с хостом, см. Command.host)"""
+        return path
+
+    def snapshot(self, name):
+        """Снимок состояния под именем name"""
+        raise NotImplementedError
+
+    def restore(self, name):
+        """Возврат к снимку name"""
+        raise NotImplementedError
+
+    def list_snapshots(self):
+        """Имена снимков, от давно использованных к недавним"""
+        return []
+
+    def drop_snapshot(self, name):
+        raise NotImplementedError
+
+    def exists(self, path):
+        try:
+            self.stat(path)
+        except OSError:
+            return False
+        return True
+
+    def lexists(self, path):
+        try:
+            self.lstat(path)
+        except OSError:
+            return False
+        return True
+
+    def isdir(self, path):
+        try:
+            return stat.S_ISDIR(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def rmtree(self, path):
+        """Удаление дерева: сначала содержимое, затем сама директория"""
+        stack = [(path, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if expanded:
+                self.rmdir(current)
+                continue
+            stack.append((current, True))
+            with self.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, False))
+                    else:
+                        self.unlink(entry.path)
+
+
+def break_hardlink(path, keep_data=True):
+    """Отделение файла от снимков перед изменением на месте
+
+    Файлы снимков LocalFS - жесткие ссылки на рабочие файлы; запись в
+    общий inode изменила бы и снимок. Отделяются только файлы, на inode
+    которых ссылается хранилище снимков: обычные жесткие ссылки остаются
+    общими. keep_data=False - файл все равно будет усечен, поэтому ссылка
+    просто удаляется.
+    """
+    try:
+        info = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return
+    if info.st_nlink < 2 or not stat.S_ISREG(info.st_mode) or not LinkSnapshots.is_shared(path, info):
+        return
+    if not keep_data:
+        os.unlink(path)
+        return
+    import shutil
+    tmp_path = f"{path}.{os.getpid()}.cow"
+    shutil.copy2(path, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class LinkSnapshots:
+    """Снимки директории хоста на жестких ссылках
+
+    Снимок - дерево директорий рядом с корнем (.<имя>.snapshots), файлы
+    в котором - жесткие ссылки на рабочие: содержимое не копируется.
+    LocalFS перед записью отделяет файл от ссылок, так что снимок не
+    меняется. Восстановление сравнивает номера inode из readdir и
+    перелинковывает только измененные файлы. Лишние снимки удаляются по
+    давности использования.
+    """
+
+    MAX_SNAPSHOTS = 8
+    INDEX_VERSION = 1
+
+    # (st_dev, st_ino) файлов, на которые ссылаются снимки, и хранилища,
+    # уже внесенные в этот набор (общие для всех сеансов процесса)
+    shared = set()
+    registered = set()
+    lock = threading.Lock()
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.store = self.store_path(self.root)
+        self.index_path = os.path.join(self.store, "index.json")
+        self.register(self.store)
+
+    @staticmethod
+    def store_path(root):
+        parent, base = os.path.split(root)
+        return os.path.join(parent, f".{base}.snapshots")
+
+    @classmethod
+    def register(cls, store):
+        """Внесение inode файлов хранилища в shared; каждое хранилище просматривается один раз"""
+        with cls.lock:
+            if store in cls.registered:
+                return
+            inodes = set()
+            try:
+                device = os.stat(store).st_dev
+                stack = [store]
+                while stack:
+                    with os.scandir(stack.pop()) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            else:
+                                inodes.add((device, entry.inode()))
+            except OSError:
+                pass
+            cls.shared.update(inodes)
+            cls.registered.add(store)
+
+    @classmethod
+    def is_shared(cls, path, info):
+        """Ссылается ли снимок на inode файла path (info - его stat)
+
+        Хранилища ищутся рядом с каждым предком пути, так что учитываются
+        и снимки, сделанные в прошлых сеансах.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        while True:
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            store = cls.store_path(directory)
+            if store not in cls.registered and os.path.isdir(store):
+                cls.register(store)
+            directory = parent
+        return (info.st_dev, info.st_ino) in cls.shared
+
+    def load_index(self):
+        """Имя -> время последнего использования, от давних к недавним"""
+        import json
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.INDEX_VERSION:
+                return OrderedDict()
+            return OrderedDict(sorted(data["snapshots"].items(), key=lambda item: item[1]))
+        except (OSError, ValueError, KeyError, AttributeError):
+            return OrderedDict()
+
+    def save_index(self, index):
+        import json
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.INDEX_VERSION, "snapshots": index}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def path(self, name):
+        if not name or "/" in name or name.startswith(".") or name == "index.json":
+            raise ValueError(f"недопустимое имя снимка: {name}")
+        return os.path.join(self.store, name)
+
+    def take(self, name):
+        import shutil
+        target = self.path(name)
+        os.makedirs(self.store, exist_ok=True)
+        index = self.load_index()
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        inodes = link_tree(self.root, tmp_path)
+        device = os.stat(self.store).st_dev
+        with LinkSnapshots.lock:
+            LinkSnapshots.shared.update((device, inode) for inode in inodes)
+        if os.path.lexists(target):
+            shutil.rmtree(target)
+        os.rename(tmp_path, target)
+        index[name] = time.time()
+        index.move_to_end(name)
+        while len(index) > self.MAX_SNAPSHOTS:
+            old, _ = index.popitem(last=False)
+            shutil.rmtree(os.path.join(self.store, old), ignore_errors=True)
+        self.save_index(index)
+
+    def restore(self, name):
+        """Возврат корня к снимку; возвращает число замененных записей"""
+        source = self.path(name)
+        index = self.load_index()
+        if name not in index or not os.path.isdir(source):
+            raise fs_error(errno.ENOENT, name)
+        changed = sync_tree(source, self.root)
+        index[name] = time.time()
+        index.move_to_end(name)
+        self.save_index(index)
+        return changed
+
+    def names(self):
+        return list(self.load_index())
+
+    def drop(self, name):
+        import shutil
+        index = self.load_index()
+        if index.pop(name, None) is None:
+            raise fs_error(errno.ENOENT, name)
+        shutil.rmtree(self.path(name), ignore_errors=True)
+        self.save_index(index)
+
+
+def link_tree(src, dst):
+    """Копия дерева из жестких ссылок: создаются только директории и ссылки;
+    возвращает номера inode связанных файлов
+    """
+    inodes = set()
+    os.mkdir(dst)
+    stack = [(src, dst)]
+    while stack:
+        source, target = stack.pop()
+        with os.scandir(source) as it:
+            for entry in it:
+                path = os.path.join(target, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    os.mkdir(path)
+                    stack.append((entry.path, path))
+                else:
+                    os.link(entry.path, path, follow_symlinks=False)
+                    inodes.add(entry.inode())
+    return inodes
+
+
+def sync_tree(source, root):
+    """Приведение root к дереву из жестких ссылок source; число измененных записей
+
+    Неизмененный файл - та же ссылка, что и в снимке (совпадает inode из
+    readdir), поэтому stat не нужен, а работа пропорциональна изменениям.
+    """
+    import shutil
+    changed = 0
+    stack = [(source, root)]
+    while stack:
+        source_dir, root_dir = stack.pop()
+        with os.scandir(source_dir) as it:
+            wanted = {entry.name: entry for entry in it}
+        with os.scandir(root_dir) as it:
+            present = {entry.name: entry for entry in it}
+        # Удаленные записи создаются заново, даже если записи present о них говорят иное
+        removed = set()
+        for name, entry in present.items():
+            snap = wanted.get(name)
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if snap is not None and is_dir and snap.is_dir(follow_symlinks=False):
+                stack.append((snap.path, entry.path))
+                continue
+            if snap is not None and not is_dir and snap.inode() == entry.inode():
+                continue
+            if is_dir:
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+            removed.add(name)
+            changed += 1
+        for name, snap in wanted.items():
+            present_entry = present.get(name)
+            if present_entry is not None and name not in removed:
+                # Оставлены только общая директория (уже в стеке) и неизмененный файл
+                continue
+            target = os.path.join(root_dir, name)
+            if snap.is_dir(follow_symlinks=False):
+                os.mkdir(target)
+                stack.append((snap.path, target))
+            else:
+                os.link(snap.path, target, follow_symlinks=False)
+            changed += 1
+    return changed
+
+
+class LocalFS(FileSystem):
+    """Файловая система хоста: прямые вызовы os
+
+    cwd=None - текущая директория процесса (os.chdir). С заданным cwd
+    текущая директория своя у каждого экземпляра: относительные пути
+    присоединяются к ней, и процесс может обслуживать много сеансов.
+
+    Снимки (snapshot/restore) - деревья жестких ссылок (LinkSnapshots)
+    для указанной в вызове директории, по умолчанию текущей.
+    """
+
+    name = "local"
+
+    def __init__(self, cwd=None):
+        self.cwd = os.path.abspath(cwd) if cwd is not None else None
+
+    def resolve(self, path):
+        if self.cwd is None:
+            return path
+        return os.path.join(self.cwd, os.fspath(path))
+
+    def snapshot_store(self, root=None):
+        return LinkSnapshots(self.resolve(root) if root is not None else self.getcwd())
+
+    def snapshot(self, name, root=None):
+        self.snapshot_store(root).take(name)
+
+    def restore(self, name, root=None):
+        return self.snapshot_store(root).restore(name)
+
+    def list_snapshots(self, root=None):
+        return self.snapshot_store(root).names()
+
+    def drop_snapshot(self, name, root=None):
+        self.snapshot_store(root).drop(name)
+
+    def getcwd(self):
+        return self.cwd if self.cwd is not None else os.getcwd()
+
+    def chdir(self, path):
+        if self.cwd is None:
+            os.chdir(path)
+            return
+        full = os.path.normpath(self.resolve(path))
+        if not stat.S_ISDIR(os.stat(full).st_mode):
+            raise fs_error(errno.ENOTDIR, path)
+        # Проверка права входа, как у chdir
+        if not os.access(full, os.X_OK):
+            raise fs_error(errno.EACCES, path)
+        self.cwd = full
+
+    def scandir(self, path="."):
+        return os.scandir(self.resolve(path))
+
+    def stat(self, path, follow_symlinks=True):
+        return os.stat(self.resolve(path), follow_symlinks=follow_symlinks)
+
+    def mkdir(self, path, mode=0o777):
+        os.mkdir(self.resolve(path), mode)
+
+    def rmdir(self, path):
+        os.rmdir(self.resolve(path))
+
+    def unlink(self, path):
+        os.unlink(self.resolve(path))
+
+    def rename(self, src, dst):
+        os.rename(self.resolve(src), self.resolve(dst))
+
+    def open(self, path, mode="r", buffering=-1, encoding=None, errors=None):
+        path = self.resolve(path)
+        if "w" in mode or "a" in mode or "+" in mode:
+            break_hardlink(path, keep_data="w" not in mode)
+        return open(path, mode, buffering, encoding, errors)
+
+
+class Inode:
+    """Узел MemoryFS: директория (entries) или файл (data)
+
+    gen - поколение, в котором узел создан; узлы старших поколений
+    принадлежат снимкам и не изменяются, а копируются при записи.
+    """
+
+    __slots__ = ("ino", "gen", "mode", "nlink", "mtime_ns", "entries", "data")
+
+
+class MemoryStat:
+    """Результат stat для узла MemoryFS (поля как у os.stat_result)"""
+
+    __slots__ = ("st_mode", "st_ino", "st_dev", "st_nlink", "st_uid", "st_gid", "st_size",
+                 "st_blocks", "st_atime", "st_mtime", "st_ctime", "st_mtime_ns")
+
+    def __init__(self, node, uid=0, gid=0):
+        self.st_mode = node.mode
+        self.st_ino = node.ino
+        self.st_dev = 0
+        self.st_nlink = node.nlink
+        self.st_uid = uid
+        self.st_gid = gid
+        self.st_size = len(node.data) if node.data is not None else 4096
+        self.st_blocks = (self.st_size + 511) // 512
+        self.st_mtime_ns = node.mtime_ns
+        self.st_mtime = self.st_atime = self.st_ctime = node.mtime_ns / 1e9
+
+
+class MemoryDirEntry:
+    """Запись директории MemoryFS с интерфейсом os.DirEntry"""
+
+    __slots__ = ("name", "path", "node")
+
+    def __init__(self, name, path, node):
+        self.name = name
+        self.path = path
+        self.node = node
+
+    def is_dir(self, follow_symlinks=True):
+        return self.node.entries is not None
+
+    def is_file(self, follow_symlinks=True):
+        return self.node.entries is None
+
+    def is_symlink(self):
+        return False
+
+    def inode(self):
+        return self.node.ino
+
+    def stat(self, follow_symlinks=True):
+        return MemoryStat(self.node)
+
+
+class MemoryScandir:
+    """Итератор записей директории, как у os.scandir (с поддержкой with)"""
+
+    def __init__(self, entries):
+        self.entries = iter(entries)
+
+    def __iter__(self):
+        return self.entries
+
+    def __next__(self):
+        return next(self.entries)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class MemoryFile(io.RawIOBase):
+    """Открытый файл MemoryFS: чтение и запись прямо в bytearray узла"""
+
+    def __init__(self, node, readable, writable, append=False, fs=None, path=None):
+        self.node = node
+        # Для записи: по пути узел заново берется из fs, если его заморозил снимок
+        self.fs = fs
+        self.path = path
+        self.position = 0
+        self._readable = readable
+        self._writable = writable
+        self.append = append
+
+    def readable(self):
+        return self._readable
+
+    def writable(self):
+        return self._writable
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.node.data
+        size = min(len(buffer), len(data) - self.position)
+        if size <= 0:
+            return 0
+        buffer[:size] = data[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def write(self, buffer):
+        if not self._writable:
+            raise io.UnsupportedOperation("write")
+        self.thaw()
+        data = self.node.data
+        if self.append:
+            self.position = len(data)
+        size = len(buffer)
+        data[self.position:self.position + size] = buffer
+        self.position += size
+        self.node.mtime_ns = time.time_ns()
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.node.data)
+        if offset < 0:
+            raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def thaw(self):
+        if self.node.gen != self.fs.gen:
+            self.node = self.fs.writable(self.path)
+
+    def truncate(self, size=None):
+        size = self.position if size is None else size
+        self.thaw()
+        del self.node.data[size:]
+        self.node.mtime_ns = time.time_ns()
+        return size
+
+
+# Образ MemoryFS: заголовок, текущая директория, затем узлы в прямом порядке обхода.
+# Узел: тип (0 - файл, 1 - директория), права, mtime_ns, длина имени, имя,
+# затем для файла - размер и содержимое, для директории - число записей.
+IMAGE_MAGIC = b"MYOSVFS1"
+NODE_HEADER = struct.Struct("<BHqH")
+COUNT = struct.Struct("<Q")
+
+
+# Поколения узлов MemoryFS общие для всех экземпляров: у копий (fork),
+# разделяющих узлы, поколения не должны совпадать
+GENERATIONS = itertools.count()
+
+
+def fs_error(code, path):
+    return OSError(code, os.strerror(code), path)
+
+
+class MemoryFS(FileSystem):
+    """Изолированная файловая система в памяти
+
+    Узлы со __slots__, директории - словари имя -> узел, содержимое
+    файлов - bytearray. Дисковых операций нет, кроме явного сохранения и
+    загрузки образа (save_image/load_image).
+
+    Снимки (snapshot/restore) используют общие узлы: снимок запоминает
+    корень и начинает новое поколение, а изменение копирует только узлы
+    на пути к изменяемому (и содержимое изменяемого файла). Снимок и
+    восстановление - O(1), запись после снимка - O(глубина пути).
+    """
+
+    isolated = True
+    name = "memory"
+    # Сколько снимков хранить; лишние удаляются по давности использования
+    MAX_SNAPSHOTS = 32
+
+    def __init__(self):
+        self.gen = next(GENERATIONS)
+        self.next_ino = 1
+        self.root = self.new_node(stat.S_IFDIR | 0o755)
+        self.cwd = "/"
+        # Имя -> (корень, текущая директория); порядок - от давно использованных
+        self.snapshots = OrderedDict()
+
+    def new_node(self, mode, mtime_ns=None):
+        node = Inode()
+        node.ino = self.next_ino
+        self.next_ino += 1
+        node.gen = self.gen
+        node.mode = mode
+        node.mtime_ns = time.time_ns() if mtime_ns is None else mtime_ns
+        if stat.S_ISDIR(mode):
+            node.nlink = 2
+            node.entries = {}
+            node.data = None
+        else:
+            node.nlink = 1
+            node.entries = None
+            node.data = bytearray()
+        return node
+
+    def clone(self, node):
+        """Копия узла снимка для изменения в текущем поколении"""
+        copy = Inode()
+        copy.ino = node.ino
+        copy.gen = self.gen
+        copy.mode = node.mode
+        copy.nlink = node.nlink
+        copy.mtime_ns = node.mtime_ns
+        copy.entries = dict(node.entries) if node.entries is not None else None
+        copy.data = bytearray(node.data) if node.data is not None else None
+        return copy
+
+    def abspath(self, path):
+        path = posixpath.normpath(posixpath.join(self.cwd, os.fspath(path)))
+        # normpath сохраняет ведущие '//'
+        return "/" + path.lstrip("/")
+
+    def lookup(self, path):
+        node = self.root
+        for part in self.abspath(path).split("/"):
+            if not part:
+                continue
+            if node.entries is None:
+                raise fs_error(errno.ENOTDIR, path)
+            node = node.entries.get(part)
+            if node is None:
+                raise fs_error(errno.ENOENT, path)
+        return node
+
+    def writable(self, path):
+        """Узел для изменения: узлы снимков на пути копируются (копирование пути)"""
+        if self.root.gen != self.gen:
+            self.root = self.clone(self.root)
+        node = self.root
+        for part in self.abspath(path).split("/"):
+            if not part:
+                continue
+            if node.entries is None:
+                raise fs_error(errno.ENOTDIR, path)
+            child = node.entries.get(part)
+            if child is None:
+                raise fs_error(errno.ENOENT, path)
+            if child.gen != self.gen:
+                child = node.entries[part] = self.clone(child)
+            node = child
+        return node
+
+    def lookup_parent(self, path):
+        """Директория-родитель (готовая к изменению) и имя последнего компонента пути"""
+        full = self.abspath(path)
+        if full == "/":
+            raise fs_error(errno.EBUSY, path)
+        parent_path, name = posixpath.split(full)
+        # Сначала проверка без копирования, чтобы ошибка не оставила копий
+        if self.lookup(parent_path).entries is None:
+            raise fs_error(errno.ENOTDIR, path)
+        return self.writable(parent_path), name
+
+    def getcwd(self):
+        return self.cwd
+
+    def chdir(self, path):
+        node = self.lookup(path)
+        if node.entries is None:
+            raise fs_error(errno.ENOTDIR, path)
+        self.cwd = self.abspath(path)
+
+    def scandir(self, path="."):
+        node = self.lookup(path)
+        if node.entries is None:
+            raise fs_error(errno.ENOTDIR, path)
+        path = os.fspath(path)
+        return MemoryScandir([MemoryDirEntry(name, posixpath.join(path, name), child)
+                              for name, child in node.entries.items()])
+
+    def stat(self, path, follow_symlinks=True):
+        return MemoryStat(self.lookup(path))
+
+    def mkdir(self, path, mode=0o777):
+        parent, name = self.lookup_parent(path)
+        if name in parent.entries:
+            raise fs_error(errno.EEXIST, path)
+        parent.entries[name] = self.new_node(stat.S_IFDIR | (mode & 0o755))
+        parent.nlink += 1
+        parent.mtime_ns = time.time_ns()
+
+    def rmdir(self, path):
+        parent, name = self.lookup_parent(path)
+        node = parent.entries.get(name)
+        if node is None:
+            raise fs_error(errno.ENOENT, path)
+        if node.entries is None:
+            raise fs_error(errno.ENOTDIR, path)
+        if node.entries:
+            raise fs_error(errno.ENOTEMPTY, path)
+        del parent.entries[name]
+        parent.nlink -= 1
+        parent.mtime_ns = time.time_ns()
+
+    def unlink(self, path):
+        parent, name = self.lookup_parent(path)
+        node = parent.entries.get(name)
+        if node is None:
+            raise fs_error(errno.ENOENT, path)
+        if node.entries is not None:
+            raise fs_error(errno.EISDIR, path)
+        del parent.entries[name]
+        parent.mtime_ns = time.time_ns()
+
+    def rmtree(self, path):
+        parent, name = self.lookup_parent(path)
+        node = parent.entries.get(name)
+        if node is None:
+            raise fs_error(errno.ENOENT, path)
+        if node.entries is None:
+            raise fs_error(errno.ENOTDIR, path)
+        # Поддерево отцепляется целиком, без обхода по одной записи
+        del parent.entries[name]
+        parent.nlink -= 1
+        parent.mtime_ns = time.time_ns()
+
+    def rename(self, src, dst):
+        src_parent, src_name = self.lookup_parent(src)
+        node = src_parent.entries.get(src_name)
+        if node is None:
+            raise fs_error(errno.ENOENT, src)
+        dst_parent, dst_name = self.lookup_parent(dst)
+        if node.entries is not None and (self.abspath(dst) + "/").startswith(self.abspath(src) + "/"):
+            raise fs_error(errno.EINVAL, dst)
+        target = dst_parent.entries.get(dst_name)
+        if target is node:
+            return
+        if target is not None:
+            if target.entries is not None and node.entries is None:
+                raise fs_error(errno.EISDIR, dst)
+            if target.entries is None and node.entries is not None:
+                raise fs_error(errno.ENOTDIR, dst)
+            if target.entries:
+                raise fs_error(errno.ENOTEMPTY, dst)
+            if target.entries is not None:
+                dst_parent.nlink -= 1
+        del src_parent.entries[src_name]
+        dst_parent.entries[dst_name] = node
+        if node.entries is not None:
+            src_parent.nlink -= 1
+            dst_parent.nlink += 1
+        src_parent.mtime_ns = dst_parent.mtime_ns = time.time_ns()
+
+    def open(self, path, mode="r", buffering=-1, encoding=None, errors=None):
+        flags = set(mode)
+        update = "+" in flags
+        if "r" in flags:
+            node = self.lookup(path)
+            if node.entries is not None:
+                raise fs_error(errno.EISDIR, path)
+            raw = MemoryFile(node, True, update, fs=self, path=self.abspath(path))
+        else:
+            parent, name = self.lookup_parent(path)
+            node = parent.entries.get(name)
+            if node is None:
+                node = parent.entries[name] = self.new_node(stat.S_IFREG | 0o644)
+                parent.mtime_ns = node.mtime_ns
+            elif "x" in flags:
+                raise fs_error(errno.EEXIST, path)
+            elif node.entries is not None:
+                raise fs_error(errno.EISDIR, path)
+            elif "w" in flags:
+                # Усечение: новый узел вместо копирования содержимого из снимка
+                fresh = self.new_node(node.mode)
+                fresh.ino = node.ino
+                node = parent.entries[name] = fresh
+            raw = MemoryFile(node, update, True, append="a" in flags, fs=self, path=self.abspath(path))
+        if "b" in flags:
+            return raw
+        if raw.readable() and raw.writable():
+            buffered = io.BufferedRandom(raw)
+        elif raw.readable():
+            buffered = io.BufferedReader(raw)
+        else:
+            buffered = io.BufferedWriter(raw)
+        return io.TextIOWrapper(buffered, encoding=encoding or "utf-8", errors=errors)
+
+    def usage(self):
+        """Число узлов и суммарный размер файлов текущего дерева"""
+        nodes = size = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            nodes += 1
+            if node.entries is not None:
+                stack.extend(node.entries.values())
+            else:
+                size += len(node.data)
+        return nodes, size
+
+    def snapshot(self, name):
+        """Снимок текущего дерева за O(1): дальнейшие изменения копируют узлы"""
+        self.snapshots[name] = (self.root, self.cwd)
+        self.snapshots.move_to_end(name)
+        self.gen = next(GENERATIONS)
+        while len(self.snapshots) > self.MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+
+    def restore(self, name):
+        """Возврат к снимку за O(1); сам снимок остается неизменным"""
+        try:
+            self.root, cwd = self.snapshots[name]
+        except KeyError:
+            raise fs_error(errno.ENOENT, name)
+        self.snapshots.move_to_end(name)
+        self.gen = next(GENERATIONS)
+        self.cwd = cwd if self.isdir(cwd) else "/"
+
+    def fork(self):
+        """Независимая копия за O(1) с общими узлами (например, для нового сеанса)"""
+        copy = MemoryFS.__new__(MemoryFS)
+        copy.gen = next(GENERATIONS)
+        copy.next_ino = self.next_ino
+        copy.root = self.root
+        copy.cwd = self.cwd
+        copy.snapshots = OrderedDict()
+        # Общие узлы становятся неизменяемыми и для исходной ФС
+        self.gen = next(GENERATIONS)
+        return copy
+
+    def list_snapshots(self):
+        """Имена снимков, от давно использованных к недавним"""
+        return list(self.snapshots)
+
+    def drop_snapshot(self, name):
+        try:
+            del self.snapshots[name]
+        except KeyError:
+            raise fs_error(errno.ENOENT, name)
+
+    def to_image(self):
+        """Образ файловой системы в виде bytes"""
+        cwd = self.cwd.encode("utf-8")
+        parts = [IMAGE_MAGIC, COUNT.pack(len(cwd)), cwd]
+        stack = [("", self.root)]
+        while stack:
+            name, node = stack.pop()
+            encoded = name.encode("utf-8")
+            is_dir = node.entries is not None
+            parts.append(NODE_HEADER.pack(is_dir, stat.S_IMODE(node.mode), node.mtime_ns, len(encoded)))
+            parts.append(encoded)
+            if is_dir:
+                parts.append(COUNT.pack(len(node.entries)))
+                stack.extend(reversed(node.entries.items()))
+            else:
+                parts.append(COUNT.pack(len(node.data)))
+                parts.append(node.data)
+        return b"".join(parts)
+
+    @classmethod
+    def from_image(cls, data):
+        """Файловая система из образа to_image"""
+        view = memoryview(data)
+        if bytes(view[:len(IMAGE_MAGIC)]) != IMAGE_MAGIC:
+            raise ValueError("не образ файловой системы")
+        fs = cls()
+        fs.next_ino = 1
+        try:
+            offset = len(IMAGE_MAGIC)
+            (size,) = COUNT.unpack_from(view, offset)
+            offset += COUNT.size
+            cwd = bytes(view[offset:offset + size]).decode("utf-8")
+            offset += size
+            # Стек: (директория, сколько записей еще прочитать)
+            stack = []
+            root = None
+            while root is None or stack:
+                is_dir, perm, mtime_ns, name_size = NODE_HEADER.unpack_from(view, offset)
+                offset += NODE_HEADER.size
+                name = bytes(view[offset:offset + name_size]).decode("utf-8")
+                offset += name_size
+                (count,) = COUNT.unpack_from(view, offset)
+                offset += COUNT.size
+                node = fs.new_node((stat.S_IFDIR if is_dir else stat.S_IFREG) | perm, mtime_ns)
+                if not is_dir:
+                    if offset + count > len(view):
+                        raise ValueError("образ обрезан")
+                    node.data[:] = view[offset:offset + count]
+                    offset += count
+                if root is None:
+                    root = node
+                else:
+                    parent, remaining = stack[-1]
+                    parent.entries[name] = node
+                    if is_dir:
+                        parent.nlink += 1
+                    if remaining == 1:
+                        stack.pop()
+                    else:
+                        stack[-1] = (parent, remaining - 1)
+                if is_dir and count:
+                    stack.append((node, count))
+        except struct.error:
+            raise ValueError("образ обрезан")
+        fs.root = root
+        fs.cwd = cwd if fs.isdir(cwd) else "/"
+        return fs
+
+    def save_image(self, path):
+        """Атомарная запись образа в файл хоста"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_image())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_image(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_image(f.read())